@@ -7,7 +7,79 @@ class Settings(BaseSettings):
     # JWT Settings
     jwt_secret_key: str = "dev-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
-    jwt_expiration_hours: int = 24
+    # Access tokens are short-lived; clients renew them with a refresh token
+    access_token_minutes: int = 10
+    # Refresh tokens rotate on every use; a session unused this long ends
+    refresh_token_days: int = 30
+    # How often each process reloads the revoked-session list into its
+    # bloom filter; a revoked access token is accepted at most this long
+    # by other processes (and never past its expiry)
+    revocation_sync_seconds: int = 30
+    # Bloom filter sizing: expected revocations in one access token lifetime
+    # and the share of live sessions that need a database check
+    revocation_filter_capacity: int = 10000
+    revocation_filter_error_rate: float = 0.001
+
+    # Login throttling: token buckets per client IP and per email, refilled
+    # at `*_per_minute` up to `*_burst` attempts (0 per minute disables one)
+    login_ip_per_minute: float = 10.0
+    login_ip_burst: int = 20
+    login_email_per_minute: float = 5.0
+    login_email_burst: int = 10
+    # Window of the shared attempt counters that back the per-process buckets
+    login_throttle_window_seconds: int = 60
+    # Buckets kept per process; the least recently used are dropped beyond it
+    login_throttle_max_keys: int = 10000
+    # Verified tokens remembered until they expire, so repeat requests skip
+    # JWT verification (0 disables the cache)
+    token_cache_max_entries: int = 10000
+
+    # Scheme for new password hashes: "bcrypt" or "argon2" (needs argon2-cffi)
+    password_hash_scheme: str = "bcrypt"
+    # Hashing costs; pick them with `manage calibrate-hashing` on the target
+    # hardware. bcrypt needs at least 10 rounds. Stored hashes at a lower
+    # cost are replaced at their next login; dearer ones are kept
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 2
+    argon2_memory_kib: int = 19456
+    # Time one password hash may take, the target of `manage calibrate-hashing`
+    password_hash_budget_ms: float = 250.0
+
+    # Pool that runs bcrypt off the event loop: "thread" (bcrypt releases the
+    # GIL) or "process" (not on AWS Lambda, which lacks multiprocessing support)
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = 2
+    # Hashes waiting for a worker beyond which sign-ins are refused with 503
+    password_hash_max_queue: int = 16
+
+    # Where data lives: "dynamodb", "sqlite" (single-node self-hosting), or
+    # "memory" (process-local, lost on restart; for tests and benchmarks)
+    storage_backend: str = "dynamodb"
+
+    # Database file for the sqlite storage backend
+    sqlite_path: str = "mealprepbuddy.db"
+
+    # How recipe and plan changes reach the per-household stats on DynamoDB:
+    # "local" (in-process queue, for development), "streams" (DynamoDB
+    # Streams to the app.streams Lambda, for production) or "off"
+    change_feed: str = "local"
+
+    # Where background jobs (tag deletion cleanup) run: "local" (in the API
+    # process after the response) or "streams" (the app.streams Lambda, when
+    # the job item shows up on the table stream)
+    background_jobs: str = "local"
+
+    # Weeks older than this many weeks are rolled into per-year archive
+    # items by `manage compact-plans`. Plan writes to newer weeks skip the
+    # archive lookup, so do not raise it once weeks have been archived
+    plan_archive_horizon_weeks: int = 26
+
+    # Deleted tags, recipes and rules are remembered this long for GET /sync;
+    # clients whose cursor is older get everything again
+    sync_tombstone_days: int = 30
+    # Each sync cursor reaches back this far to catch writes that reached the
+    # index late or carry a slightly skewed timestamp
+    sync_window_seconds: int = 10
 
     # DynamoDB Settings
     dynamodb_table_name: str = "mealprepbuddy"
@@ -16,6 +88,35 @@ class Settings(BaseSettings):
     # For local development with DynamoDB Local
     dynamodb_endpoint_url: Optional[str] = None
 
+    # Worker threads for the async data-access layer (DynamoDB calls in flight)
+    dynamodb_max_workers: int = 16
+
+    # botocore client tuning; keep the pool at least as large as the workers
+    dynamodb_max_pool_connections: int = 32
+    dynamodb_tcp_keepalive: bool = True
+    dynamodb_connect_timeout: float = 2.0
+    dynamodb_read_timeout: float = 5.0
+    # "adaptive" adds client-side rate limiting on throttles to "standard"
+    dynamodb_retry_mode: str = "adaptive"
+    dynamodb_max_attempts: int = 5
+
+    # In-process cache of tags, recipes and rules per household (0 disables it)
+    cache_max_bytes: int = 16 * 1024 * 1024
+    # How long a household's data version is trusted before re-reading it;
+    # bounds staleness across workers (writes in the same worker apply at once)
+    cache_version_ttl_seconds: float = 1.0
+
+    # Page size for list endpoints when a cursor is given without a limit
+    default_page_size: int = 100
+
+    # Largest number of recipes accepted by POST /recipes/bulk
+    bulk_import_max_records: int = 5000
+
+    # Log one JSON line per request with its duration and DynamoDB usage
+    log_request_metrics: bool = True
+    # Bearer token GET /metrics requires; unset, the endpoint answers 404
+    metrics_token: Optional[str] = None
+
     # Default household settings
     default_timezone: str = "America/Los_Angeles"
     default_dinner_time: str = "18:00"
@@ -1,8 +1,24 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
+from typing import Optional
+import hmac
 
-from .routers import auth_router, tags_router, recipes_router, rules_router, plans_router
+from .config import get_settings
+from .routers import (
+    auth_router, tags_router, recipes_router, rules_router, plans_router, stats_router,
+    sync_router,
+)
+from .services.async_dynamodb import async_db
+from .services.cache import household_cache
+from .services.connection import dynamodb_connection
+from .services.factory import change_feed
+from .services.login_throttle import login_throttle
+from .services.password_hashing import password_hasher
+from .services.revocation import revocation_filter
+from .services.token_cache import token_cache
+from .services.request_metrics import RequestMetricsMiddleware, SERVER_TIMING_HEADER, route_metrics
+from .utils.pagination import NEXT_CURSOR_HEADER
 
 app = FastAPI(
     title="MealPrepBuddy API",
@@ -10,6 +26,9 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Per-request DynamoDB capacity and latency (inside CORS, so preflights are not counted)
+app.add_middleware(RequestMetricsMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", SERVER_TIMING_HEADER],
 )
 
 # Include routers
@@ -25,6 +45,8 @@ app.include_router(tags_router)
 app.include_router(recipes_router)
 app.include_router(rules_router)
 app.include_router(plans_router)
+app.include_router(stats_router)
+app.include_router(sync_router)
 
 
 @app.get("/health")
@@ -33,5 +55,35 @@ async def health_check():
     return {"status": "healthy", "service": "mealprepbuddy-api"}
 
 
+def _require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """404 unless METRICS_TOKEN is set, 401 unless it is sent as a Bearer token"""
+    token = get_settings().metrics_token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/metrics", dependencies=[Depends(_require_metrics_token)])
+async def metrics():
+    """In-process runtime counters for this worker"""
+    feed = change_feed()
+    return {
+        "dynamodb_pool": async_db.stats(),
+        "dynamodb_connection": dynamodb_connection.stats(),
+        "password_hashing": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "revocation": revocation_filter.stats(),
+        "login_throttle": login_throttle.stats(),
+        "household_cache": household_cache.stats(),
+        "routes": route_metrics.stats(),
+        "change_feed": feed.stats() if feed else None,
+    }
+
+
 # Lambda handler
 handler = Mangum(app, api_gateway_base_path="/dev/api")
@@ -0,0 +1,257 @@
+"""
+Maintenance commands for the MealPrepBuddy backend.
+
+Run from the backend directory with the same environment as the API:
+
+    python -m app.manage backfill-tag-guards [--household-id ID]
+    python -m app.manage backfill-tag-index [--household-id ID]
+    python -m app.manage backfill-sync-index [--household-id ID]
+    python -m app.manage rebuild-stats [--household-id ID]
+    python -m app.manage compact-plans [--household-id ID] [--horizon-weeks N]
+    python -m app.manage resume-jobs [--household-id ID]
+    python -m app.manage calibrate-hashing [--budget-ms MS] [--samples N]
+    python -m app.manage migrate-dynamodb-export PATH [--sqlite-path FILE]
+"""
+import argparse
+import gzip
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from .config import get_settings
+from .services.factory import db_service
+from .services.jobs import run_job
+from .services.password_hashing import argon2_available, calibrate
+from .services.storage import current_week_start
+
+
+def _household_ids(household_id: Optional[str]) -> Iterable[str]:
+    if household_id:
+        return [household_id]
+    return db_service.iter_household_ids()
+
+
+def backfill_tag_guards(args: argparse.Namespace) -> None:
+    """Reserve the names of tags created before name guard items existed"""
+    total = 0
+    for household_id in _household_ids(args.household_id):
+        created = db_service.backfill_tag_name_guards(household_id)
+        if created:
+            print(f"{household_id}: {created} tag name guards created")
+        total += created
+    print(f"Done: {total} tag name guards created")
+
+
+def backfill_tag_index(args: argparse.Namespace) -> None:
+    """Write tag-to-recipe index items for recipes created before the index"""
+    total = 0
+    for household_id in _household_ids(args.household_id):
+        written = db_service.backfill_tag_index(household_id)
+        if written:
+            print(f"{household_id}: {written} tag index items written")
+        total += written
+    print(f"Done: {total} tag index items written")
+
+
+def backfill_sync_index(args: argparse.Namespace) -> None:
+    """Add tags, recipes and rules written before delta sync to its index"""
+    total = 0
+    for household_id in _household_ids(args.household_id):
+        updated = db_service.backfill_sync_index(household_id)
+        if updated:
+            print(f"{household_id}: {updated} items indexed")
+        total += updated
+    print(f"Done: {total} items indexed")
+
+
+def rebuild_stats(args: argparse.Namespace) -> None:
+    """Recompute the per-household STATS items from every recipe and week"""
+    total = 0
+    for household_id in _household_ids(args.household_id):
+        db_service.rebuild_household_stats(household_id)
+        total += 1
+    print(f"Done: stats rebuilt for {total} households")
+
+
+def compact_plans(args: argparse.Namespace) -> None:
+    """Archive weekly plans older than the horizon into per-year ARCHIVE# items"""
+    horizon_weeks = args.horizon_weeks
+    if horizon_weeks is None:
+        horizon_weeks = get_settings().plan_archive_horizon_weeks
+    if horizon_weeks < get_settings().plan_archive_horizon_weeks:
+        # Plan writes only look for archives of weeks older than the setting
+        raise SystemExit(
+            "--horizon-weeks cannot be below PLAN_ARCHIVE_HORIZON_WEEKS "
+            f"({get_settings().plan_archive_horizon_weeks})"
+        )
+    before_week = (
+        date.fromisoformat(current_week_start()) - timedelta(weeks=horizon_weeks)
+    ).isoformat()
+    total = 0
+    for household_id in _household_ids(args.household_id):
+        moved = db_service.compact_weekly_plans(household_id, before_week)
+        if moved:
+            print(f"{household_id}: {moved} weeks archived")
+        total += moved
+    print(f"Done: {total} weeks before {before_week} archived")
+
+
+def resume_jobs(args: argparse.Namespace) -> None:
+    """Run background jobs that are still running or failed to completion"""
+    total = 0
+    for household_id in _household_ids(args.household_id):
+        for job in list(db_service.iter_jobs(household_id)):
+            if job["status"] == "DONE":
+                continue
+            finished = run_job(db_service, job)
+            print(f"{household_id}: job {job['job_id']} ({job['job_type']}) {finished['status']}")
+            total += 1
+    print(f"Done: {total} jobs resumed")
+
+
+def calibrate_hashing(args: argparse.Namespace) -> None:
+    """Find the highest hashing costs that meet the latency budget on this machine.
+
+    Run it on the deployment target (e.g. a Lambda with the same memory
+    size and architecture): hashing speed differs widely between machines.
+    """
+    budget_ms = args.budget_ms or get_settings().password_hash_budget_ms
+    schemes = [("bcrypt", "BCRYPT_ROUNDS")]
+    if argon2_available():
+        schemes.append(("argon2", "ARGON2_TIME_COST"))
+    else:
+        print("argon2: skipped, argon2-cffi is not installed")
+
+    for scheme, setting in schemes:
+        cost, timings = calibrate(scheme, budget_ms, args.samples)
+        for tried, ms in timings:
+            print(f"{scheme} cost {tried}: {ms:.1f} ms")
+        if cost is None:
+            print(
+                f"{scheme}: even the lowest allowed cost takes longer than {budget_ms:g} ms; "
+                f"keep {setting} at {timings[0][0]} and add workers or raise the budget"
+            )
+        else:
+            print(f"{scheme}: {setting}={cost} stays within {budget_ms:g} ms")
+
+
+def _export_files(path: Path) -> List[Path]:
+    """Data files of a DynamoDB export: a single file, or every .json/.json.gz below a directory"""
+    if path.is_file():
+        return [path]
+    return sorted(
+        p for p in path.rglob("*")
+        if p.is_file() and (p.name.endswith(".json") or p.name.endswith(".json.gz"))
+        and p.name != "manifest-summary.json" and not p.name.startswith("manifest-files")
+    )
+
+
+def _read_dynamodb_export(path: Path) -> Iterator[dict]:
+    """Yield plain items from a DynamoDB export.
+
+    Accepts "Export to S3" data files in DynamoDB JSON (one {"Item": ...}
+    per line, optionally gzipped) and `aws dynamodb scan` output ({"Items": [...]}).
+    """
+    deserializer = TypeDeserializer()
+
+    def plain(item: dict) -> dict:
+        return {key: deserializer.deserialize(value) for key, value in item.items()}
+
+    for data_file in _export_files(path):
+        opener = gzip.open if data_file.name.endswith(".gz") else open
+        with opener(data_file, "rt", encoding="utf-8") as f:
+            text = f.read()
+        try:
+            document = json.loads(text)
+        except ValueError:
+            document = None  # more than one line of JSON
+        if isinstance(document, dict) and "Items" in document:
+            items = document["Items"]
+        else:
+            items = (json.loads(line)["Item"] for line in text.splitlines() if line.strip())
+        for item in items:
+            yield plain(item)
+
+
+def migrate_dynamodb_export(args: argparse.Namespace) -> None:
+    """Load a DynamoDB table export into a SQLite database"""
+    from .services.sqlite import SQLiteStorage
+
+    sqlite_path = args.sqlite_path or get_settings().sqlite_path
+    storage = SQLiteStorage(sqlite_path)
+    imported, skipped = storage.import_items(_read_dynamodb_export(Path(args.path)))
+    print(f"Done: {imported} items imported into {sqlite_path}, {skipped} skipped")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser(
+        "backfill-tag-guards", help="Create missing TAGNAME# uniqueness items"
+    )
+    cmd.add_argument("--household-id", help="Only backfill this household")
+    cmd.set_defaults(func=backfill_tag_guards)
+
+    cmd = commands.add_parser(
+        "backfill-tag-index", help="Create missing TAGIDX# tag-to-recipe items"
+    )
+    cmd.add_argument("--household-id", help="Only backfill this household")
+    cmd.set_defaults(func=backfill_tag_index)
+
+    cmd = commands.add_parser(
+        "backfill-sync-index", help="Add older tags, recipes and rules to the gsi2 sync index"
+    )
+    cmd.add_argument("--household-id", help="Only backfill this household")
+    cmd.set_defaults(func=backfill_sync_index)
+
+    cmd = commands.add_parser(
+        "rebuild-stats", help="Recompute STATS aggregate items (backfill or repair)"
+    )
+    cmd.add_argument("--household-id", help="Only rebuild this household")
+    cmd.set_defaults(func=rebuild_stats)
+
+    cmd = commands.add_parser(
+        "compact-plans", help="Archive old WEEK# items into per-year ARCHIVE# items"
+    )
+    cmd.add_argument("--household-id", help="Only compact this household")
+    cmd.add_argument(
+        "--horizon-weeks",
+        type=int,
+        help="Archive weeks older than this (defaults to, and at least, PLAN_ARCHIVE_HORIZON_WEEKS)",
+    )
+    cmd.set_defaults(func=compact_plans)
+
+    cmd = commands.add_parser(
+        "resume-jobs", help="Finish interrupted or failed background jobs (tag cleanup)"
+    )
+    cmd.add_argument("--household-id", help="Only resume this household's jobs")
+    cmd.set_defaults(func=resume_jobs)
+
+    cmd = commands.add_parser(
+        "calibrate-hashing", help="Pick password hashing costs for a latency budget"
+    )
+    cmd.add_argument(
+        "--budget-ms",
+        type=float,
+        help="Time one hash may take (defaults to PASSWORD_HASH_BUDGET_MS)",
+    )
+    cmd.add_argument("--samples", type=int, default=3, help="Hashes timed per cost")
+    cmd.set_defaults(func=calibrate_hashing)
+
+    cmd = commands.add_parser(
+        "migrate-dynamodb-export", help="Load a DynamoDB table export into SQLite"
+    )
+    cmd.add_argument("path", help="Export data file or directory")
+    cmd.add_argument("--sqlite-path", help="Database file (defaults to SQLITE_PATH)")
+    cmd.set_defaults(func=migrate_dynamodb_export)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
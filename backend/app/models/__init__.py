@@ -1,19 +1,27 @@
-from .user import User, UserCreate, UserLogin, Token
-from .tag import Tag, TagCreate, TagUpdate, TagType
-from .recipe import Recipe, RecipeCreate, RecipeUpdate
+from .user import User, UserCreate, UserLogin, Token, RefreshRequest, TokenRefresh
+from .tag import Tag, TagCreate, TagUpdate, TagType, TagDeletionJob, JobStatus
+from .recipe import Recipe, RecipeCreate, RecipeUpdate, RecipeImportError, RecipeBulkResult
 from .rule import (
     Rule, RuleCreate, RuleUpdate, ConstraintRule, ActionRule,
     RuleKind, ConstraintType, ActionType, TargetType,
     ConstraintRuleCreate, ActionRuleCreate
 )
-from .plan import WeeklyPlan, PlanEntry, PlanEntryUpdate, ValidationResult, ValidationWarning
+from .plan import (
+    WeeklyPlan, WeeklyPlanRange, PlanEntry, PlanEntryUpdate, PlanEntriesPatch,
+    WeeklyPlanPatchResult, ValidationResult, ValidationWarning
+)
+from .stats import HouseholdStats, RecipeStats, TagStats
+from .sync import SyncResult, SyncKind, DeletedItem
 
 __all__ = [
-    "User", "UserCreate", "UserLogin", "Token",
-    "Tag", "TagCreate", "TagUpdate", "TagType",
-    "Recipe", "RecipeCreate", "RecipeUpdate",
+    "User", "UserCreate", "UserLogin", "Token", "RefreshRequest", "TokenRefresh",
+    "Tag", "TagCreate", "TagUpdate", "TagType", "TagDeletionJob", "JobStatus",
+    "Recipe", "RecipeCreate", "RecipeUpdate", "RecipeImportError", "RecipeBulkResult",
     "Rule", "RuleCreate", "RuleUpdate", "ConstraintRule", "ActionRule",
     "RuleKind", "ConstraintType", "ActionType", "TargetType",
     "ConstraintRuleCreate", "ActionRuleCreate",
-    "WeeklyPlan", "PlanEntry", "PlanEntryUpdate", "ValidationResult", "ValidationWarning"
+    "WeeklyPlan", "WeeklyPlanRange", "PlanEntry", "PlanEntryUpdate", "PlanEntriesPatch",
+    "WeeklyPlanPatchResult", "ValidationResult", "ValidationWarning",
+    "HouseholdStats", "RecipeStats", "TagStats",
+    "SyncResult", "SyncKind", "DeletedItem",
 ]
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, field_validator, model_validator
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import re
 
+from .recipe import Recipe
+
 
 class PlanEntry(BaseModel):
     recipe_id: str
@@ -29,13 +31,38 @@ class PlanEntryUpdate(BaseModel):
         return v
 
 
+class PlanEntriesPatch(BaseModel):
+    upserts: Dict[str, PlanEntry] = {}  # date -> entry to set
+    deletes: List[str] = []  # dates to clear
+
+    @field_validator("upserts", "deletes")
+    @classmethod
+    def validate_dates(cls, v):
+        for date in v:
+            if not re.match(r"^\d{4}-\d{2}-\d{2}$", date):
+                raise ValueError("Dates must be in YYYY-MM-DD format")
+        return v
+
+    @model_validator(mode="after")
+    def validate_disjoint(self):
+        if set(self.upserts) & set(self.deletes):
+            raise ValueError("A date cannot be both upserted and deleted")
+        return self
+
+
 class WeeklyPlan(BaseModel):
     week_start_date: str  # YYYY-MM-DD (Monday)
     entries: Dict[str, Optional[PlanEntry]]  # date -> entry
     household_id: str
+    version: int = 0
     updated_at: datetime
 
 
+class WeeklyPlanRange(BaseModel):
+    plans: List[WeeklyPlan]
+    recipes: Optional[List[Recipe]] = None  # only when include_recipes is set
+
+
 class ValidationWarning(BaseModel):
     rule_id: str
     type: str
@@ -45,3 +72,8 @@ class ValidationWarning(BaseModel):
 
 class ValidationResult(BaseModel):
     warnings: list
+
+
+class WeeklyPlanPatchResult(BaseModel):
+    plan: WeeklyPlan
+    validation: Optional[ValidationResult] = None  # only when validate is set
@@ -2,6 +2,11 @@ from pydantic import BaseModel, field_validator
 from datetime import datetime
 from typing import Optional, List
 
+# A recipe write changes the recipe, at most one tag index item per tag of
+# the old and the new tag list and the data version in one 100-action
+# DynamoDB transaction
+MAX_RECIPE_TAGS = 49
+
 
 class RecipeCreate(BaseModel):
     title: str
@@ -14,6 +19,8 @@ class RecipeCreate(BaseModel):
     def validate_tag_ids(cls, v):
         if not v or len(v) < 1:
             raise ValueError("At least one tag is required")
+        if len(v) > MAX_RECIPE_TAGS:
+            raise ValueError(f"At most {MAX_RECIPE_TAGS} tags per recipe")
         return v
 
     @field_validator("default_servings")
@@ -35,6 +42,8 @@ class RecipeUpdate(BaseModel):
     def validate_tag_ids(cls, v):
         if v is not None and len(v) < 1:
             raise ValueError("At least one tag is required")
+        if v is not None and len(v) > MAX_RECIPE_TAGS:
+            raise ValueError(f"At most {MAX_RECIPE_TAGS} tags per recipe")
         return v
 
 
@@ -45,5 +54,16 @@ class Recipe(BaseModel):
     default_servings: int
     notes: Optional[str]
     household_id: str
+    version: int = 0
     created_at: datetime
     updated_at: datetime
+
+
+class RecipeImportError(BaseModel):
+    index: int  # position of the record in the submitted array / NDJSON line
+    errors: List[str]
+
+
+class RecipeBulkResult(BaseModel):
+    created: List[Recipe]
+    errors: List[RecipeImportError]
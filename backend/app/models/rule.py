@@ -93,6 +93,7 @@ class ConstraintRule(BaseModel):
     max_count: int
     enabled: bool
     household_id: str
+    version: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -109,6 +110,7 @@ class ActionRule(BaseModel):
     message_template: str
     enabled: bool
     household_id: str
+    version: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class RecipeStats(BaseModel):
+    recipe_id: str
+    plan_count: int  # plan entries currently using the recipe
+    last_planned: Optional[str] = None  # YYYY-MM-DD
+
+
+class TagStats(BaseModel):
+    tag_id: str
+    recipe_count: int
+    last_planned: Optional[str] = None  # YYYY-MM-DD
+
+
+class HouseholdStats(BaseModel):
+    household_id: str
+    recipes: List[RecipeStats]  # most planned first
+    tags: List[TagStats]  # most used first
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from enum import Enum
+from typing import List
+
+from .tag import Tag
+from .recipe import Recipe
+from .rule import Rule
+
+
+class SyncKind(str, Enum):
+    TAG = "tag"
+    RECIPE = "recipe"
+    RULE = "rule"
+
+
+class DeletedItem(BaseModel):
+    kind: SyncKind
+    id: str
+
+
+class SyncResult(BaseModel):
+    tags: List[Tag]  # created or updated since the cursor
+    recipes: List[Recipe]
+    rules: List[Rule]
+    deleted: List[DeletedItem]
+    cursor: str  # pass as `since` on the next call
+    has_more: bool  # more changes are waiting; call again with `cursor` right away
+    reset: bool  # the lists are the complete data; replace local copies
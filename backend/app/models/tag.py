@@ -27,3 +27,23 @@ class Tag(BaseModel):
     type: TagType
     household_id: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class JobStatus(str, Enum):
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class TagDeletionJob(BaseModel):
+    job_id: str
+    tag_id: str
+    status: JobStatus
+    recipes_total: int  # recipes carrying the tag when it was deleted
+    recipes_updated: int
+    rules_deleted: int  # constraint rules on the tag
+    rules_disabled: int  # action rules targeting the tag
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
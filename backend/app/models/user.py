@@ -21,5 +21,19 @@ class User(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
+    # Seconds until the access token expires
+    expires_in: int
     user: User
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class TokenRefresh(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    expires_in: int
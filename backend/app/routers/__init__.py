@@ -3,5 +3,7 @@ from .tags import router as tags_router
 from .recipes import router as recipes_router
 from .rules import router as rules_router
 from .plans import router as plans_router
+from .stats import router as stats_router
+from .sync import router as sync_router
 
-__all__ = ["auth_router", "tags_router", "recipes_router", "rules_router", "plans_router"]
+__all__ = ["auth_router", "tags_router", "recipes_router", "rules_router", "plans_router", "stats_router", "sync_router"]
@@ -1,21 +1,21 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Request, status
 from datetime import datetime
 
-from ..models import UserCreate, UserLogin, Token, User
+from ..config import get_settings
+from ..models import UserCreate, UserLogin, Token, User, RefreshRequest, TokenRefresh
 from ..services.auth import auth_service
-from ..services.dynamodb import db_service
+from ..services.login_throttle import login_throttle
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-@router.post("/register", response_model=Token)
-async def register(user_data: UserCreate):
-    """Register a new user"""
-    user = auth_service.register_user(user_data.email, user_data.password)
-    token = auth_service.create_access_token(user["user_id"], user["household_id"])
-
+async def _signed_in(user: dict) -> Token:
+    """Start a session for `user` and build the token response"""
+    access_token, refresh_token = await auth_service.start_session(user)
     return Token(
-        access_token=token,
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=get_settings().access_token_minutes * 60,
         user=User(
             user_id=user["user_id"],
             email=user["email"],
@@ -25,18 +25,38 @@ async def register(user_data: UserCreate):
     )
 
 
-@router.post("/login", response_model=Token)
-async def login(credentials: UserLogin):
-    """Login and get access token"""
-    user = auth_service.authenticate_user(credentials.email, credentials.password)
-    token = auth_service.create_access_token(user["user_id"], user["household_id"])
+@router.post("/register", response_model=Token)
+async def register(user_data: UserCreate, request: Request):
+    """Register a new user"""
+    # Hashing the password costs as much as a login, so it is throttled alike
+    client_ip = request.client.host if request.client else "unknown"
+    await login_throttle.check(client_ip, user_data.email)
+    user = await auth_service.register_user(user_data.email, user_data.password)
+    return await _signed_in(user)
 
-    return Token(
-        access_token=token,
-        user=User(
-            user_id=user["user_id"],
-            email=user["email"],
-            household_id=user["household_id"],
-            created_at=datetime.fromisoformat(user["created_at"]),
-        ),
+
+@router.post("/login", response_model=Token)
+async def login(credentials: UserLogin, request: Request):
+    """Login and get access and refresh tokens"""
+    # Throttled before the user lookup and the password check
+    client_ip = request.client.host if request.client else "unknown"
+    await login_throttle.check(client_ip, credentials.email)
+    user = await auth_service.authenticate_user(credentials.email, credentials.password)
+    return await _signed_in(user)
+
+
+@router.post("/refresh", response_model=TokenRefresh)
+async def refresh(request: RefreshRequest):
+    """Exchange a refresh token for new tokens; the old refresh token stops working"""
+    access_token, refresh_token = await auth_service.refresh_session(request.refresh_token)
+    return TokenRefresh(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=get_settings().access_token_minutes * 60,
     )
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: RefreshRequest):
+    """End the session of a refresh token and revoke its access tokens"""
+    await auth_service.logout(request.refresh_token)
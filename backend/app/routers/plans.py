@@ -1,29 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterable, Optional
+import asyncio
+import logging
 
-from ..models import WeeklyPlan, PlanEntry, PlanEntryUpdate, ValidationResult
+from ..models import (
+    WeeklyPlan, WeeklyPlanRange, PlanEntry, PlanEntryUpdate, PlanEntriesPatch,
+    WeeklyPlanPatchResult, ValidationResult
+)
 from ..services.auth import get_current_user
-from ..services.dynamodb import db_service
+from ..services.async_dynamodb import async_db
+from ..services.storage import VersionConflictError
 from ..utils.validation import validate_plan
 from ..utils.ics_generator import generate_ics
+from ..utils.fields import parse_fields, project_response
+from ..utils.formatters import format_recipe
+from ..utils.etag import set_etag, parse_if_match, not_modified, precondition_failed
+from ..utils.pagination import NEXT_CURSOR_HEADER
+from ..config import get_settings
 
 router = APIRouter(prefix="/plans", tags=["plans"])
 
+logger = logging.getLogger("mealprepbuddy.plans")
 
-@router.get("/{week_start_date}", response_model=WeeklyPlan)
-async def get_weekly_plan(
-    week_start_date: str,
-    current_user: dict = Depends(get_current_user),
-):
-    """Get weekly plan for a specific week (week_start_date is Monday YYYY-MM-DD)"""
-    plan = db_service.get_weekly_plan(current_user["household_id"], week_start_date)
 
+def _format_plan(plan: Optional[dict], week_start_date: str, household_id: str) -> WeeklyPlan:
+    """Convert DynamoDB item to WeeklyPlan model (an empty plan if there is none)"""
     if not plan:
-        # Return empty plan structure
         return WeeklyPlan(
             week_start_date=week_start_date,
             entries={},
-            household_id=current_user["household_id"],
+            household_id=household_id,
             updated_at=datetime.utcnow(),
         )
 
@@ -42,80 +50,224 @@ async def get_weekly_plan(
         week_start_date=plan["week_start_date"],
         entries=entries,
         household_id=plan["household_id"],
+        version=plan.get("version", 0),
         updated_at=datetime.fromisoformat(plan["updated_at"]),
     )
 
 
-@router.put("/{week_start_date}/entry")
-async def update_plan_entry(
+def _check_week_dates(week_start_date: str, dates: Iterable[str]) -> None:
+    """400 unless every date falls in the week starting on week_start_date"""
+    try:
+        start = datetime.fromisoformat(week_start_date)
+        outside = sorted(
+            day for day in dates
+            if not start <= datetime.fromisoformat(day) <= start + timedelta(days=6)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if outside:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Dates outside the week of {week_start_date}: {', '.join(outside)}",
+        )
+
+
+@router.get("", response_model=WeeklyPlanRange)
+async def get_weekly_plans(
+    from_week: str = Query(..., alias="from", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    to_week: str = Query(..., alias="to", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    include_recipes: bool = Query(False, description="Also return the recipes the plans use"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Get the weekly plans whose week starts between `from` and `to` (inclusive).
+
+    Without limit or cursor every plan in the range is returned, streamed
+    out page by page as DynamoDB returns them. With limit or cursor only
+    one page is returned and the next page's cursor is in X-Next-Cursor.
+    """
+    if from_week > to_week:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must not be after 'to'",
+        )
+    household_id = current_user["household_id"]
+    paginated = limit is not None or cursor is not None
+    page_size = limit or get_settings().default_page_size
+
+    # Read the first page before streaming so a bad cursor is still a 400
+    try:
+        plans, next_cursor = await async_db.get_weekly_plans_page(
+            household_id, from_week, to_week, page_size, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def body() -> AsyncIterator[str]:
+        nonlocal plans, next_cursor
+        recipe_ids = set()
+        separator = ""
+        yield '{"plans":['
+        try:
+            while True:
+                for plan in plans:
+                    recipe_ids.update(
+                        entry["recipe_id"] for entry in plan.get("entries", {}).values() if entry
+                    )
+                    yield separator + _format_plan(
+                        plan, plan["week_start_date"], household_id
+                    ).model_dump_json()
+                    separator = ","
+                if paginated or not next_cursor:
+                    break
+                plans, next_cursor = await async_db.get_weekly_plans_page(
+                    household_id, from_week, to_week, page_size, next_cursor
+                )
+            yield "]"
+
+            if include_recipes:
+                recipes = await async_db.get_recipes_by_id(household_id, sorted(recipe_ids))
+                yield ',"recipes":['
+                yield ",".join(format_recipe(r).model_dump_json() for r in recipes)
+                yield "]"
+        except Exception:
+            # The 200 status is already sent; re-raising makes the server
+            # abort the response, so the client sees an incomplete body
+            # rather than JSON that merely stops early
+            logger.exception("Streaming plans %s..%s failed", from_week, to_week)
+            raise
+        yield "}"
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if paginated and next_cursor else None
+    return StreamingResponse(body(), media_type="application/json", headers=headers)
+
+
+@router.get("/{week_start_date}", response_model=WeeklyPlan)
+async def get_weekly_plan(
     week_start_date: str,
-    entry_data: PlanEntryUpdate,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: dict = Depends(get_current_user),
 ):
-    """Add or update a plan entry"""
-    plan = db_service.update_plan_entry(
-        current_user["household_id"],
-        week_start_date,
-        entry_data.date,
-        entry_data.recipe_id,
-        entry_data.servings,
+    """Get weekly plan for a specific week (week_start_date is Monday YYYY-MM-DD)"""
+    projection = parse_fields(fields, WeeklyPlan, always=["week_start_date"])
+    # The ETag needs the version even when it was not asked for
+    db_fields = projection and list(dict.fromkeys([*projection, "version"]))
+    plan = await async_db.get_weekly_plan(
+        current_user["household_id"], week_start_date, db_fields
     )
 
-    entries = {}
-    for date, entry in plan.get("entries", {}).items():
-        if entry:
-            entries[date] = PlanEntry(
-                recipe_id=entry["recipe_id"],
-                servings=entry["servings"],
-            )
-        else:
-            entries[date] = None
+    version = (plan or {}).get("version", 0)
+    cached = not_modified(request, version)
+    if cached:
+        return cached
+    set_etag(response, version)
 
-    return WeeklyPlan(
-        week_start_date=plan["week_start_date"],
-        entries=entries,
-        household_id=plan["household_id"],
-        updated_at=datetime.fromisoformat(plan["updated_at"]),
-    )
+    if projection:
+        if not plan:
+            plan = {
+                "week_start_date": week_start_date,
+                "entries": {},
+                "household_id": current_user["household_id"],
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+        return project_response(plan, WeeklyPlan, projection, dict(response.headers))
 
+    return _format_plan(plan, week_start_date, current_user["household_id"])
 
-@router.delete("/{week_start_date}/entry")
+
+@router.put("/{week_start_date}/entry", response_model=WeeklyPlan)
+async def update_plan_entry(
+    week_start_date: str,
+    entry_data: PlanEntryUpdate,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+):
+    """Add or update a plan entry (send If-Match to reject stale edits)"""
+    try:
+        plan = await async_db.update_plan_entry(
+            current_user["household_id"],
+            week_start_date,
+            entry_data.date,
+            entry_data.recipe_id,
+            entry_data.servings,
+            parse_if_match(request),
+        )
+    except VersionConflictError as e:
+        raise precondition_failed(e.current_version)
+
+    set_etag(response, plan.get("version"))
+    return _format_plan(plan, week_start_date, current_user["household_id"])
+
+
+@router.delete("/{week_start_date}/entry", response_model=WeeklyPlan)
 async def delete_plan_entry(
     week_start_date: str,
+    request: Request,
+    response: Response,
     date: str = Query(..., description="Date to delete (YYYY-MM-DD)"),
     current_user: dict = Depends(get_current_user),
 ):
-    """Delete a plan entry"""
-    plan = db_service.delete_plan_entry(
-        current_user["household_id"],
+    """Delete a plan entry (send If-Match to reject stale edits)"""
+    try:
+        plan = await async_db.delete_plan_entry(
+            current_user["household_id"],
+            week_start_date,
+            date,
+            parse_if_match(request),
+        )
+    except VersionConflictError as e:
+        raise precondition_failed(e.current_version)
+
+    set_etag(response, plan.get("version"))
+    return _format_plan(plan, week_start_date, current_user["household_id"])
+
+
+@router.patch("/{week_start_date}", response_model=WeeklyPlanPatchResult)
+async def patch_weekly_plan(
+    week_start_date: str,
+    patch: PlanEntriesPatch,
+    request: Request,
+    response: Response,
+    validate: bool = Query(False, description="Also validate the resulting plan"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Set and clear several plan entries in one write (send If-Match to reject stale edits)"""
+    household_id = current_user["household_id"]
+    # At most the week's 7 dates, so the update stays one small expression
+    _check_week_dates(week_start_date, [*patch.upserts, *patch.deletes])
+    write = async_db.patch_plan_entries(
+        household_id,
         week_start_date,
-        date,
+        {date: entry.model_dump() for date, entry in patch.upserts.items()},
+        patch.deletes,
+        parse_if_match(request),
     )
 
-    if not plan:
-        return WeeklyPlan(
-            week_start_date=week_start_date,
-            entries={},
-            household_id=current_user["household_id"],
-            updated_at=datetime.utcnow(),
-        )
-
-    entries = {}
-    for d, entry in plan.get("entries", {}).items():
-        if entry:
-            entries[d] = PlanEntry(
-                recipe_id=entry["recipe_id"],
-                servings=entry["servings"],
+    try:
+        if validate:
+            # Recipes, rules and tags do not depend on the write, so load them alongside it
+            plan, snapshot = await asyncio.gather(
+                write, async_db.get_household_snapshot(household_id, week_start_date)
             )
         else:
-            entries[d] = None
+            plan, snapshot = await write, None
+    except VersionConflictError as e:
+        raise precondition_failed(e.current_version)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    return WeeklyPlan(
-        week_start_date=plan["week_start_date"],
-        entries=entries,
-        household_id=plan["household_id"],
-        updated_at=datetime.fromisoformat(plan["updated_at"]),
-    )
+    set_etag(response, plan.get("version"))
+    result = WeeklyPlanPatchResult(plan=_format_plan(plan, week_start_date, household_id))
+    if snapshot:
+        warnings = validate_plan(
+            plan.get("entries", {}), snapshot.recipes, snapshot.rules, snapshot.tags
+        )
+        result.validation = ValidationResult(warnings=warnings)
+    return result
 
 
 @router.post("/{week_start_date}/validate", response_model=ValidationResult)
@@ -124,16 +276,13 @@ async def validate_weekly_plan(
     current_user: dict = Depends(get_current_user),
 ):
     """Validate the weekly plan against constraint rules"""
-    household_id = current_user["household_id"]
-
-    plan = db_service.get_weekly_plan(household_id, week_start_date)
-    plan_entries = plan.get("entries", {}) if plan else {}
-
-    recipes = db_service.get_recipes(household_id)
-    rules = db_service.get_rules(household_id)
-    tags = db_service.get_tags(household_id)
+    snapshot = await async_db.get_household_snapshot(
+        current_user["household_id"], week_start_date
+    )
 
-    warnings = validate_plan(plan_entries, recipes, rules, tags)
+    warnings = validate_plan(
+        snapshot.plan_entries, snapshot.recipes, snapshot.rules, snapshot.tags
+    )
 
     return ValidationResult(warnings=warnings)
 
@@ -144,28 +293,22 @@ async def export_ics(
     current_user: dict = Depends(get_current_user),
 ):
     """Export the weekly plan as an ICS calendar file"""
-    household_id = current_user["household_id"]
-
-    plan = db_service.get_weekly_plan(household_id, week_start_date)
-    plan_entries = plan.get("entries", {}) if plan else {}
+    snapshot = await async_db.get_household_snapshot(
+        current_user["household_id"], week_start_date
+    )
 
-    if not plan_entries:
+    if not snapshot.plan_entries:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No plan entries found for this week",
         )
 
-    recipes = db_service.get_recipes(household_id)
-    rules = db_service.get_rules(household_id)
-    tags = db_service.get_tags(household_id)
-    household = db_service.get_household(household_id)
-
     ics_content = generate_ics(
-        plan_entries,
-        recipes,
-        rules,
-        tags,
-        household,
+        snapshot.plan_entries,
+        snapshot.recipes,
+        snapshot.rules,
+        snapshot.tags,
+        snapshot.household,
         week_start_date,
     )
 
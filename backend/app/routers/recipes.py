@@ -1,74 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from datetime import datetime
-from typing import Optional, List
-
-from ..models import Recipe, RecipeCreate, RecipeUpdate
+from botocore.exceptions import ClientError
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, Optional, List
+import json
+import logging
+import sqlite3
+
+from ..models import (
+    Recipe, RecipeCreate, RecipeUpdate, RecipeImportError, RecipeBulkResult,
+)
 from ..services.auth import get_current_user
-from ..services.dynamodb import db_service
+from ..services.async_dynamodb import async_db
+from ..services.dynamodb import BATCH_WRITE_SIZE
+from ..services.storage import VersionConflictError
+from ..config import get_settings
+from ..utils.pagination import set_next_cursor
+from ..utils.fields import parse_fields, project_response
+from ..utils.formatters import format_recipe
+from ..utils.etag import set_etag, parse_if_match, not_modified, precondition_failed
 
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/jsonl"}
+
+logger = logging.getLogger("mealprepbuddy.recipes")
+
+
+async def _iter_import_records(request: Request) -> AsyncIterator[Any]:
+    """Yield raw import records from a JSON array or an NDJSON stream.
+
+    NDJSON lines are yielded as bytes so a malformed line is reported
+    against that record instead of failing the whole import.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if media_type in NDJSON_MEDIA_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        records = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be JSON")
+    if not isinstance(records, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON",
+        )
+    for record in records:
+        yield record
+
 
 @router.get("", response_model=List[Recipe])
 async def get_recipes(
+    response: Response,
     tag_id: Optional[str] = Query(None, description="Filter by tag ID"),
     q: Optional[str] = Query(None, description="Search query"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: dict = Depends(get_current_user),
 ):
-    """Get all recipes, optionally filtered by tag or search query"""
-    recipes = db_service.get_recipes(current_user["household_id"], tag_id)
+    """Get recipes, optionally filtered by tag or search query.
+
+    Paginated when limit or cursor is given; the search query is applied
+    to each page, so a page may hold fewer than `limit` matches. With
+    `fields`, only those attributes are read and returned.
+    """
+    household_id = current_user["household_id"]
+    projection = parse_fields(fields, Recipe, always=["recipe_id"])
+    db_fields = projection
+    if projection and q:
+        # The search runs on loaded items, so it needs the searched attributes
+        db_fields = projection + ["title_lower", "notes"]
+
+    if limit is None and cursor is None:
+        recipes = await async_db.get_recipes(household_id, tag_id, db_fields)
+    else:
+        try:
+            recipes, next_cursor = await async_db.get_recipes_page(
+                household_id,
+                limit or get_settings().default_page_size,
+                cursor,
+                tag_id,
+                db_fields,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        set_next_cursor(response, next_cursor)
 
     if q:
         q_lower = q.lower()
-        recipes = [
+        recipes = (
             r for r in recipes
             if q_lower in r.get("title_lower", "") or q_lower in r.get("notes", "").lower()
-        ]
-
-    return [
-        Recipe(
-            recipe_id=r["recipe_id"],
-            title=r["title"],
-            tag_ids=r["tag_ids"],
-            default_servings=r["default_servings"],
-            notes=r.get("notes"),
-            household_id=r["household_id"],
-            created_at=datetime.fromisoformat(r["created_at"]),
-            updated_at=datetime.fromisoformat(r["updated_at"]),
         )
-        for r in recipes
-    ]
+
+    if projection:
+        return project_response(recipes, Recipe, projection, dict(response.headers))
+    return [format_recipe(r) for r in recipes]
 
 
 @router.get("/{recipe_id}", response_model=Recipe)
 async def get_recipe(
     recipe_id: str,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
 ):
-    """Get a single recipe"""
-    recipe = db_service.get_recipe(current_user["household_id"], recipe_id)
+    """Get a single recipe (304 when If-None-Match names the current version)"""
+    recipe = await async_db.get_recipe(current_user["household_id"], recipe_id)
     if not recipe:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipe not found")
 
-    return Recipe(
-        recipe_id=recipe["recipe_id"],
-        title=recipe["title"],
-        tag_ids=recipe["tag_ids"],
-        default_servings=recipe["default_servings"],
-        notes=recipe.get("notes"),
-        household_id=recipe["household_id"],
-        created_at=datetime.fromisoformat(recipe["created_at"]),
-        updated_at=datetime.fromisoformat(recipe["updated_at"]),
-    )
+    cached = not_modified(request, recipe.get("version"))
+    if cached:
+        return cached
+    set_etag(response, recipe.get("version"))
+    return format_recipe(recipe)
 
 
 @router.post("", response_model=Recipe, status_code=status.HTTP_201_CREATED)
 async def create_recipe(
     recipe_data: RecipeCreate,
+    response: Response,
     current_user: dict = Depends(get_current_user),
 ):
     """Create a new recipe"""
-    recipe = db_service.create_recipe(
+    recipe = await async_db.create_recipe(
         current_user["household_id"],
         recipe_data.title,
         recipe_data.tag_ids,
@@ -76,25 +142,84 @@ async def create_recipe(
         recipe_data.notes,
     )
 
-    return Recipe(
-        recipe_id=recipe["recipe_id"],
-        title=recipe["title"],
-        tag_ids=recipe["tag_ids"],
-        default_servings=recipe["default_servings"],
-        notes=recipe.get("notes"),
-        household_id=recipe["household_id"],
-        created_at=datetime.fromisoformat(recipe["created_at"]),
-        updated_at=datetime.fromisoformat(recipe["updated_at"]),
-    )
+    set_etag(response, recipe["version"])
+    return format_recipe(recipe)
+
+
+@router.post("/bulk", response_model=RecipeBulkResult)
+async def bulk_create_recipes(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Import many recipes from a JSON array or NDJSON (one RecipeCreate per line).
+
+    Records are validated as they arrive and written in BatchWriteItem
+    chunks once the whole body has been read, so an import over the record
+    limit is refused before anything is written. Invalid or unwritable
+    records are reported by their position.
+    """
+    household_id = current_user["household_id"]
+    max_records = get_settings().bulk_import_max_records
+    created: List[Recipe] = []
+    errors: List[RecipeImportError] = []
+    valid: List[tuple] = []  # (index, validated record)
+
+    async def write(chunk: List[tuple]):
+        try:
+            items, failed = await async_db.create_recipes_batch(
+                household_id, [record for _, record in chunk]
+            )
+        except (ClientError, sqlite3.Error):
+            # Rejected writes are reported per record; an error here means the
+            # storage could not take the chunk at all
+            logger.exception("Bulk import chunk failed for household %s", household_id)
+            items, failed = [], range(len(chunk))
+        created.extend(format_recipe(item) for item in items)
+        errors.extend(
+            RecipeImportError(index=chunk[i][0], errors=["Write failed, please retry"])
+            for i in failed
+        )
+
+    index = -1
+    async for raw in _iter_import_records(request):
+        index += 1
+        if index >= max_records:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {max_records} recipes per import",
+            )
+        try:
+            if isinstance(raw, bytes):
+                raw = json.loads(raw)
+            record = RecipeCreate.model_validate(raw)
+        except ValidationError as e:
+            messages = [
+                f"{'.'.join(map(str, err['loc'])) or 'record'}: {err['msg']}"
+                for err in e.errors()
+            ]
+            errors.append(RecipeImportError(index=index, errors=messages))
+            continue
+        except ValueError as e:
+            errors.append(RecipeImportError(index=index, errors=[f"Invalid JSON: {e}"]))
+            continue
+
+        valid.append((index, record.model_dump()))
+
+    for start in range(0, len(valid), BATCH_WRITE_SIZE):
+        await write(valid[start:start + BATCH_WRITE_SIZE])
+
+    return RecipeBulkResult(created=created, errors=sorted(errors, key=lambda e: e.index))
 
 
 @router.patch("/{recipe_id}", response_model=Recipe)
 async def update_recipe(
     recipe_id: str,
     recipe_data: RecipeUpdate,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
 ):
-    """Update a recipe"""
+    """Update a recipe (send If-Match to reject stale edits)"""
     updates = {}
     if recipe_data.title is not None:
         updates["title"] = recipe_data.title
@@ -105,20 +230,17 @@ async def update_recipe(
     if recipe_data.notes is not None:
         updates["notes"] = recipe_data.notes
 
-    recipe = db_service.update_recipe(current_user["household_id"], recipe_id, updates)
+    try:
+        recipe = await async_db.update_recipe(
+            current_user["household_id"], recipe_id, updates, parse_if_match(request)
+        )
+    except VersionConflictError as e:
+        raise precondition_failed(e.current_version)
     if not recipe:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipe not found")
 
-    return Recipe(
-        recipe_id=recipe["recipe_id"],
-        title=recipe["title"],
-        tag_ids=recipe["tag_ids"],
-        default_servings=recipe["default_servings"],
-        notes=recipe.get("notes"),
-        household_id=recipe["household_id"],
-        created_at=datetime.fromisoformat(recipe["created_at"]),
-        updated_at=datetime.fromisoformat(recipe["updated_at"]),
-    )
+    set_etag(response, recipe["version"])
+    return format_recipe(recipe)
 
 
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -127,4 +249,4 @@ async def delete_recipe(
     current_user: dict = Depends(get_current_user),
 ):
     """Delete a recipe"""
-    db_service.delete_recipe(current_user["household_id"], recipe_id)
+    await async_db.delete_recipe(current_user["household_id"], recipe_id)
@@ -1,55 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import datetime
-from typing import Union
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from typing import Optional
 
 from ..models import (
-    Rule, RuleUpdate, ConstraintRule, ActionRule,
-    RuleKind, ConstraintType, ActionType, TargetType,
+    RuleUpdate, ConstraintRule, ActionRule,
+    ConstraintType, ActionType, TargetType,
     ConstraintRuleCreate, ActionRuleCreate,
 )
 from ..services.auth import get_current_user
-from ..services.dynamodb import db_service
+from ..services.async_dynamodb import async_db
+from ..services.storage import VersionConflictError
+from ..config import get_settings
+from ..utils.pagination import set_next_cursor
+from ..utils.fields import parse_fields, project_response
+from ..utils.formatters import format_rule
+from ..utils.etag import set_etag, parse_if_match, precondition_failed
 
 router = APIRouter(prefix="/rules", tags=["rules"])
 
-
-def _format_rule(r: dict) -> Union[ConstraintRule, ActionRule]:
-    """Convert DynamoDB item to Rule model"""
-    if r["rule_kind"] == "CONSTRAINT":
-        return ConstraintRule(
-            rule_id=r["rule_id"],
-            rule_kind=RuleKind.CONSTRAINT,
-            constraint_type=ConstraintType(r["constraint_type"]),
-            tag_id=r["tag_id"],
-            max_count=r["max_count"],
-            enabled=r["enabled"],
-            household_id=r["household_id"],
-            created_at=datetime.fromisoformat(r["created_at"]),
-            updated_at=datetime.fromisoformat(r["updated_at"]),
-        )
-    else:
-        return ActionRule(
-            rule_id=r["rule_id"],
-            rule_kind=RuleKind.ACTION,
-            action_type=ActionType(r["action_type"]),
-            target_type=TargetType(r["target_type"]),
-            tag_id=r.get("tag_id"),
-            recipe_id=r.get("recipe_id"),
-            offset_days=r["offset_days"],
-            time_local=r["time_local"],
-            message_template=r["message_template"],
-            enabled=r["enabled"],
-            household_id=r["household_id"],
-            created_at=datetime.fromisoformat(r["created_at"]),
-            updated_at=datetime.fromisoformat(r["updated_at"]),
-        )
+RULE_MODELS = (ConstraintRule, ActionRule)
 
 
 @router.get("")
-async def get_rules(current_user: dict = Depends(get_current_user)):
-    """Get all rules for the household"""
-    rules = db_service.get_rules(current_user["household_id"])
-    return [_format_rule(r) for r in rules]
+async def get_rules(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Get rules for the household, paginated when limit or cursor is given"""
+    household_id = current_user["household_id"]
+    projection = parse_fields(fields, RULE_MODELS, always=["rule_id"])
+    if limit is None and cursor is None:
+        rules = await async_db.get_rules(household_id, projection)
+    else:
+        try:
+            rules, next_cursor = await async_db.get_rules_page(
+                household_id, limit or get_settings().default_page_size, cursor, projection
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        set_next_cursor(response, next_cursor)
+
+    if projection:
+        return project_response(rules, RULE_MODELS, projection, dict(response.headers))
+    return [format_rule(r) for r in rules]
 
 
 @router.post("/constraint/max_meals_per_week_by_tag", status_code=status.HTTP_201_CREATED)
@@ -58,14 +53,14 @@ async def create_constraint_rule(
     current_user: dict = Depends(get_current_user),
 ):
     """Create a MAX_MEALS_PER_WEEK_BY_TAG constraint rule"""
-    rule = db_service.create_constraint_rule(
+    rule = await async_db.create_constraint_rule(
         current_user["household_id"],
         ConstraintType.MAX_MEALS_PER_WEEK_BY_TAG.value,
         rule_data.tag_id,
         rule_data.max_count,
         rule_data.enabled,
     )
-    return _format_rule(rule)
+    return format_rule(rule)
 
 
 @router.post("/action/remind_offset_days_before_dinner", status_code=status.HTTP_201_CREATED)
@@ -86,7 +81,7 @@ async def create_action_rule(
             detail="recipe_id required when target_type is RECIPE",
         )
 
-    rule = db_service.create_action_rule(
+    rule = await async_db.create_action_rule(
         current_user["household_id"],
         ActionType.REMIND_OFFSET_DAYS_BEFORE_DINNER.value,
         rule_data.target_type.value,
@@ -97,16 +92,18 @@ async def create_action_rule(
         rule_data.message_template,
         rule_data.enabled,
     )
-    return _format_rule(rule)
+    return format_rule(rule)
 
 
 @router.patch("/{rule_id}")
 async def update_rule(
     rule_id: str,
     rule_data: RuleUpdate,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
 ):
-    """Update a rule"""
+    """Update a rule (send If-Match to reject stale edits)"""
     updates = {}
     if rule_data.enabled is not None:
         updates["enabled"] = rule_data.enabled
@@ -119,11 +116,17 @@ async def update_rule(
     if rule_data.message_template is not None:
         updates["message_template"] = rule_data.message_template
 
-    rule = db_service.update_rule(current_user["household_id"], rule_id, updates)
+    try:
+        rule = await async_db.update_rule(
+            current_user["household_id"], rule_id, updates, parse_if_match(request)
+        )
+    except VersionConflictError as e:
+        raise precondition_failed(e.current_version)
     if not rule:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
 
-    return _format_rule(rule)
+    set_etag(response, rule.get("version"))
+    return format_rule(rule)
 
 
 @router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -132,4 +135,4 @@ async def delete_rule(
     current_user: dict = Depends(get_current_user),
 ):
     """Delete a rule"""
-    db_service.delete_rule(current_user["household_id"], rule_id)
+    await async_db.delete_rule(current_user["household_id"], rule_id)
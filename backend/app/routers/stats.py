@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends
+from datetime import datetime
+
+from ..models import HouseholdStats, RecipeStats, TagStats
+from ..services.auth import get_current_user
+from ..services.async_dynamodb import async_db
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("", response_model=HouseholdStats)
+async def get_household_stats(current_user: dict = Depends(get_current_user)):
+    """Recipe and tag usage for the household.
+
+    Read from one aggregate item kept up to date by the change feed, so
+    figures can trail the latest writes briefly.
+    """
+    household_id = current_user["household_id"]
+    stats = await async_db.get_household_stats(household_id)
+    # A deleted tag's figures linger until its recipes are untagged
+    tag_ids = {tag["tag_id"] for tag in await async_db.get_tags(household_id, ["tag_id"])}
+
+    plan_counts = stats["recipe_plan_counts"]
+    recipe_last = stats["recipe_last_planned"]
+    recipes = [
+        RecipeStats(
+            recipe_id=recipe_id,
+            plan_count=int(plan_counts.get(recipe_id, 0)),
+            last_planned=recipe_last.get(recipe_id),
+        )
+        for recipe_id in set(plan_counts) | set(recipe_last)
+    ]
+    recipes.sort(key=lambda r: (-r.plan_count, r.recipe_id))
+
+    recipe_counts = stats["tag_recipe_counts"]
+    tag_last = stats["tag_last_planned"]
+    tags = [
+        TagStats(
+            tag_id=tag_id,
+            recipe_count=int(recipe_counts.get(tag_id, 0)),
+            last_planned=tag_last.get(tag_id),
+        )
+        for tag_id in (set(recipe_counts) | set(tag_last)) & tag_ids
+    ]
+    tags.sort(key=lambda t: (-t.recipe_count, t.tag_id))
+
+    updated_at = stats.get("updated_at")
+    return HouseholdStats(
+        household_id=household_id,
+        recipes=recipes,
+        tags=tags,
+        updated_at=datetime.fromisoformat(updated_at) if updated_at else None,
+    )
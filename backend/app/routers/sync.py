@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import base64
+import json
+
+from ..models import SyncResult, SyncKind, DeletedItem
+from ..services.auth import get_current_user
+from ..services.async_dynamodb import async_db
+from ..services.storage import SYNC_KINDS, TOMBSTONE_PREFIX
+from ..config import get_settings
+from ..utils.formatters import format_tag, format_recipe, format_rule
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+def _encode_token(since: str, page: Optional[str] = None) -> str:
+    raw = json.dumps({"since": since, "page": page}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_token(token: str) -> Tuple[str, Optional[str]]:
+    """(since, page cursor) of a sync cursor"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        since, page = data["since"], data.get("page")
+        datetime.fromisoformat(since)
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid sync cursor")
+    if page is not None and not isinstance(page, str):
+        raise ValueError("Invalid sync cursor")
+    return since, page
+
+
+def _next_since(started_at: datetime) -> str:
+    # Writes landing in the index late, or stamped by a slightly slow clock,
+    # still fall inside the next window; clients see them at most twice
+    return (started_at - timedelta(seconds=get_settings().sync_window_seconds)).isoformat()
+
+
+@router.get("", response_model=SyncResult)
+async def sync(
+    since: Optional[str] = Query(None, description="Cursor from the previous sync"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Most changes to return"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Tags, recipes and rules changed since a cursor, and ids of deleted ones.
+
+    Without `since`, or when it is older than deletions are remembered
+    (`reset` is true), everything is returned. Apply the changes in order,
+    then call again with the returned cursor; while `has_more` is true,
+    more changes are waiting.
+    """
+    household_id = current_user["household_id"]
+    settings = get_settings()
+    started_at = datetime.utcnow()
+
+    page = None
+    if since is not None:
+        try:
+            since, page = _decode_token(since)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if since < (started_at - timedelta(days=settings.sync_tombstone_days)).isoformat():
+            # Tombstones of deletions since then may have expired
+            since = None
+
+    if since is None:
+        tags = await async_db.get_tags(household_id)
+        recipes = await async_db.get_recipes(household_id)
+        rules = await async_db.get_rules(household_id)
+        return SyncResult(
+            tags=[format_tag(t) for t in tags],
+            recipes=[format_recipe(r) for r in recipes],
+            rules=[format_rule(r) for r in rules],
+            deleted=[],
+            cursor=_encode_token(_next_since(started_at)),
+            has_more=False,
+            reset=True,
+        )
+
+    try:
+        items, next_page = await async_db.get_changes(
+            household_id, since, limit or settings.default_page_size, page
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    changed = {kind: [] for kind in SYNC_KINDS.values()}
+    deleted = []
+    for item in items:
+        if item["sk"].startswith(TOMBSTONE_PREFIX):
+            deleted.append(DeletedItem(kind=SyncKind(item["kind"]), id=item["item_id"]))
+        else:
+            changed[SYNC_KINDS[item["sk"].split("#", 1)[0] + "#"]].append(item)
+
+    if next_page:
+        cursor = _encode_token(since, next_page)
+    else:
+        cursor = _encode_token(_next_since(started_at))
+    return SyncResult(
+        tags=[format_tag(t) for t in changed["tag"]],
+        recipes=[format_recipe(r) for r in changed["recipe"]],
+        rules=[format_rule(r) for r in changed["rule"]],
+        deleted=deleted,
+        cursor=cursor,
+        has_more=next_page is not None,
+        reset=False,
+    )
@@ -1,28 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from ..models import Tag, TagCreate, TagUpdate, TagType
+from ..models import Tag, TagCreate, TagUpdate, TagType, TagDeletionJob, JobStatus
 from ..services.auth import get_current_user
-from ..services.dynamodb import db_service
+from ..services.async_dynamodb import async_db
+from ..services.jobs import run_job_after_response
+from ..config import get_settings
+from ..utils.pagination import set_next_cursor
+from ..utils.fields import parse_fields, project_response
+from ..utils.formatters import format_tag
 
 router = APIRouter(prefix="/tags", tags=["tags"])
 
 
 @router.get("", response_model=List[Tag])
-async def get_tags(current_user: dict = Depends(get_current_user)):
-    """Get all tags for the household"""
-    tags = db_service.get_tags(current_user["household_id"])
-    return [
-        Tag(
-            tag_id=t["tag_id"],
-            name=t["name"],
-            type=TagType(t["type"]),
-            household_id=t["household_id"],
-            created_at=datetime.fromisoformat(t["created_at"]),
-        )
-        for t in tags
-    ]
+async def get_tags(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Get tags for the household, paginated when limit or cursor is given"""
+    household_id = current_user["household_id"]
+    projection = parse_fields(fields, Tag, always=["tag_id"])
+    if limit is None and cursor is None:
+        tags = await async_db.get_tags(household_id, projection)
+    else:
+        try:
+            tags, next_cursor = await async_db.get_tags_page(
+                household_id, limit or get_settings().default_page_size, cursor, projection
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        set_next_cursor(response, next_cursor)
+
+    if projection:
+        return project_response(tags, Tag, projection, dict(response.headers))
+    return [format_tag(t) for t in tags]
 
 
 @router.get("/types")
@@ -38,18 +54,12 @@ async def create_tag(
 ):
     """Create a new tag"""
     try:
-        tag = db_service.create_tag(
+        tag = await async_db.create_tag(
             current_user["household_id"],
             tag_data.name,
             tag_data.type.value,
         )
-        return Tag(
-            tag_id=tag["tag_id"],
-            name=tag["name"],
-            type=TagType(tag["type"]),
-            household_id=tag["household_id"],
-            created_at=datetime.fromisoformat(tag["created_at"]),
-        )
+        return format_tag(tag)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -67,23 +77,56 @@ async def update_tag(
     if tag_data.type is not None:
         updates["type"] = tag_data.type.value
 
-    tag = db_service.update_tag(current_user["household_id"], tag_id, updates)
+    try:
+        tag = await async_db.update_tag(current_user["household_id"], tag_id, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if not tag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
 
-    return Tag(
-        tag_id=tag["tag_id"],
-        name=tag["name"],
-        type=TagType(tag["type"]),
-        household_id=tag["household_id"],
-        created_at=datetime.fromisoformat(tag["created_at"]),
+    return format_tag(tag)
+
+
+def _job_response(job: dict) -> TagDeletionJob:
+    return TagDeletionJob(
+        job_id=job["job_id"],
+        tag_id=job["tag_id"],
+        status=JobStatus(job["status"]),
+        recipes_total=int(job["recipes_total"]),
+        recipes_updated=int(job["recipes_updated"]),
+        rules_deleted=int(job["rules_deleted"]),
+        rules_disabled=int(job["rules_disabled"]),
+        error=job.get("error"),
+        created_at=datetime.fromisoformat(job["created_at"]),
+        updated_at=datetime.fromisoformat(job["updated_at"]),
     )
 
 
-@router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.get("/jobs/{job_id}", response_model=TagDeletionJob)
+async def get_tag_deletion_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Get the progress of a tag deletion's cleanup"""
+    job = await async_db.get_job(current_user["household_id"], job_id)
+    if not job or job.get("job_type") != "TAG_DELETE":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return _job_response(job)
+
+
+@router.delete(
+    "/{tag_id}", response_model=TagDeletionJob, status_code=status.HTTP_202_ACCEPTED
+)
 async def delete_tag(
     tag_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
 ):
-    """Delete a tag"""
-    db_service.delete_tag(current_user["household_id"], tag_id)
+    """Delete a tag at once; removing it from recipes and rules runs in the background.
+
+    Returns the cleanup job; poll GET /tags/jobs/{job_id} for its progress.
+    """
+    job = await async_db.delete_tag(current_user["household_id"], tag_id)
+    if get_settings().background_jobs == "local":
+        background_tasks.add_task(run_job_after_response, job)
+    return _job_response(job)
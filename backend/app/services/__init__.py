@@ -1,4 +1,11 @@
+from .storage import StorageBackend, HouseholdSnapshot, VersionConflictError
 from .dynamodb import DynamoDBService
+from .memory import InMemoryStorage
+from .sqlite import SQLiteStorage
+from .factory import create_storage
 from .auth import AuthService
 
-__all__ = ["DynamoDBService", "AuthService"]
+__all__ = [
+    "StorageBackend", "HouseholdSnapshot", "VersionConflictError",
+    "DynamoDBService", "InMemoryStorage", "SQLiteStorage", "create_storage", "AuthService",
+]
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from ..config import get_settings
+from .factory import create_storage
+from .pool_stats import PoolStats
+from .storage import StorageBackend
+
+
+class AsyncDynamoDBService:
+    """Awaitable mirror of the storage backend backed by a bounded thread pool.
+
+    Each worker thread lazily builds its own backend instance (for DynamoDB,
+    its own boto3 resource on the shared client), so the event loop never
+    waits on a network round trip and no boto3 resource is shared between
+    threads. Any public StorageBackend method can be awaited here under the
+    same name.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or get_settings().dynamodb_max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = PoolStats(self.max_workers)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="dynamodb",
+                    )
+        return self._executor
+
+    def _service(self) -> StorageBackend:
+        """Get the calling worker thread's own storage backend"""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = create_storage()
+            self._local.service = service
+        return service
+
+    def _call(self, name: str, submitted_at: float, *args, **kwargs) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return getattr(self._service(), name)(*args, **kwargs)
+        finally:
+            self._stats.timing(started_at - submitted_at, time.perf_counter() - started_at)
+
+    async def call(self, name: str, *args, **kwargs) -> Any:
+        """Run StorageBackend.<name>(*args, **kwargs) on the pool and await it"""
+        loop = asyncio.get_running_loop()
+        # Copy the caller's context so request-scoped contextvars stay visible
+        context = contextvars.copy_context()
+        func = partial(self._call, name, time.perf_counter(), *args, **kwargs)
+
+        self._stats.submit()
+        try:
+            result = await loop.run_in_executor(self.executor, context.run, func)
+        except BaseException:
+            self._stats.finish(succeeded=False)
+            raise
+        self._stats.finish(succeeded=True)
+        return result
+
+    def __getattr__(self, name: str) -> Callable:
+        # Streaming iter_* generators would be consumed on the event loop,
+        # so only plain public methods are mirrored
+        if name.startswith("_") or name.startswith("iter_"):
+            raise AttributeError(name)
+        if not callable(getattr(StorageBackend, name, None)):
+            raise AttributeError(name)
+        return partial(self.call, name)
+
+    def stats(self) -> dict:
+        """Snapshot of pool utilisation counters"""
+        stats = self._stats.snapshot()
+        del stats["rejected"]  # calls are never refused here
+        return stats
+
+
+# Singleton instance
+async_db = AsyncDynamoDBService()
@@ -1,31 +1,73 @@
+import hashlib
+import logging
+import secrets
+import time
+import uuid
 from datetime import datetime, timedelta
+from typing import Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from ..config import get_settings
-from .dynamodb import db_service
+from .async_dynamodb import async_db
+from .password_hashing import HashingBusyError, password_hasher
+from .revocation import revocation_filter
+from .token_cache import token_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+logger = logging.getLogger("mealprepbuddy.auth")
+
+
+def _busy(e: HashingBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"},
+    )
+
+
+def _hash_refresh_token(refresh_token: str) -> str:
+    """Sessions store only this digest; refresh tokens are random, so no salt is needed"""
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def _new_refresh_token(session_id: str) -> str:
+    # The session id prefix locates the session item without an index
+    return f"{session_id}.{secrets.token_urlsafe(32)}"
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+    )
+
 
 class AuthService:
     def __init__(self):
         self.settings = get_settings()
 
-    def hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        """bcrypt hash of a password, computed on the password hashing pool"""
+        try:
+            return await password_hasher.hash(password)
+        except HashingBusyError as e:
+            raise _busy(e)
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        try:
+            return await password_hasher.verify(plain_password, hashed_password)
+        except HashingBusyError as e:
+            raise _busy(e)
 
-    def create_access_token(self, user_id: str, household_id: str) -> str:
-        expire = datetime.utcnow() + timedelta(hours=self.settings.jwt_expiration_hours)
+    def create_access_token(self, user_id: str, household_id: str, session_id: str) -> str:
+        expire = datetime.utcnow() + timedelta(minutes=self.settings.access_token_minutes)
         to_encode = {
             "sub": user_id,
             "household_id": household_id,
+            "sid": session_id,
             "exp": expire,
         }
         return jwt.encode(
@@ -35,46 +77,113 @@ class AuthService:
         )
 
     def decode_token(self, token: str) -> dict:
+        """Verified claims of a token; tokens seen before come from the token cache"""
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
         try:
             payload = jwt.decode(
                 token,
                 self.settings.jwt_secret_key,
                 algorithms=[self.settings.jwt_algorithm],
             )
-            return payload
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired token",
             )
+        token_cache.put(token, payload)
+        return payload
+
+    async def start_session(self, user: dict) -> Tuple[str, str]:
+        """Sign `user` in; returns (access token, refresh token)"""
+        session_id = str(uuid.uuid4())
+        refresh_token = _new_refresh_token(session_id)
+        await async_db.create_auth_session(user, session_id, _hash_refresh_token(refresh_token))
+        return (
+            self.create_access_token(user["user_id"], user["household_id"], session_id),
+            refresh_token,
+        )
+
+    async def refresh_session(self, refresh_token: str) -> Tuple[str, str]:
+        """Exchange a refresh token for a new access token and a new refresh token.
+
+        Each refresh token works once. Presenting one that was already
+        exchanged means it leaked (or a client retried), so the whole session
+        is revoked and its holder has to sign in again.
+        """
+        session_id, _, secret = refresh_token.partition(".")
+        if not session_id or not secret:
+            raise _invalid_refresh_token()
+        new_token = _new_refresh_token(session_id)
+        session = await async_db.rotate_refresh_token(
+            session_id, _hash_refresh_token(refresh_token), _hash_refresh_token(new_token)
+        )
+        if session is None:
+            current = await async_db.get_auth_session(session_id)
+            if current is not None and current["expires_at"] > time.time():
+                logger.warning("Refresh token reused on session %s, revoking it", session_id)
+                await self.revoke_session(session_id)
+            raise _invalid_refresh_token()
+        access_token = self.create_access_token(
+            session["user_id"], session["household_id"], session_id
+        )
+        return access_token, new_token
+
+    async def revoke_session(self, session_id: str) -> None:
+        """End a session; its access tokens stop working here at once, elsewhere within a sync"""
+        await async_db.revoke_auth_session(session_id)
+        revocation_filter.add(session_id)
+
+    async def logout(self, refresh_token: str) -> None:
+        """End the session of a current refresh token; unknown tokens are ignored"""
+        session_id = refresh_token.partition(".")[0]
+        session = await async_db.get_auth_session(session_id) if session_id else None
+        if session and session["token_hash"] == _hash_refresh_token(refresh_token):
+            await self.revoke_session(session_id)
 
-    def register_user(self, email: str, password: str) -> dict:
+    async def register_user(self, email: str, password: str) -> dict:
         # Check if user exists
-        existing = db_service.get_user_by_email(email)
+        existing = await async_db.get_user_by_email(email)
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered",
             )
 
-        password_hash = self.hash_password(password)
-        user = db_service.create_user(email, password_hash)
+        password_hash = await self.hash_password(password)
+        user = await async_db.create_user(email, password_hash)
         return user
 
-    def authenticate_user(self, email: str, password: str) -> dict:
-        user = db_service.get_user_by_email(email)
+    async def authenticate_user(self, email: str, password: str) -> dict:
+        user = await async_db.get_user_by_email(email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials",
             )
 
-        if not self.verify_password(password, user["password_hash"]):
+        try:
+            verified, new_hash = await password_hasher.verify_and_update(
+                password, user["password_hash"]
+            )
+        except HashingBusyError as e:
+            raise _busy(e)
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials",
             )
 
+        if new_hash:
+            # The stored hash predates the current scheme or cost; a failed
+            # rewrite is retried at the next login rather than failing this one
+            try:
+                await async_db.update_password_hash(
+                    user["user_id"], user["password_hash"], new_hash
+                )
+            except Exception:
+                logger.exception("Could not rehash the password of user %s", user["user_id"])
         return user
 
 
@@ -89,10 +198,19 @@ async def get_current_user(
     user_id = payload.get("sub")
     household_id = payload.get("household_id")
 
-    if not user_id or not household_id:
+    # Tokens issued before sessions existed carry no sid and could not be
+    # revoked; they are refused, so their users sign in again
+    session_id = payload.get("sid")
+    if not user_id or not household_id or not session_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
         )
 
+    if await revocation_filter.is_revoked(session_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session has been revoked",
+        )
+
     return {"user_id": user_id, "household_id": household_id}
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from ..config import get_settings
+
+
+class HouseholdCache:
+    """Byte-budgeted LRU of per-household item lists.
+
+    Entries are tagged with the household's data version; a lookup only hits
+    when the caller's current version matches, so a version bump anywhere
+    invalidates every entry of that household. The last version seen for a
+    household is remembered for a short time so hot reads can skip the
+    version lookup entirely. Thread-safe; shared by all worker threads.
+    """
+
+    def __init__(self, max_bytes: int, version_ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.version_ttl_seconds = version_ttl_seconds
+        self._lock = threading.Lock()
+        # (household_id, kind) -> (version, value, size)
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, Any, int]]" = OrderedDict()
+        # household_id -> (version, monotonic time it was read)
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def known_version(self, household_id: str) -> Optional[int]:
+        """Last version read for the household, if it is still fresh"""
+        with self._lock:
+            known = self._versions.get(household_id)
+        if known and time.monotonic() - known[1] < self.version_ttl_seconds:
+            return known[0]
+        return None
+
+    def remember_version(self, household_id: str, version: int) -> None:
+        with self._lock:
+            self._versions[household_id] = (version, time.monotonic())
+
+    def get(self, household_id: str, kind: Hashable, version: int) -> Optional[Any]:
+        key = (household_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, household_id: str, kind: Hashable, version: int) -> Optional[Any]:
+        """Like get(), but without counting a miss when the entry is absent"""
+        key = (household_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+        return self.get(household_id, kind, version)
+
+    def put(self, household_id: str, kind: Hashable, version: int, value: Any) -> None:
+        if not self.enabled:
+            return
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        key = (household_id, kind)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+            self._entries[key] = (version, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, household_id: str) -> None:
+        """Drop every cached entry and the remembered version of a household"""
+        with self._lock:
+            self._versions.pop(household_id, None)
+            for key in [k for k in self._entries if k[0] == household_id]:
+                self._bytes -= self._entries.pop(key)[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate in-memory footprint from the serialized size.
+
+    Python objects take a few times their JSON size, so the JSON length is
+    scaled to keep the budget honest without walking every object.
+    """
+    return 4 * len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+_settings = get_settings()
+
+# Singleton instance shared by every DynamoDBService in the process
+household_cache = HouseholdCache(
+    max_bytes=_settings.cache_max_bytes,
+    version_ttl_seconds=_settings.cache_version_ttl_seconds,
+)
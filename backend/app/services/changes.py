@@ -0,0 +1,183 @@
+import logging
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from .storage import VersionConflictError, archive_horizon_start
+from .stats import (
+    ChangeEvent,
+    TRACKED_PREFIXES,
+    apply_change,
+    drop_old_weeks,
+    missed_changes,
+    planned_recipe_ids,
+)
+
+# Optimistic STATS writes retried before a batch is given up
+STATS_WRITE_MAX_ATTEMPTS = 5
+
+logger = logging.getLogger("mealprepbuddy.changes")
+
+_deserializer = TypeDeserializer()
+
+
+def from_stream_record(record: dict) -> Optional[ChangeEvent]:
+    """ChangeEvent for a DynamoDB Streams record, or None for items the stats do not track"""
+    change = record.get("dynamodb", {})
+    keys = {k: _deserializer.deserialize(v) for k, v in change.get("Keys", {}).items()}
+    if not str(keys.get("pk", "")).startswith("HOUSE#"):
+        return None
+    if not str(keys.get("sk", "")).startswith(TRACKED_PREFIXES):
+        return None
+
+    def image(name: str) -> Optional[dict]:
+        if name not in change:
+            return None
+        return {k: _deserializer.deserialize(v) for k, v in change[name].items()}
+
+    return ChangeEvent(
+        keys["pk"][len("HOUSE#"):],
+        keys["sk"],
+        image("OldImage"),
+        image("NewImage"),
+    )
+
+
+class StatsConsumer:
+    """Folds change events into the households' STATS items.
+
+    Events are grouped per household; each group costs one read of the
+    recipes it newly plans, one STATS read and one conditional STATS write.
+    The write is retried when another consumer got there first, and events
+    already folded in are skipped, so redelivered batches are harmless.
+    An event that follows changes never folded in (published out of order,
+    or lost) makes the consumer rebuild the household's stats from its items
+    instead, which the batch's writes are already part of.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def apply(self, events: List[ChangeEvent]) -> None:
+        by_household: Dict[str, List[ChangeEvent]] = {}
+        for event in events:
+            by_household.setdefault(event.household_id, []).append(event)
+        for household_id, household_events in by_household.items():
+            self._apply_household(household_id, household_events)
+
+    def _apply_household(self, household_id: str, events: List[ChangeEvent]) -> None:
+        recipe_ids = set().union(*(planned_recipe_ids(e) for e in events))
+        recipe_tags = {
+            r["recipe_id"]: r.get("tag_ids") or []
+            for r in self.storage.get_recipes_by_id(
+                household_id, sorted(recipe_ids), ["recipe_id", "tag_ids"]
+            )
+        }
+        events = _in_version_order(events)
+        for _ in range(STATS_WRITE_MAX_ATTEMPTS):
+            stats = self.storage.get_household_stats(household_id)
+            expected_version = int(stats["version"])
+            changed = missed = False
+            for event in events:
+                if missed_changes(stats, event):
+                    missed = True
+                    break
+                # Every event is applied, even after the first no-op
+                changed = apply_change(stats, event, recipe_tags) or changed
+            try:
+                if missed:
+                    logger.warning(
+                        "Missed changes to %s, rebuilding stats for household %s",
+                        event.sk,
+                        household_id,
+                    )
+                    self.storage.rebuild_household_stats(household_id)
+                elif changed:
+                    drop_old_weeks(stats, archive_horizon_start())
+                    self.storage.save_household_stats(household_id, stats, expected_version)
+                return
+            except VersionConflictError:
+                continue
+        raise RuntimeError(f"Could not update stats for household {household_id}")
+
+
+def _in_version_order(events: List[ChangeEvent]) -> List[ChangeEvent]:
+    """`events` with each item's own events sorted by version, in the places they held"""
+    by_sk: Dict[str, List[ChangeEvent]] = {}
+    for event in events:
+        by_sk.setdefault(event.sk, []).append(event)
+    ordered = {sk: iter(sorted(group, key=lambda e: e.version)) for sk, group in by_sk.items()}
+    return [next(ordered[event.sk]) for event in events]
+
+
+class LocalChangeFeed:
+    """In-process stand-in for DynamoDB Streams.
+
+    Writers publish events onto a queue after their write returns, so
+    concurrent writes to one item can be queued out of order; the consumer
+    sorts them within a batch and rebuilds when one is still missing. One
+    daemon thread, started on the first event, drains the queue and hands
+    batches to a StatsConsumer built by `consumer_factory`. Failures are logged and counted, never
+    raised to the writer. Like Streams, aggregates lag the writes slightly.
+    """
+
+    def __init__(self, consumer_factory: Callable[[], StatsConsumer], max_batch: int = 100):
+        self.consumer_factory = consumer_factory
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[ChangeEvent]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.applied = 0
+        self.failed = 0
+
+    def publish(self, events: List[ChangeEvent]) -> None:
+        if not events:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="change-feed", daemon=True
+                    )
+                    self._thread.start()
+        with self._lock:
+            self.published += len(events)
+        for event in events:
+            self._queue.put(event)
+
+    def _run(self) -> None:
+        consumer = self.consumer_factory()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                consumer.apply(batch)
+                with self._lock:
+                    self.applied += len(batch)
+            except Exception:
+                logger.exception("Could not apply %d change events", len(batch))
+                with self._lock:
+                    self.failed += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def join(self) -> None:
+        """Block until every event published so far has been handled"""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "published": self.published,
+                "applied": self.applied,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+            }
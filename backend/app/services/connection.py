@@ -0,0 +1,87 @@
+import threading
+
+import boto3
+from botocore.config import Config
+
+from ..config import get_settings
+from .request_metrics import install_capacity_hooks
+
+
+class DynamoDBConnection:
+    """Lazily built DynamoDB client shared by the whole process.
+
+    Nothing is created until the first request needs it, keeping boto3
+    setup off the cold-start path. The low-level client is thread-safe and
+    owns the HTTP connection pool; resources are not thread-safe, so each
+    caller gets its own lightweight resource wrapping the shared client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._resource = None
+
+    def config(self) -> Config:
+        settings = get_settings()
+        return Config(
+            region_name=settings.aws_region,
+            max_pool_connections=settings.dynamodb_max_pool_connections,
+            tcp_keepalive=settings.dynamodb_tcp_keepalive,
+            connect_timeout=settings.dynamodb_connect_timeout,
+            read_timeout=settings.dynamodb_read_timeout,
+            retries={
+                "mode": settings.dynamodb_retry_mode,
+                "total_max_attempts": settings.dynamodb_max_attempts,
+            },
+        )
+
+    def _build(self) -> None:
+        settings = get_settings()
+        kwargs = {"config": self.config()}
+        if settings.dynamodb_endpoint_url:
+            # For local DynamoDB, use fake credentials
+            kwargs.update(
+                endpoint_url=settings.dynamodb_endpoint_url,
+                aws_access_key_id="fakeAccessKeyId",
+                aws_secret_access_key="fakeSecretAccessKey",
+            )
+        self._resource = boto3.session.Session().resource("dynamodb", **kwargs)
+        self._client = self._resource.meta.client
+        install_capacity_hooks(self._client)
+
+    @property
+    def client(self):
+        """The shared low-level client"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._build()
+        return self._client
+
+    def resource(self):
+        """A new DynamoDB service resource that sends requests through the shared client"""
+        client = self.client
+        return type(self._resource)(client=client)
+
+    def stats(self) -> dict:
+        """Connection pool counters of the shared client (empty before first use)"""
+        if self._client is None:
+            return {"created": False}
+        # botocore keeps one urllib3 pool per endpoint host
+        manager = getattr(self._client._endpoint.http_session, "_manager", None)
+        pools = [manager.pools[key] for key in manager.pools.keys()] if manager else []
+        return {
+            "created": True,
+            "max_pool_connections": self._client.meta.config.max_pool_connections,
+            "pools": len(pools),
+            "connections_opened": sum(pool.num_connections for pool in pools),
+            "requests": sum(pool.num_requests for pool in pools),
+            # Free slots hold None until a connection has been opened in them
+            "idle_connections": sum(
+                sum(1 for conn in list(pool.pool.queue) if conn) for pool in pools if pool.pool
+            ),
+        }
+
+
+# Singleton instance
+dynamodb_connection = DynamoDBConnection()
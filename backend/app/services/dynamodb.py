@@ -1,31 +1,210 @@
-import boto3
 from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Optional, List, Dict
+from typing import Callable, Optional, List, Dict, Iterator, Tuple
+import contextvars
+import random
+import threading
+import time
 import uuid
 
 from ..config import get_settings
+from .cache import household_cache
+from .changes import LocalChangeFeed
+from .connection import DynamoDBConnection, dynamodb_connection
+from .stats import (
+    STATS_SK,
+    ChangeEvent,
+    build_stats,
+    drop_old_weeks,
+    empty_stats,
+    item_change,
+)
+from .storage import (
+    VersionConflictError,
+    HouseholdSnapshot,
+    archive_horizon_start,
+    encode_cursor,
+    decode_cursor,
+    pack_weeks,
+    project_items,
+    unpack_weeks,
+    user_item,
+    household_item,
+    tag_item,
+    tag_name_guard,
+    tag_index_item,
+    tag_deletion_job_item,
+    dependent_rule_action,
+    recipe_item,
+    constraint_rule_item,
+    action_rule_item,
+    tombstone_item,
+    auth_session_item,
+    refresh_token_expiry,
+    revoked_session_item,
+    REVOKED_PK,
+    throttle_counter_key,
+)
+
+# BatchWriteItem accepts at most 25 requests per call
+BATCH_WRITE_SIZE = 25
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_SIZE = 100
+BATCH_WRITE_MAX_ATTEMPTS = 8
+# TransactWriteItems accepts at most 100 actions per call
+TRANSACT_WRITE_SIZE = 100
+# Weeks moved per compaction transaction (one action is the archive item)
+ARCHIVE_CHUNK_SIZE = TRANSACT_WRITE_SIZE - 1
+# Recipes (an update and an index delete each) or rules (at most a delete
+# and a tombstone each) cleaned up per transaction, plus the job progress
+# update and the data version update
+TAG_CLEANUP_CHUNK_SIZE = (TRANSACT_WRITE_SIZE - 2) // 2
+# Times a cleanup chunk is re-read and retried after losing to a concurrent write
+TAG_CLEANUP_MAX_ATTEMPTS = 5
+# Times restoring an archived week is retried after its archive changed
+ARCHIVE_RESTORE_MAX_ATTEMPTS = 5
+# Finished jobs are removed by the table's TTL on expires_at after this long
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+_snapshot_executor: Optional[ThreadPoolExecutor] = None
+_snapshot_executor_lock = threading.Lock()
+
+
+def _snapshot_pool() -> ThreadPoolExecutor:
+    """Threads that run the reads of a household snapshot side by side"""
+    global _snapshot_executor
+    if _snapshot_executor is None:
+        with _snapshot_executor_lock:
+            if _snapshot_executor is None:
+                _snapshot_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().dynamodb_max_workers,
+                    thread_name_prefix="dynamodb-snapshot",
+                )
+    return _snapshot_executor
+
+
+def _projection(fields: Optional[List[str]]) -> dict:
+    """ProjectionExpression kwargs returning only `fields` (plus the item keys)"""
+    if not fields:
+        return {}
+    attributes = list(dict.fromkeys(["pk", "sk", *fields]))
+    names = {f"#p{i}": name for i, name in enumerate(attributes)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def _version_match(expected_version: int):
+    """Condition that the item is at `expected_version`.
+
+    Items written before versioning, and items that do not exist yet, have no
+    `version` and count as version 0.
+    """
+    if expected_version == 0:
+        return Attr("version").not_exists() | Attr("version").eq(0)
+    return Attr("version").eq(expected_version)
+
+
+def _version_condition(expected_version: Optional[int]):
+    """Condition that the item exists and, if given, is at `expected_version`"""
+    if expected_version is None:
+        return Attr("sk").exists()
+    return Attr("sk").exists() & _version_match(expected_version)
+
+
+def _cancellation_codes(error: ClientError) -> List[str]:
+    """Per-item failure codes of a cancelled TransactWriteItems call"""
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        return []
+    return [
+        reason.get("Code", "None")
+        for reason in error.response.get("CancellationReasons", [])
+    ]
+
+
+def _plan_after_write(
+    old: Optional[dict],
+    household_id: str,
+    week_start_date: str,
+    entries: dict,
+    updated_at: str,
+) -> dict:
+    """The plan item a write produced, from its ALL_OLD image and the values it set.
+
+    Plan writes return the old image so change events carry both sides.
+    """
+    plan = dict(old or {})
+    plan.update(
+        pk=f"HOUSE#{household_id}",
+        sk=f"WEEK#{week_start_date}",
+        entries=entries,
+        week_start_date=week_start_date,
+        household_id=household_id,
+        updated_at=updated_at,
+        version=int(plan.get("version", 0)) + 1,
+    )
+    return plan
+
+
+def _archive_item(household_id: str, year: str, weeks: Dict[str, dict], version: int) -> dict:
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"ARCHIVE#{year}",
+        "household_id": household_id,
+        "year": year,
+        "week_count": len(weeks),
+        "data": pack_weeks(weeks),
+        "version": version,
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def _at_version(version: int) -> dict:
+    """Transaction condition that an item is at `version` (0: unversioned or missing)"""
+    expression = "#version = :version"
+    if version == 0:
+        expression = "attribute_not_exists(#version) OR " + expression
+    return {
+        "ConditionExpression": expression,
+        "ExpressionAttributeNames": {"#version": "version"},
+        "ExpressionAttributeValues": {":version": version},
+    }
 
 
 class DynamoDBService:
-    def __init__(self):
-        settings = get_settings()
-        self.table_name = settings.dynamodb_table_name
-
-        if settings.dynamodb_endpoint_url:
-            # For local DynamoDB, use fake credentials
-            self.dynamodb = boto3.resource(
-                "dynamodb",
-                endpoint_url=settings.dynamodb_endpoint_url,
-                region_name=settings.aws_region,
-                aws_access_key_id="fakeAccessKeyId",
-                aws_secret_access_key="fakeSecretAccessKey",
-            )
-        else:
-            self.dynamodb = boto3.resource("dynamodb", region_name=settings.aws_region)
+    """StorageBackend on the DynamoDB single table"""
+
+    def __init__(
+        self,
+        connection: Optional[DynamoDBConnection] = None,
+        changes: Optional[LocalChangeFeed] = None,
+    ):
+        self.table_name = get_settings().dynamodb_table_name
+        self.connection = connection or dynamodb_connection
+        # Where recipe and plan writes publish change events; None when
+        # DynamoDB Streams delivers them (or stats are off)
+        self.changes = changes
+        # boto3 resources are not thread-safe, so every instance builds its
+        # own, lazily and on top of the shared client
+        self._dynamodb = None
+        self._table = None
+        self.cache = household_cache
 
-        self.table = self.dynamodb.Table(self.table_name)
+    @property
+    def dynamodb(self):
+        if self._dynamodb is None:
+            self._dynamodb = self.connection.resource()
+        return self._dynamodb
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = self.dynamodb.Table(self.table_name)
+        return self._table
 
     # --- User Operations ---
     def get_user_by_email(self, email: str) -> Optional[dict]:
@@ -41,41 +220,33 @@ class DynamoDBService:
         self, email: str, password_hash: str, household_id: Optional[str] = None
     ) -> dict:
         """Create a new user and optionally a household"""
-        user_id = str(uuid.uuid4())
         if not household_id:
             household_id = str(uuid.uuid4())
             # Create household
             self._create_household(household_id, f"{email}'s Household")
 
-        now = datetime.utcnow().isoformat()
-        user = {
-            "pk": f"USER#{user_id}",
-            "sk": f"USER#{user_id}",
-            "gsi1pk": f"EMAIL#{email.lower()}",
-            "gsi1sk": f"USER#{user_id}",
-            "user_id": user_id,
-            "email": email,
-            "email_lower": email.lower(),
-            "password_hash": password_hash,
-            "household_id": household_id,
-            "created_at": now,
-        }
+        user = user_item(email, password_hash, household_id)
         self.table.put_item(Item=user)
         return user
 
+    def update_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> bool:
+        """Replace a user's password hash; False if it changed since `old_hash` was read"""
+        try:
+            self.table.update_item(
+                Key={"pk": f"USER#{user_id}", "sk": f"USER#{user_id}"},
+                UpdateExpression="SET password_hash = :new_hash",
+                ConditionExpression=Attr("password_hash").eq(old_hash),
+                ExpressionAttributeValues={":new_hash": new_hash},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
+        return True
+
     def _create_household(self, household_id: str, name: str) -> dict:
         """Create a new household"""
-        settings = get_settings()
-        now = datetime.utcnow().isoformat()
-        household = {
-            "pk": f"HOUSE#{household_id}",
-            "sk": f"HOUSE#{household_id}",
-            "household_id": household_id,
-            "name": name,
-            "timezone": settings.default_timezone,
-            "dinner_time_local": settings.default_dinner_time,
-            "created_at": now,
-        }
+        household = household_item(household_id, name)
         self.table.put_item(Item=household)
         return household
 
@@ -86,14 +257,314 @@ class DynamoDBService:
         )
         return response.get("Item")
 
-    # --- Tag Operations ---
-    def get_tags(self, household_id: str) -> List[dict]:
-        """Get all tags for a household"""
-        response = self.table.query(
+    def iter_household_ids(self) -> Iterator[str]:
+        """Stream the id of every household in the table (full scan, for maintenance jobs)"""
+        scan_kwargs = {
+            "FilterExpression": Attr("sk").begins_with("HOUSE#"),
+            "ProjectionExpression": "household_id",
+        }
+        while True:
+            response = self.table.scan(**scan_kwargs)
+            for item in response.get("Items", []):
+                yield item["household_id"]
+
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return
+            scan_kwargs["ExclusiveStartKey"] = last_key
+
+    # --- Auth Sessions ---
+    def create_auth_session(self, user: dict, session_id: str, token_hash: str) -> dict:
+        """Start a sign-in session for `user` with the hash of its first refresh token"""
+        session = auth_session_item(user, session_id, token_hash)
+        self.table.put_item(Item=session)
+        return session
+
+    def get_auth_session(self, session_id: str) -> Optional[dict]:
+        """Get a session; expired ones may linger until TTL removes them"""
+        response = self.table.get_item(
+            Key={"pk": f"SESSION#{session_id}", "sk": f"SESSION#{session_id}"}
+        )
+        return response.get("Item")
+
+    def rotate_refresh_token(
+        self, session_id: str, old_hash: str, new_hash: str
+    ) -> Optional[dict]:
+        """Swap the session's refresh token hash and extend the session.
+
+        Returns the updated session, or None unless `old_hash` is the current
+        hash of a live session; a refresh token can therefore be used once.
+        """
+        try:
+            response = self.table.update_item(
+                Key={"pk": f"SESSION#{session_id}", "sk": f"SESSION#{session_id}"},
+                UpdateExpression="SET token_hash = :new_hash, expires_at = :expires_at",
+                ConditionExpression=Attr("token_hash").eq(old_hash)
+                & Attr("expires_at").gt(int(time.time())),
+                ExpressionAttributeValues={
+                    ":new_hash": new_hash,
+                    ":expires_at": refresh_token_expiry(),
+                },
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return None
+        return response["Attributes"]
+
+    def revoke_auth_session(self, session_id: str) -> None:
+        """End a session and put it on the revocation list, in one transaction"""
+        self.dynamodb.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Delete": {
+                        "TableName": self.table_name,
+                        "Key": {"pk": f"SESSION#{session_id}", "sk": f"SESSION#{session_id}"},
+                    }
+                },
+                {
+                    "Put": {
+                        "TableName": self.table_name,
+                        "Item": revoked_session_item(session_id),
+                    }
+                },
+            ]
+        )
+
+    def get_revoked_session_ids(self) -> List[str]:
+        """Ids on the revocation list, skipping entries TTL has not removed yet"""
+        pages = self._paginate(
+            KeyConditionExpression=Key("pk").eq(REVOKED_PK),
+            FilterExpression=Attr("expires_at").gt(int(time.time())),
+            ProjectionExpression="session_id",
+        )
+        return [item["session_id"] for page in pages for item in page]
+
+    # --- Login Throttling ---
+    def count_login_attempt(self, key: str, window_start: int, expires_at: int) -> int:
+        """Atomically count an attempt in the window; returns the window's total"""
+        response = self.table.update_item(
+            Key=throttle_counter_key(key, window_start),
+            UpdateExpression="ADD attempts :one SET expires_at = :expires_at",
+            ExpressionAttributeValues={":one": 1, ":expires_at": expires_at},
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(response["Attributes"]["attempts"])
+
+    def _conditional_update(
+        self,
+        key: dict,
+        update_expression: str,
+        expected_version: Optional[int],
+        expr_names: dict,
+        expr_values: dict,
+        return_values: str = "ALL_NEW",
+    ) -> Optional[dict]:
+        """UpdateItem guarded by _version_condition.
+
+        Returns the response, or None when the item does not exist; raises
+        VersionConflictError when it exists at another version.
+        """
+        try:
+            return self.table.update_item(
+                Key=key,
+                UpdateExpression=update_expression,
+                ConditionExpression=_version_condition(expected_version),
+                ExpressionAttributeNames=expr_names,
+                ExpressionAttributeValues=expr_values,
+                ReturnValues=return_values,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+        current = self.table.get_item(Key=key, ProjectionExpression="version").get("Item")
+        if current is None:
+            return None
+        raise VersionConflictError(int(current.get("version", 0)))
+
+    def _publish(self, events: List[ChangeEvent]) -> None:
+        if self.changes is not None:
+            self.changes.publish(events)
+
+    # --- Cache Versioning ---
+    def get_data_version(self, household_id: str) -> int:
+        """Current version of the household's tags, recipes and rules"""
+        version = self.cache.known_version(household_id)
+        if version is None:
+            response = self.table.get_item(
+                Key={"pk": f"HOUSE#{household_id}", "sk": "VERSION"},
+                ProjectionExpression="data_version",
+            )
+            version = int(response.get("Item", {}).get("data_version", 0))
+            self.cache.remember_version(household_id, version)
+        return version
+
+    def _version_action(self, household_id: str) -> dict:
+        """Transaction action incrementing the household's data version"""
+        return {
+            "Update": {
+                "TableName": self.table_name,
+                "Key": {"pk": f"HOUSE#{household_id}", "sk": "VERSION"},
+                "UpdateExpression": "ADD #data_version :one",
+                "ExpressionAttributeNames": {"#data_version": "data_version"},
+                "ExpressionAttributeValues": {":one": 1},
+            }
+        }
+
+    def _transact(self, household_id: str, transact_items: List[dict]) -> None:
+        """TransactWriteItems that also increments the household's data version.
+
+        The version moves in the same transaction as the write, so a write
+        can never be applied while cached lists stay current. The version
+        update goes last, keeping cancellation reasons aligned with
+        `transact_items`.
+        """
+        self.dynamodb.meta.client.transact_write_items(
+            TransactItems=transact_items + [self._version_action(household_id)]
+        )
+        self.cache.invalidate(household_id)
+
+    def _bump_version(self, household_id: str) -> int:
+        """Atomically increment the household's data version after a write.
+
+        Only for writes that cannot carry the version update themselves:
+        BatchWriteItem and single-item updates that need ReturnValues. Should
+        this call fail after the write, other processes keep serving cached
+        lists until the household's next write; everything else uses _transact.
+        """
+        self.cache.invalidate(household_id)
+        response = self.table.update_item(
+            Key={"pk": f"HOUSE#{household_id}", "sk": "VERSION"},
+            UpdateExpression="ADD #data_version :one",
+            ExpressionAttributeNames={"#data_version": "data_version"},
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        version = int(response["Attributes"]["data_version"])
+        self.cache.remember_version(household_id, version)
+        return version
+
+    def _cached(self, household_id: str, kind: str, load) -> List[dict]:
+        """Read-through lookup of a household list; callers must not mutate it"""
+        if not self.cache.enabled:
+            return load()
+        version = self.get_data_version(household_id)
+        items = self.cache.get(household_id, kind, version)
+        if items is None:
+            items = load()
+            self.cache.put(household_id, kind, version, items)
+        return items
+
+    def _cached_or_projected(
+        self,
+        household_id: str,
+        kind: str,
+        fields: Optional[List[str]],
+        iter_items,
+    ) -> List[dict]:
+        """Full lists go through the cache; projected reads are trimmed from a
+        cached list when there is one and otherwise fetched with a projection"""
+        if not fields:
+            return self._cached(household_id, kind, lambda: list(iter_items()))
+        if self.cache.enabled:
+            items = self.cache.get(household_id, kind, self.get_data_version(household_id))
+            if items is not None:
+                return project_items(items, fields)
+        return list(iter_items(fields=fields))
+
+    # --- Pagination ---
+    def _paginate(self, **query_kwargs) -> Iterator[List[dict]]:
+        """Yield query result pages, following LastEvaluatedKey until exhausted"""
+        while True:
+            response = self.table.query(**query_kwargs)
+            yield response.get("Items", [])
+
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return
+            query_kwargs["ExclusiveStartKey"] = last_key
+
+    def _iter_prefix(
+        self, household_id: str, sk_prefix: str, **query_kwargs
+    ) -> Iterator[dict]:
+        """Stream every item under a sort key prefix of the household partition"""
+        query_kwargs.update(_projection(query_kwargs.pop("fields", None)))
+        pages = self._paginate(
             KeyConditionExpression=Key("pk").eq(f"HOUSE#{household_id}")
-            & Key("sk").begins_with("TAG#")
+            & Key("sk").begins_with(sk_prefix),
+            **query_kwargs,
         )
-        return response.get("Items", [])
+        for page in pages:
+            yield from page
+
+    def _query_page(
+        self,
+        household_id: str,
+        sk_prefix: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        sk_range: Optional[Tuple[str, str]] = None,
+        **query_kwargs,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Fetch up to `limit` items after `cursor`; returns (items, next_cursor).
+
+        Items are those under `sk_prefix`, or with `sk_range` the sort keys
+        between its two (inclusive) bounds.
+        """
+        sk_condition = (
+            Key("sk").between(*sk_range) if sk_range else Key("sk").begins_with(sk_prefix)
+        )
+        query_kwargs["KeyConditionExpression"] = (
+            Key("pk").eq(f"HOUSE#{household_id}") & sk_condition
+        )
+        query_kwargs.update(_projection(query_kwargs.pop("fields", None)))
+        if cursor:
+            query_kwargs["ExclusiveStartKey"] = decode_cursor(
+                cursor, household_id, sk_prefix, sk_range
+            )
+        return self._fill_page(limit, query_kwargs)
+
+    def _fill_page(self, limit: int, query_kwargs: dict) -> Tuple[List[dict], Optional[str]]:
+        items: List[dict] = []
+        last_key = None
+        # Limit applies before any FilterExpression, so keep reading until the
+        # page is full or the key range is exhausted
+        while len(items) < limit:
+            response = self.table.query(Limit=limit - len(items), **query_kwargs)
+            items.extend(response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            query_kwargs["ExclusiveStartKey"] = last_key
+
+        return items, encode_cursor(last_key) if last_key else None
+
+    # --- Tag Operations ---
+    def iter_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]:
+        """Stream all tags for a household page by page"""
+        return self._iter_prefix(household_id, "TAG#", fields=fields)
+
+    def get_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Get all tags for a household (cached), optionally only `fields`"""
+        return self._cached_or_projected(
+            household_id, "tags", fields,
+            lambda fields=None: self.iter_tags(household_id, fields),
+        )
+
+    def get_tags_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one page of tags and the cursor for the next page"""
+        return self._query_page(household_id, "TAG#", limit, cursor, fields=fields)
 
     def get_tag(self, household_id: str, tag_id: str) -> Optional[dict]:
         """Get a single tag"""
@@ -105,32 +576,38 @@ class DynamoDBService:
     def create_tag(
         self, household_id: str, name: str, tag_type: str
     ) -> dict:
-        """Create a new tag (check uniqueness first)"""
-        # Check for existing tag with same name
-        existing = self.get_tags(household_id)
-        for tag in existing:
-            if tag.get("name_lower") == name.lower():
+        """Create a new tag; the name guard item makes uniqueness a single write"""
+        tag = tag_item(household_id, name, tag_type)
+        try:
+            self._transact(
+                household_id,
+                [
+                    {
+                        "Put": {
+                            "TableName": self.table_name,
+                            "Item": tag_name_guard(household_id, tag["tag_id"], name.lower()),
+                            "ConditionExpression": "attribute_not_exists(pk)",
+                        }
+                    },
+                    {
+                        "Put": {
+                            "TableName": self.table_name,
+                            "Item": tag,
+                            "ConditionExpression": "attribute_not_exists(pk)",
+                        }
+                    },
+                ],
+            )
+        except ClientError as e:
+            if _cancellation_codes(e)[:1] == ["ConditionalCheckFailed"]:
                 raise ValueError(f"Tag '{name}' already exists")
-
-        tag_id = str(uuid.uuid4())
-        now = datetime.utcnow().isoformat()
-        tag = {
-            "pk": f"HOUSE#{household_id}",
-            "sk": f"TAG#{tag_id}",
-            "tag_id": tag_id,
-            "name": name,
-            "name_lower": name.lower(),
-            "type": tag_type,
-            "household_id": household_id,
-            "created_at": now,
-        }
-        self.table.put_item(Item=tag)
+            raise
         return tag
 
     def update_tag(
         self, household_id: str, tag_id: str, updates: dict
     ) -> Optional[dict]:
-        """Update a tag"""
+        """Update a tag, moving its name guard atomically on rename"""
         update_expr = []
         expr_values = {}
         expr_names = {}
@@ -147,38 +624,481 @@ class DynamoDBService:
 
         if not update_expr:
             return self.get_tag(household_id, tag_id)
+        updated_at = datetime.utcnow().isoformat()
+        update_expr.append("#updated_at = :updated_at")
+        expr_values[":updated_at"] = updated_at
+        expr_names["#updated_at"] = "updated_at"
+
+        if ":name_lower" not in expr_values:
+            response = self.table.update_item(
+                Key={"pk": f"HOUSE#{household_id}", "sk": f"TAG#{tag_id}"},
+                UpdateExpression="SET " + ", ".join(update_expr),
+                ExpressionAttributeValues=expr_values,
+                ExpressionAttributeNames=expr_names,
+                ReturnValues="ALL_NEW",
+            )
+            self._bump_version(household_id)
+            return response.get("Attributes")
 
+        tag = self.get_tag(household_id, tag_id)
+        if not tag:
+            return None
+
+        old_name_lower = tag["name_lower"]
+        new_name_lower = expr_values[":name_lower"]
+        expr_names["#name_lower"] = "name_lower"
+        expr_values[":old_name_lower"] = old_name_lower
+        transact_items = [
+            {
+                "Update": {
+                    "TableName": self.table_name,
+                    "Key": {"pk": f"HOUSE#{household_id}", "sk": f"TAG#{tag_id}"},
+                    "UpdateExpression": "SET " + ", ".join(update_expr),
+                    # Fails if the tag was renamed or deleted since we read it
+                    "ConditionExpression": "#name_lower = :old_name_lower",
+                    "ExpressionAttributeNames": expr_names,
+                    "ExpressionAttributeValues": expr_values,
+                }
+            }
+        ]
+        if new_name_lower != old_name_lower:
+            transact_items += [
+                {
+                    "Put": {
+                        "TableName": self.table_name,
+                        "Item": tag_name_guard(household_id, tag_id, new_name_lower),
+                        "ConditionExpression": "attribute_not_exists(pk)",
+                    }
+                },
+                {
+                    "Delete": {
+                        "TableName": self.table_name,
+                        "Key": {
+                            "pk": f"HOUSE#{household_id}",
+                            "sk": f"TAGNAME#{old_name_lower}",
+                        },
+                        # Tags created before guards existed have none to delete
+                        "ConditionExpression": "attribute_not_exists(pk) OR tag_id = :tag_id",
+                        "ExpressionAttributeValues": {":tag_id": tag_id},
+                    }
+                },
+            ]
+
+        try:
+            self._transact(household_id, transact_items)
+        except ClientError as e:
+            codes = _cancellation_codes(e)
+            if len(codes) > 1 and codes[1] == "ConditionalCheckFailed":
+                raise ValueError(f"Tag '{updates['name']}' already exists")
+            if codes[:1] == ["ConditionalCheckFailed"]:
+                raise ValueError("Tag was changed by another request, please retry")
+            raise
+
+        tag.update({key: value for key, value in updates.items() if value is not None})
+        tag["name_lower"] = new_name_lower
+        tag["updated_at"] = updated_at
+        return tag
+
+    def delete_tag(self, household_id: str, tag_id: str) -> dict:
+        """Delete a tag and release its name; returns the cleanup job.
+
+        Recipes and rules still referring to the tag are cleaned up by
+        run_tag_deletion, which the returned job item tracks. Deleting a tag
+        that is already gone still records a job, which sweeps up whatever
+        references were left behind.
+
+        The tag delete, the release of its name guard, the tombstone and the
+        job are one transaction, so a failure cannot leave a name reserved by
+        a tag that no longer exists or a deletion sync clients never see.
+        """
+        pk = f"HOUSE#{household_id}"
+        for _ in range(TAG_CLEANUP_MAX_ATTEMPTS):
+            old_tag = self.table.get_item(
+                Key={"pk": pk, "sk": f"TAG#{tag_id}"}, ConsistentRead=True
+            ).get("Item")
+            job = tag_deletion_job_item(
+                household_id, tag_id, self._count_prefix(household_id, f"TAGIDX#{tag_id}#")
+            )
+            transact_items = [{"Put": {"TableName": self.table_name, "Item": job}}]
+            if old_tag:
+                transact_items += self._tag_delete_actions(old_tag)
+            try:
+                self._transact(household_id, transact_items)
+            except ClientError as e:
+                # The tag was renamed or deleted since it was read
+                if not _cancellation_codes(e):
+                    raise
+                continue
+            if old_tag:
+                self._publish([item_change(old_tag, None)])
+            return job
+        raise RuntimeError(f"Could not delete tag {tag_id}: it keeps changing")
+
+    def _tag_delete_actions(self, tag: dict) -> List[dict]:
+        """Transaction actions deleting `tag` as read, its name guard and writing its tombstone"""
+        pk = tag["pk"]
+        actions = [
+            {
+                "Delete": {
+                    "TableName": self.table_name,
+                    "Key": {"pk": pk, "sk": tag["sk"]},
+                    "ConditionExpression": "name_lower = :name_lower",
+                    "ExpressionAttributeValues": {":name_lower": tag["name_lower"]},
+                }
+            },
+            {"Put": {"TableName": self.table_name, "Item": tombstone_item(tag)}},
+        ]
+        guard_key = {"pk": pk, "sk": f"TAGNAME#{tag['name_lower']}"}
+        guard = self.table.get_item(Key=guard_key, ConsistentRead=True).get("Item")
+        # Tags from before name guards may have none (see backfill_tag_name_guards)
+        if guard and guard["tag_id"] == tag["tag_id"]:
+            actions.append({
+                "Delete": {
+                    "TableName": self.table_name,
+                    "Key": guard_key,
+                    "ConditionExpression": "tag_id = :tag_id",
+                    "ExpressionAttributeValues": {":tag_id": tag["tag_id"]},
+                }
+            })
+        return actions
+
+    def run_tag_deletion(self, household_id: str, job_id: str) -> Optional[dict]:
+        """Strip a deleted tag from its recipes and rules; returns the finished job.
+
+        Every chunk of up to TAG_CLEANUP_CHUNK_SIZE recipes is one
+        TransactWriteItems call that rewrites their tag_ids, drops their
+        TAGIDX# items and advances the job's counters, so progress is exact
+        and a run that stops part way can be started again. Dependent rules
+        follow (see dependent_rule_action). Returns None for an unknown job.
+        """
+        job = self.get_job(household_id, job_id)
+        if job is None or job["status"] == "DONE":
+            return job
+        tag_id = job["tag_id"]
+        try:
+            while self._untag_recipe_chunk(household_id, job_id, tag_id):
+                pass
+            self._clean_dependent_rules(household_id, job_id, tag_id)
+        except Exception as e:
+            self._finish_job(household_id, job_id, "FAILED", str(e))
+            raise
+        return self._finish_job(household_id, job_id, "DONE")
+
+    def _count_prefix(self, household_id: str, sk_prefix: str) -> int:
+        query_kwargs = {
+            "KeyConditionExpression": Key("pk").eq(f"HOUSE#{household_id}")
+            & Key("sk").begins_with(sk_prefix),
+            "Select": "COUNT",
+        }
+        count = 0
+        while True:
+            response = self.table.query(**query_kwargs)
+            count += response["Count"]
+            if not response.get("LastEvaluatedKey"):
+                return count
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def _job_progress(self, household_id: str, job_id: str, counts: Dict[str, int]) -> dict:
+        """Transaction action adding `counts` to a job's counters"""
+        names = {f"#c{i}": name for i, name in enumerate(counts)}
+        return {
+            "Update": {
+                "TableName": self.table_name,
+                "Key": {"pk": f"HOUSE#{household_id}", "sk": f"JOB#{job_id}"},
+                "UpdateExpression": "SET #updated_at = :updated_at ADD "
+                + ", ".join(f"{name} :c{i}" for i, name in enumerate(names)),
+                "ExpressionAttributeNames": {**names, "#updated_at": "updated_at"},
+                "ExpressionAttributeValues": {
+                    **{f":c{i}": count for i, count in enumerate(counts.values())},
+                    ":updated_at": datetime.utcnow().isoformat(),
+                },
+            }
+        }
+
+    def _untag_recipe_chunk(self, household_id: str, job_id: str, tag_id: str) -> int:
+        """Untag the next chunk of recipes in one transaction; returns how many (0: done)"""
+        pk = f"HOUSE#{household_id}"
+        for _ in range(TAG_CLEANUP_MAX_ATTEMPTS):
+            # Cleaned index items are deleted, so the next chunk is always first
+            response = self.table.query(
+                KeyConditionExpression=Key("pk").eq(pk)
+                & Key("sk").begins_with(f"TAGIDX#{tag_id}#"),
+                ProjectionExpression="recipe_id",
+                ConsistentRead=True,
+                Limit=TAG_CLEANUP_CHUNK_SIZE,
+            )
+            recipe_ids = [item["recipe_id"] for item in response.get("Items", [])]
+            if not recipe_ids:
+                return 0
+
+            old_recipes = self.get_recipes_by_id(household_id, recipe_ids)
+            updated_at = datetime.utcnow().isoformat()
+            new_recipes = [
+                {
+                    **recipe,
+                    "tag_ids": [t for t in recipe.get("tag_ids", []) if t != tag_id],
+                    "updated_at": updated_at,
+                    "version": int(recipe.get("version", 0)) + 1,
+                }
+                for recipe in old_recipes
+            ]
+            transact_items = []
+            for old, recipe in zip(old_recipes, new_recipes):
+                condition = _at_version(int(old.get("version", 0)))
+                condition["ExpressionAttributeNames"].update(
+                    {"#tag_ids": "tag_ids", "#updated_at": "updated_at"}
+                )
+                condition["ExpressionAttributeValues"].update(
+                    {":tag_ids": recipe["tag_ids"], ":updated_at": updated_at, ":one": 1}
+                )
+                transact_items.append({
+                    "Update": {
+                        "TableName": self.table_name,
+                        "Key": {"pk": pk, "sk": recipe["sk"]},
+                        "UpdateExpression": (
+                            "SET #tag_ids = :tag_ids, #updated_at = :updated_at "
+                            "ADD #version :one"
+                        ),
+                        **condition,
+                    }
+                })
+            transact_items.extend(
+                {
+                    "Delete": {
+                        "TableName": self.table_name,
+                        "Key": {"pk": pk, "sk": f"TAGIDX#{tag_id}#{recipe_id}"},
+                    }
+                }
+                for recipe_id in recipe_ids
+            )
+            transact_items.append(
+                self._job_progress(household_id, job_id, {"recipes_updated": len(recipe_ids)})
+            )
+            try:
+                self._transact(household_id, transact_items)
+            except ClientError as e:
+                if not _cancellation_codes(e):
+                    raise
+                continue
+            self._publish([item_change(old, new) for old, new in zip(old_recipes, new_recipes)])
+            return len(recipe_ids)
+        raise RuntimeError(f"Could not untag recipes of tag {tag_id}: they keep changing")
+
+    def _clean_dependent_rules(self, household_id: str, job_id: str, tag_id: str) -> None:
+        """Delete or disable the rules referring to the tag, a transaction per chunk"""
+        chunk_size = TAG_CLEANUP_CHUNK_SIZE
+        for _ in range(TAG_CLEANUP_MAX_ATTEMPTS):
+            dependent = []
+            for rule in self.iter_rules(household_id):
+                action = dependent_rule_action(rule, tag_id)
+                if action:
+                    dependent.append((rule, action))
+            if not dependent:
+                return
+
+            for start in range(0, len(dependent), chunk_size):
+                chunk = dependent[start:start + chunk_size]
+                transact_items = []
+                for rule, action in chunk:
+                    key = {"pk": rule["pk"], "sk": rule["sk"]}
+                    condition = _at_version(int(rule.get("version", 0)))
+                    if action == "delete":
+                        transact_items += [
+                            {"Delete": {"TableName": self.table_name, "Key": key, **condition}},
+                            {"Put": {"TableName": self.table_name, "Item": tombstone_item(rule)}},
+                        ]
+                        continue
+                    condition["ExpressionAttributeNames"].update(
+                        {"#enabled": "enabled", "#updated_at": "updated_at"}
+                    )
+                    condition["ExpressionAttributeValues"].update({
+                        ":enabled": False,
+                        ":updated_at": datetime.utcnow().isoformat(),
+                        ":one": 1,
+                    })
+                    transact_items.append({
+                        "Update": {
+                            "TableName": self.table_name,
+                            "Key": key,
+                            "UpdateExpression": (
+                                "SET #enabled = :enabled, #updated_at = :updated_at "
+                                "ADD #version :one"
+                            ),
+                            **condition,
+                        }
+                    })
+                transact_items.append(self._job_progress(household_id, job_id, {
+                    "rules_deleted": sum(1 for _, a in chunk if a == "delete"),
+                    "rules_disabled": sum(1 for _, a in chunk if a == "disable"),
+                }))
+                try:
+                    self._transact(household_id, transact_items)
+                except ClientError as e:
+                    if not _cancellation_codes(e):
+                        raise
+                    # A rule changed in between; list the remaining ones again
+                    break
+            else:
+                return
+        raise RuntimeError(f"Could not clean up rules of tag {tag_id}: they keep changing")
+
+    def _finish_job(
+        self, household_id: str, job_id: str, status: str, error: Optional[str] = None
+    ) -> dict:
         response = self.table.update_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"TAG#{tag_id}"},
-            UpdateExpression="SET " + ", ".join(update_expr),
-            ExpressionAttributeValues=expr_values,
-            ExpressionAttributeNames=expr_names,
+            Key={"pk": f"HOUSE#{household_id}", "sk": f"JOB#{job_id}"},
+            UpdateExpression=(
+                "SET #status = :status, #error = :error, "
+                "#updated_at = :updated_at, #expires_at = :expires_at"
+            ),
+            ExpressionAttributeNames={
+                "#status": "status",
+                "#error": "error",
+                "#updated_at": "updated_at",
+                "#expires_at": "expires_at",
+            },
+            ExpressionAttributeValues={
+                ":status": status,
+                ":error": error,
+                ":updated_at": datetime.utcnow().isoformat(),
+                ":expires_at": int(time.time()) + JOB_RETENTION_SECONDS,
+            },
             ReturnValues="ALL_NEW",
         )
-        return response.get("Attributes")
+        return response["Attributes"]
 
-    def delete_tag(self, household_id: str, tag_id: str) -> bool:
-        """Delete a tag"""
-        self.table.delete_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"TAG#{tag_id}"}
-        )
-        return True
+    def backfill_tag_name_guards(self, household_id: str) -> int:
+        """Create name guards for tags written before guards existed"""
+        created = 0
+        for tag in self.iter_tags(household_id):
+            try:
+                self.table.put_item(
+                    Item=tag_name_guard(household_id, tag["tag_id"], tag["name_lower"]),
+                    ConditionExpression=Attr("pk").not_exists(),
+                )
+                created += 1
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+        return created
 
     # --- Recipe Operations ---
+    def iter_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[dict]:
+        """Stream recipes for a household page by page, optionally filtered by tag.
+
+        A tag filter reads the TAGIDX# index items for that tag and fetches
+        only the matching recipes.
+        """
+        if not tag_id:
+            return self._iter_prefix(household_id, "RECIPE#", fields=fields)
+        return self._iter_recipes_by_tag(household_id, tag_id, fields)
+
+    def _iter_recipes_by_tag(
+        self, household_id: str, tag_id: str, fields: Optional[List[str]]
+    ) -> Iterator[dict]:
+        for page in self._paginate(
+            KeyConditionExpression=Key("pk").eq(f"HOUSE#{household_id}")
+            & Key("sk").begins_with(f"TAGIDX#{tag_id}#"),
+            ProjectionExpression="recipe_id",
+        ):
+            yield from self._tagged_recipes(
+                household_id, tag_id, [item["recipe_id"] for item in page], fields
+            )
+
+    def _tagged_recipes(
+        self,
+        household_id: str,
+        tag_id: str,
+        recipe_ids: List[str],
+        fields: Optional[List[str]],
+    ) -> List[dict]:
+        """Recipes an index page points to that still carry the tag.
+
+        An index item can outlive the tag on its recipe (e.g. one written
+        before index writes became transactional), so membership is checked
+        on the recipe itself.
+        """
+        recipes = self.get_recipes_by_id(
+            household_id, recipe_ids, fields and list(dict.fromkeys([*fields, "tag_ids"]))
+        )
+        return project_items(
+            [r for r in recipes if tag_id in r.get("tag_ids", [])], fields
+        )
+
+    def get_recipes_by_id(
+        self,
+        household_id: str,
+        recipe_ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """BatchGetItem recipes by id, in id order; ids with no recipe are skipped"""
+        recipes: List[dict] = []
+        for start in range(0, len(recipe_ids), BATCH_GET_SIZE):
+            keys = [
+                {"pk": f"HOUSE#{household_id}", "sk": f"RECIPE#{recipe_id}"}
+                for recipe_id in recipe_ids[start:start + BATCH_GET_SIZE]
+            ]
+            request = {"Keys": keys, **_projection(fields)}
+            for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+                if attempt:
+                    time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
+                response = self.dynamodb.meta.client.batch_get_item(
+                    RequestItems={self.table_name: request}
+                )
+                recipes.extend(response.get("Responses", {}).get(self.table_name, []))
+                request = (response.get("UnprocessedKeys") or {}).get(self.table_name)
+                if not request:
+                    break
+            else:
+                raise RuntimeError("Could not read recipes: keys left unprocessed")
+        return sorted(recipes, key=lambda r: r["sk"])
+
     def get_recipes(
-        self, household_id: str, tag_id: Optional[str] = None
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
     ) -> List[dict]:
-        """Get all recipes for a household, optionally filtered by tag"""
-        response = self.table.query(
-            KeyConditionExpression=Key("pk").eq(f"HOUSE#{household_id}")
-            & Key("sk").begins_with("RECIPE#")
+        """Get all recipes for a household (cached), optionally filtered by tag"""
+        if tag_id and self.cache.enabled:
+            # Filtering an already cached full list beats any DynamoDB read
+            version = self.get_data_version(household_id)
+            recipes = self.cache.peek(household_id, "recipes", version)
+            if recipes is not None:
+                return project_items([r for r in recipes if tag_id in r.get("tag_ids", [])], fields)
+
+        return self._cached_or_projected(
+            household_id,
+            ("recipes", tag_id) if tag_id else "recipes",
+            fields,
+            lambda fields=None: self.iter_recipes(household_id, tag_id, fields),
         )
-        recipes = response.get("Items", [])
 
-        if tag_id:
-            recipes = [r for r in recipes if tag_id in r.get("tag_ids", [])]
+    def get_recipes_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one page of recipes and the cursor for the next page"""
+        if not tag_id:
+            return self._query_page(household_id, "RECIPE#", limit, cursor, fields=fields)
 
-        return recipes
+        # Stale index items are dropped, so a page can come back short
+        index_items, next_cursor = self._query_page(
+            household_id, f"TAGIDX#{tag_id}#", limit, cursor
+        )
+        recipes = self._tagged_recipes(
+            household_id, tag_id, [item["recipe_id"] for item in index_items], fields
+        )
+        return recipes, next_cursor
 
     def get_recipe(self, household_id: str, recipe_id: str) -> Optional[dict]:
         """Get a single recipe"""
@@ -195,29 +1115,197 @@ class DynamoDBService:
         default_servings: int,
         notes: Optional[str],
     ) -> dict:
-        """Create a new recipe"""
-        recipe_id = str(uuid.uuid4())
-        now = datetime.utcnow().isoformat()
-        recipe = {
-            "pk": f"HOUSE#{household_id}",
-            "sk": f"RECIPE#{recipe_id}",
-            "recipe_id": recipe_id,
-            "title": title,
-            "title_lower": title.lower(),
-            "tag_ids": tag_ids,
-            "default_servings": default_servings,
-            "notes": notes or "",
-            "household_id": household_id,
-            "created_at": now,
-            "updated_at": now,
-        }
-        self.table.put_item(Item=recipe)
+        """Create a new recipe and its tag index items"""
+        recipe = recipe_item(household_id, title, tag_ids, default_servings, notes)
+        items = [recipe] + [
+            tag_index_item(household_id, tag_id, recipe["recipe_id"])
+            for tag_id in set(tag_ids)
+        ]
+        self._transact(
+            household_id,
+            [{"Put": {"TableName": self.table_name, "Item": item}} for item in items],
+        )
+        self._publish([item_change(None, recipe)])
         return recipe
 
+    def create_recipes_batch(
+        self, household_id: str, records: List[dict]
+    ) -> Tuple[List[dict], List[int]]:
+        """Create many recipes and their tag index items with BatchWriteItem.
+
+        `records` hold the RecipeCreate fields. All index items are written
+        first; a recipe is only put once every one of its index items was
+        applied, so a recipe is never visible without its index entries.
+        Returns the created items and the positions in `records` whose
+        RECIPE# item was not written.
+        """
+        recipes = [
+            recipe_item(
+                household_id,
+                r["title"],
+                r["tag_ids"],
+                r["default_servings"],
+                r.get("notes"),
+            )
+            for r in records
+        ]
+        owner: Dict[str, int] = {}
+        index_requests: List[dict] = []
+        for i, recipe in enumerate(recipes):
+            for tag_id in set(recipe["tag_ids"]):
+                item = tag_index_item(household_id, tag_id, recipe["recipe_id"])
+                owner[item["sk"]] = i
+                index_requests.append({"PutRequest": {"Item": item}})
+
+        def owners(requests: List[dict]) -> set:
+            return {owner[r["PutRequest"]["Item"]["sk"]] for r in requests}
+
+        failed = owners(self._batch_write_all(index_requests))
+        recipe_requests = [
+            {"PutRequest": {"Item": recipe}}
+            for i, recipe in enumerate(recipes)
+            if i not in failed
+        ]
+        owner.update((recipe["sk"], i) for i, recipe in enumerate(recipes))
+        failed |= owners(self._batch_write_all(recipe_requests))
+
+        # Index items of recipes that were not written would point at nothing
+        self._batch_write_all([
+            {"DeleteRequest": {"Key": {"pk": item["pk"], "sk": item["sk"]}}}
+            for item in (r["PutRequest"]["Item"] for r in index_requests)
+            if owner[item["sk"]] in failed
+        ])
+
+        if len(failed) < len(recipes):
+            self._bump_version(household_id)
+
+        created = [r for i, r in enumerate(recipes) if i not in failed]
+        self._publish([item_change(None, recipe) for recipe in created])
+        return created, sorted(failed)
+
+    def _batch_write_all(self, requests: List[dict]) -> List[dict]:
+        """Send write requests in chunks of 25; returns those not applied.
+
+        A chunk rejected as a whole counts as not applied, so one bad chunk
+        does not stop the rest.
+        """
+        unprocessed: List[dict] = []
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            batch = requests[start:start + BATCH_WRITE_SIZE]
+            try:
+                unprocessed.extend(self._batch_write(batch))
+            except ClientError:
+                unprocessed.extend(batch)
+        return unprocessed
+
+    def _batch_write(self, requests: List[dict]) -> List[dict]:
+        """Send up to 25 write requests, retrying unprocessed ones with backoff.
+
+        Returns the requests DynamoDB still had not processed after the last attempt.
+        """
+        pending = {self.table_name: requests}
+        for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+            if attempt:
+                # Full-jitter exponential backoff, as recommended for throttling
+                time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
+            response = self.dynamodb.meta.client.batch_write_item(RequestItems=pending)
+            pending = response.get("UnprocessedItems") or {}
+            if not pending:
+                return []
+        return pending.get(self.table_name, [])
+
+    def _tag_index_actions(
+        self,
+        household_id: str,
+        recipe_id: str,
+        old_tag_ids: List[str],
+        new_tag_ids: List[str],
+    ) -> List[dict]:
+        """Transaction actions adding and removing TAGIDX# items for a change of tags"""
+        old, new = set(old_tag_ids), set(new_tag_ids)
+        return [
+            {"Delete": {"TableName": self.table_name, "Key": {
+                "pk": f"HOUSE#{household_id}",
+                "sk": f"TAGIDX#{tag_id}#{recipe_id}",
+            }}}
+            for tag_id in old - new
+        ] + [
+            {"Put": {
+                "TableName": self.table_name,
+                "Item": tag_index_item(household_id, tag_id, recipe_id),
+            }}
+            for tag_id in new - old
+        ]
+
+    def _write_recipe_with_index(
+        self,
+        household_id: str,
+        recipe_id: str,
+        expected_version: Optional[int],
+        write: Callable[[dict], Tuple[dict, List[str], List[dict]]],
+    ) -> Optional[dict]:
+        """Write a recipe and its tag index changes in one transaction.
+
+        `write(old)` returns the recipe's {"Update": {...}} or {"Delete": {}}
+        action without Key or condition, its tag_ids afterwards and any other
+        actions. The write is conditional on the version read first, and
+        retried on a concurrent change. Returns the old recipe, or None if it
+        is missing; raises VersionConflictError as _conditional_update does.
+        """
+        key = {"pk": f"HOUSE#{household_id}", "sk": f"RECIPE#{recipe_id}"}
+        for _ in range(TAG_CLEANUP_MAX_ATTEMPTS):
+            old = self.table.get_item(Key=key, ConsistentRead=True).get("Item")
+            if old is None:
+                return None
+            version = int(old.get("version", 0))
+            if expected_version is not None and version != expected_version:
+                raise VersionConflictError(version)
+
+            action, new_tag_ids, others = write(old)
+            (kind, params), = action.items()
+            condition = _at_version(version)
+            params = {
+                **params,
+                "TableName": self.table_name,
+                "Key": key,
+                "ConditionExpression": f"attribute_exists(pk) AND ({condition['ConditionExpression']})",
+                "ExpressionAttributeNames": {
+                    **params.get("ExpressionAttributeNames", {}),
+                    **condition["ExpressionAttributeNames"],
+                },
+                "ExpressionAttributeValues": {
+                    **params.get("ExpressionAttributeValues", {}),
+                    **condition["ExpressionAttributeValues"],
+                },
+            }
+            try:
+                self._transact(
+                    household_id,
+                    [{kind: params}]
+                    + self._tag_index_actions(
+                        household_id, recipe_id, old.get("tag_ids", []), new_tag_ids
+                    )
+                    + others,
+                )
+            except ClientError as e:
+                if not _cancellation_codes(e):
+                    raise
+                continue
+            return old
+        raise RuntimeError(f"Could not write recipe {recipe_id}: it keeps changing")
+
     def update_recipe(
-        self, household_id: str, recipe_id: str, updates: dict
+        self,
+        household_id: str,
+        recipe_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
     ) -> Optional[dict]:
-        """Update a recipe"""
+        """Update a recipe, keeping its tag index items in step.
+
+        With `expected_version`, raises VersionConflictError unless the stored
+        recipe is still at that version. Returns None if the recipe is missing.
+        """
         update_expr = ["#updated_at = :updated_at"]
         expr_values = {":updated_at": datetime.utcnow().isoformat()}
         expr_names = {"#updated_at": "updated_at"}
@@ -232,30 +1320,106 @@ class DynamoDBService:
                     expr_values[":title_lower"] = value.lower()
                     expr_names["#title_lower"] = "title_lower"
 
-        response = self.table.update_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"RECIPE#{recipe_id}"},
-            UpdateExpression="SET " + ", ".join(update_expr),
-            ExpressionAttributeValues=expr_values,
-            ExpressionAttributeNames=expr_names,
-            ReturnValues="ALL_NEW",
-        )
-        return response.get("Attributes")
+        update_expression = "SET " + ", ".join(update_expr) + " ADD #version :one"
+        expr_names["#version"] = "version"
+        expr_values[":one"] = 1
+
+        if ":tag_ids" in expr_values:
+            # Tag changes move index items, so they go in one transaction
+            old = self._write_recipe_with_index(
+                household_id,
+                recipe_id,
+                expected_version,
+                lambda old: (
+                    {"Update": {
+                        "UpdateExpression": update_expression,
+                        "ExpressionAttributeNames": expr_names,
+                        "ExpressionAttributeValues": expr_values,
+                    }},
+                    expr_values[":tag_ids"],
+                    [],
+                ),
+            )
+        else:
+            # ALL_OLD gives the previous item; the new item is old + applied values
+            response = self._conditional_update(
+                key={"pk": f"HOUSE#{household_id}", "sk": f"RECIPE#{recipe_id}"},
+                update_expression=update_expression,
+                expected_version=expected_version,
+                expr_names=expr_names,
+                expr_values=expr_values,
+                return_values="ALL_OLD",
+            )
+            old = response and response["Attributes"]
+            if old is not None:
+                self._bump_version(household_id)
+        if old is None:
+            return None
+
+        recipe = dict(old)
+        for name_key, name in expr_names.items():
+            if name != "version":
+                recipe[name] = expr_values[":" + name_key[1:]]
+        recipe["version"] = int(old.get("version", 0)) + 1
+
+        self._publish([item_change(old, recipe)])
+        return recipe
 
     def delete_recipe(self, household_id: str, recipe_id: str) -> bool:
-        """Delete a recipe"""
-        self.table.delete_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"RECIPE#{recipe_id}"}
+        """Delete a recipe, its tag index items and leave its tombstone, in one transaction"""
+        old = self._write_recipe_with_index(
+            household_id,
+            recipe_id,
+            None,
+            lambda old: (
+                {"Delete": {}},
+                [],
+                [{"Put": {"TableName": self.table_name, "Item": tombstone_item(old)}}],
+            ),
         )
+        if old:
+            self._publish([item_change(old, None)])
         return True
 
+    def backfill_tag_index(self, household_id: str) -> int:
+        """Write TAGIDX# items for recipes created before the index existed"""
+        requests = [
+            {"PutRequest": {"Item": tag_index_item(household_id, tag_id, recipe["recipe_id"])}}
+            for recipe in self.iter_recipes(household_id, fields=["recipe_id", "tag_ids"])
+            for tag_id in set(recipe.get("tag_ids", []))
+        ]
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            if self._batch_write(requests[start:start + BATCH_WRITE_SIZE]):
+                raise RuntimeError(f"Could not backfill tag index for household {household_id}")
+        if requests:
+            self._bump_version(household_id)
+        return len(requests)
+
     # --- Rule Operations ---
-    def get_rules(self, household_id: str) -> List[dict]:
-        """Get all rules for a household"""
-        response = self.table.query(
-            KeyConditionExpression=Key("pk").eq(f"HOUSE#{household_id}")
-            & Key("sk").begins_with("RULE#")
+    def iter_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]:
+        """Stream all rules for a household page by page"""
+        return self._iter_prefix(household_id, "RULE#", fields=fields)
+
+    def get_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Get all rules for a household (cached), optionally only `fields`"""
+        return self._cached_or_projected(
+            household_id, "rules", fields,
+            lambda fields=None: self.iter_rules(household_id, fields),
         )
-        return response.get("Items", [])
+
+    def get_rules_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one page of rules and the cursor for the next page"""
+        return self._query_page(household_id, "RULE#", limit, cursor, fields=fields)
 
     def get_rule(self, household_id: str, rule_id: str) -> Optional[dict]:
         """Get a single rule"""
@@ -273,22 +1437,10 @@ class DynamoDBService:
         enabled: bool,
     ) -> dict:
         """Create a constraint rule"""
-        rule_id = str(uuid.uuid4())
-        now = datetime.utcnow().isoformat()
-        rule = {
-            "pk": f"HOUSE#{household_id}",
-            "sk": f"RULE#{rule_id}",
-            "rule_id": rule_id,
-            "rule_kind": "CONSTRAINT",
-            "constraint_type": constraint_type,
-            "tag_id": tag_id,
-            "max_count": max_count,
-            "enabled": enabled,
-            "household_id": household_id,
-            "created_at": now,
-            "updated_at": now,
-        }
-        self.table.put_item(Item=rule)
+        rule = constraint_rule_item(
+            household_id, constraint_type, tag_id, max_count, enabled
+        )
+        self._transact(household_id, [{"Put": {"TableName": self.table_name, "Item": rule}}])
         return rule
 
     def create_action_rule(
@@ -304,35 +1456,31 @@ class DynamoDBService:
         enabled: bool,
     ) -> dict:
         """Create an action rule"""
-        rule_id = str(uuid.uuid4())
-        now = datetime.utcnow().isoformat()
-        rule = {
-            "pk": f"HOUSE#{household_id}",
-            "sk": f"RULE#{rule_id}",
-            "rule_id": rule_id,
-            "rule_kind": "ACTION",
-            "action_type": action_type,
-            "target_type": target_type,
-            "tag_id": tag_id,
-            "recipe_id": recipe_id,
-            "offset_days": offset_days,
-            "time_local": time_local,
-            "message_template": message_template,
-            "enabled": enabled,
-            "household_id": household_id,
-            "created_at": now,
-            "updated_at": now,
-        }
-        self.table.put_item(Item=rule)
+        rule = action_rule_item(
+            household_id,
+            action_type,
+            target_type,
+            tag_id,
+            recipe_id,
+            offset_days,
+            time_local,
+            message_template,
+            enabled,
+        )
+        self._transact(household_id, [{"Put": {"TableName": self.table_name, "Item": rule}}])
         return rule
 
     def update_rule(
-        self, household_id: str, rule_id: str, updates: dict
+        self,
+        household_id: str,
+        rule_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
     ) -> Optional[dict]:
-        """Update a rule"""
+        """Update a rule (see update_recipe for `expected_version`)"""
         update_expr = ["#updated_at = :updated_at"]
-        expr_values = {":updated_at": datetime.utcnow().isoformat()}
-        expr_names = {"#updated_at": "updated_at"}
+        expr_values = {":updated_at": datetime.utcnow().isoformat(), ":one": 1}
+        expr_names = {"#updated_at": "updated_at", "#version": "version"}
 
         for key, value in updates.items():
             if value is not None:
@@ -340,47 +1488,203 @@ class DynamoDBService:
                 expr_values[f":{key}"] = value
                 expr_names[f"#{key}"] = key
 
-        response = self.table.update_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"RULE#{rule_id}"},
-            UpdateExpression="SET " + ", ".join(update_expr),
-            ExpressionAttributeValues=expr_values,
-            ExpressionAttributeNames=expr_names,
-            ReturnValues="ALL_NEW",
+        response = self._conditional_update(
+            key={"pk": f"HOUSE#{household_id}", "sk": f"RULE#{rule_id}"},
+            update_expression="SET " + ", ".join(update_expr) + " ADD #version :one",
+            expected_version=expected_version,
+            expr_names=expr_names,
+            expr_values=expr_values,
         )
+        if response is None:
+            return None
+        self._bump_version(household_id)
         return response.get("Attributes")
 
     def delete_rule(self, household_id: str, rule_id: str) -> bool:
-        """Delete a rule"""
-        self.table.delete_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"RULE#{rule_id}"}
-        )
+        """Delete a rule; the delete and its tombstone are one transaction"""
+        key = {"pk": f"HOUSE#{household_id}", "sk": f"RULE#{rule_id}"}
+        try:
+            self._transact(
+                household_id,
+                [
+                    {
+                        "Delete": {
+                            "TableName": self.table_name,
+                            "Key": key,
+                            "ConditionExpression": "attribute_exists(pk)",
+                        }
+                    },
+                    {
+                        "Put": {
+                            "TableName": self.table_name,
+                            "Item": tombstone_item({**key, "household_id": household_id}),
+                        }
+                    },
+                ],
+            )
+        except ClientError as e:
+            # The rule is already gone, and so needs no tombstone
+            if not _cancellation_codes(e):
+                raise
         return True
 
+    # --- Snapshot Operations ---
+    def get_household_snapshot(
+        self, household_id: str, week_start_date: str
+    ) -> HouseholdSnapshot:
+        """Load the household, its tags, recipes, rules and one week.
+
+        One query per item kind and a GetItem for the week run side by side,
+        so only those items are read (and billed): a single sort-key range
+        would also read every index, guard, job, tombstone and earlier week
+        that sorts in between. `TAG#`..`TAG$` leaves out TAGIDX# and TAGNAME#.
+        """
+        pk = Key("pk").eq(f"HOUSE#{household_id}")
+        week_key = {"pk": f"HOUSE#{household_id}", "sk": f"WEEK#{week_start_date}"}
+
+        def query(sk_condition) -> List[dict]:
+            # Runs on a pool thread; boto3 resources must not be shared
+            table = self.connection.resource().Table(self.table_name)
+            query_kwargs = {"KeyConditionExpression": pk & sk_condition}
+            items = []
+            while True:
+                response = table.query(**query_kwargs)
+                items.extend(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    return items
+                query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        def get_week() -> Optional[dict]:
+            table = self.connection.resource().Table(self.table_name)
+            return table.get_item(Key=week_key).get("Item")
+
+        pool = _snapshot_pool()
+        # Each read gets its own copy of the context, so request metrics see it
+        households, recipes, rules, tags = [
+            pool.submit(contextvars.copy_context().run, query, condition)
+            for condition in (
+                Key("sk").begins_with("HOUSE#"),
+                Key("sk").begins_with("RECIPE#"),
+                Key("sk").begins_with("RULE#"),
+                Key("sk").between("TAG#", "TAG$"),
+            )
+        ]
+        week = pool.submit(contextvars.copy_context().run, get_week)
+
+        snapshot = HouseholdSnapshot(
+            household=next(iter(households.result()), None),
+            plan=week.result(),
+            tags=tags.result(),
+            recipes=recipes.result(),
+            rules=rules.result(),
+        )
+        if snapshot.plan is None:
+            snapshot.plan = self._get_archived_week(household_id, week_start_date)
+        return snapshot
+
     # --- Weekly Plan Operations ---
     def get_weekly_plan(
-        self, household_id: str, week_start_date: str
+        self,
+        household_id: str,
+        week_start_date: str,
+        fields: Optional[List[str]] = None,
     ) -> Optional[dict]:
-        """Get weekly plan"""
+        """Get weekly plan, optionally only `fields`; archived weeks are read from their archive"""
         response = self.table.get_item(
-            Key={"pk": f"HOUSE#{household_id}", "sk": f"WEEK#{week_start_date}"}
+            Key={"pk": f"HOUSE#{household_id}", "sk": f"WEEK#{week_start_date}"},
+            **_projection(fields),
         )
-        return response.get("Item")
+        plan = response.get("Item")
+        if plan is None:
+            archived = self._get_archived_week(household_id, week_start_date)
+            if archived is not None:
+                return project_items([archived], fields)[0]
+        return plan
+
+    def get_weekly_plans_page(
+        self,
+        household_id: str,
+        from_week: str,
+        to_week: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one page of the weekly plans starting between two dates (inclusive).
+
+        Weeks sort by date under WEEK#, so the live part of the range is one
+        Query. Ranges reaching into the past also read the archives of those
+        years and merge their weeks in by date; cursors stay WEEK# keys.
+        """
+        sk_range = (f"WEEK#{from_week}", f"WEEK#{to_week}")
+        plans, next_cursor = self._query_page(household_id, "WEEK#", limit, cursor, sk_range)
+        archived = self._archived_weeks(household_id, from_week, to_week)
+        if not archived:
+            return plans, next_cursor
+
+        # A week that is both live and archived (a restore cut short) shows
+        # once, as its live item. Live weeks past this page are never reached:
+        # a full live page already fills the merged page before them.
+        after = decode_cursor(cursor, household_id, "WEEK#", sk_range)["sk"] if cursor else ""
+        live = {plan["sk"] for plan in plans}
+        merged = sorted(
+            plans + [plan for plan in archived if plan["sk"] > after and plan["sk"] not in live],
+            key=lambda plan: plan["sk"],
+        )
+        page = merged[:limit]
+        if next_cursor or len(merged) > limit:
+            next_cursor = encode_cursor({"pk": page[-1]["pk"], "sk": page[-1]["sk"]})
+        return page, next_cursor
 
     def save_weekly_plan(
-        self, household_id: str, week_start_date: str, entries: dict
+        self,
+        household_id: str,
+        week_start_date: str,
+        entries: dict,
+        expected_version: Optional[int] = None,
     ) -> dict:
-        """Save/update weekly plan"""
-        now = datetime.utcnow().isoformat()
-        plan = {
-            "pk": f"HOUSE#{household_id}",
-            "sk": f"WEEK#{week_start_date}",
-            "week_start_date": week_start_date,
-            "entries": entries,
-            "household_id": household_id,
-            "updated_at": now,
-        }
-        self.table.put_item(Item=plan)
-        return plan
+        """Save/update weekly plan.
+
+        With `expected_version`, raises VersionConflictError unless the stored
+        plan is at that version (0 for a week that does not exist yet).
+        """
+        self._restore_archived_week(household_id, week_start_date)
+        condition_kwargs = {}
+        if expected_version is not None:
+            condition_kwargs["ConditionExpression"] = _version_match(expected_version)
+        updated_at = datetime.utcnow().isoformat()
+        try:
+            response = self.table.update_item(
+                Key={"pk": f"HOUSE#{household_id}", "sk": f"WEEK#{week_start_date}"},
+                UpdateExpression=(
+                    "SET #entries = :entries, #week_start_date = :week_start_date, "
+                    "#household_id = :household_id, #updated_at = :updated_at "
+                    "ADD #version :one"
+                ),
+                ExpressionAttributeNames={
+                    "#entries": "entries",
+                    "#week_start_date": "week_start_date",
+                    "#household_id": "household_id",
+                    "#updated_at": "updated_at",
+                    "#version": "version",
+                },
+                ExpressionAttributeValues={
+                    ":entries": entries,
+                    ":week_start_date": week_start_date,
+                    ":household_id": household_id,
+                    ":updated_at": updated_at,
+                    ":one": 1,
+                },
+                ReturnValues="ALL_OLD",
+                **condition_kwargs,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                current = self.get_weekly_plan(household_id, week_start_date, ["version"])
+                raise VersionConflictError(int((current or {}).get("version", 0)))
+            raise
+        return self._published_plan(
+            response.get("Attributes"), household_id, week_start_date, entries, updated_at
+        )
 
     def update_plan_entry(
         self,
@@ -389,29 +1693,421 @@ class DynamoDBService:
         date: str,
         recipe_id: str,
         servings: int,
+        expected_version: Optional[int] = None,
     ) -> dict:
-        """Update a single plan entry"""
-        plan = self.get_weekly_plan(household_id, week_start_date)
-        if not plan:
-            entries = {}
-        else:
-            entries = plan.get("entries", {})
+        """Update a single plan entry in place, creating the week if it is missing"""
+        entry = {"recipe_id": recipe_id, "servings": servings}
+        return self.patch_plan_entries(
+            household_id, week_start_date, {date: entry}, [], expected_version
+        )
 
-        entries[date] = {"recipe_id": recipe_id, "servings": servings}
-        return self.save_weekly_plan(household_id, week_start_date, entries)
+    def patch_plan_entries(
+        self,
+        household_id: str,
+        week_start_date: str,
+        upserts: Dict[str, dict],
+        deletes: List[str],
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        """Set and remove plan entries in one UpdateItem, creating the week if needed.
+
+        `upserts` maps dates to entries; `deletes` lists dates to clear and
+        must not overlap `upserts`. With `expected_version`, raises
+        VersionConflictError unless the plan is at that version (0 for a week
+        that does not exist yet). Returns {} when there was nothing to write
+        because the week does not exist and only deletions were asked for.
+        """
+        if set(upserts) & set(deletes):
+            raise ValueError("A date cannot be both set and deleted")
+        key = {"pk": f"HOUSE#{household_id}", "sk": f"WEEK#{week_start_date}"}
+        version_match = (
+            _version_match(expected_version) if expected_version is not None else None
+        )
+
+        names = {"#entries": "entries", "#updated_at": "updated_at", "#version": "version"}
+        values: Dict[str, object] = {":one": 1}
+        set_paths, remove_paths = [], []
+        for i, (date, entry) in enumerate(upserts.items()):
+            names[f"#u{i}"] = date
+            values[f":u{i}"] = entry
+            set_paths.append(f"#entries.#u{i} = :u{i}")
+        for i, date in enumerate(deletes):
+            names[f"#d{i}"] = date
+            remove_paths.append(f"#entries.#d{i}")
+        in_place = "SET " + ", ".join(set_paths + ["#updated_at = :updated_at"])
+        if remove_paths:
+            in_place += " REMOVE " + ", ".join(remove_paths)
+        in_place += " ADD #version :one"
+
+        # A map path can only be set once the map exists, so try the in-place
+        # update first and fall back to creating the week. If another writer
+        # creates the week in between, the in-place update wins on retry.
+        for _ in range(3):
+            values[":updated_at"] = datetime.utcnow().isoformat()
+            condition = Attr("entries").exists()
+            try:
+                response = self.table.update_item(
+                    Key=key,
+                    UpdateExpression=in_place,
+                    ConditionExpression=condition & version_match if version_match else condition,
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                    ReturnValues="ALL_OLD",
+                )
+                old = response["Attributes"]
+                entries = {d: e for d, e in old["entries"].items() if d not in deletes}
+                entries.update(upserts)
+                return self._published_plan(
+                    old, household_id, week_start_date, entries, values[":updated_at"]
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+            if self._restore_archived_week(household_id, week_start_date):
+                continue
+            self._check_plan_version(household_id, week_start_date, expected_version)
+            if not upserts:
+                return {}
+
+            condition = Attr("entries").not_exists()
+            try:
+                response = self.table.update_item(
+                    Key=key,
+                    UpdateExpression=(
+                        "SET #entries = :entries, #week_start_date = :week_start_date, "
+                        "#household_id = :household_id, #updated_at = :updated_at "
+                        "ADD #version :one"
+                    ),
+                    ConditionExpression=condition & version_match if version_match else condition,
+                    ExpressionAttributeNames={
+                        "#entries": "entries",
+                        "#week_start_date": "week_start_date",
+                        "#household_id": "household_id",
+                        "#updated_at": "updated_at",
+                        "#version": "version",
+                    },
+                    ExpressionAttributeValues={
+                        ":entries": dict(upserts),
+                        ":week_start_date": week_start_date,
+                        ":household_id": household_id,
+                        ":updated_at": values[":updated_at"],
+                        ":one": 1,
+                    },
+                    ReturnValues="ALL_OLD",
+                )
+                return self._published_plan(
+                    response.get("Attributes"),
+                    household_id,
+                    week_start_date,
+                    dict(upserts),
+                    values[":updated_at"],
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+            self._check_plan_version(household_id, week_start_date, expected_version)
+
+        raise RuntimeError(f"Could not update plan entries for week {week_start_date}")
+
+    def _published_plan(
+        self,
+        old: Optional[dict],
+        household_id: str,
+        week_start_date: str,
+        entries: dict,
+        updated_at: str,
+    ) -> dict:
+        """Build the written plan from its old image and publish the change"""
+        plan = _plan_after_write(old, household_id, week_start_date, entries, updated_at)
+        self._publish([item_change(old, plan)])
+        return plan
+
+    def _check_plan_version(
+        self, household_id: str, week_start_date: str, expected_version: Optional[int]
+    ) -> None:
+        """After a failed conditional plan write, raise if the version was the cause"""
+        if expected_version is None:
+            return
+        current = self.get_weekly_plan(household_id, week_start_date, ["version"])
+        current_version = int((current or {}).get("version", 0))
+        if current_version != expected_version:
+            raise VersionConflictError(current_version)
 
     def delete_plan_entry(
-        self, household_id: str, week_start_date: str, date: str
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        expected_version: Optional[int] = None,
     ) -> dict:
-        """Delete a plan entry"""
-        plan = self.get_weekly_plan(household_id, week_start_date)
-        if plan and "entries" in plan:
-            entries = plan["entries"]
-            if date in entries:
-                del entries[date]
-            return self.save_weekly_plan(household_id, week_start_date, entries)
-        return plan or {}
-
-
-# Singleton instance
-db_service = DynamoDBService()
+        """Delete a plan entry in place (see patch_plan_entries for `expected_version`)"""
+        return self.patch_plan_entries(
+            household_id, week_start_date, {}, [date], expected_version
+        )
+
+    # --- Plan Archive ---
+    def _get_archive(
+        self, household_id: str, year: str, consistent: bool = False
+    ) -> Optional[dict]:
+        response = self.table.get_item(
+            Key={"pk": f"HOUSE#{household_id}", "sk": f"ARCHIVE#{year}"},
+            ConsistentRead=consistent,
+        )
+        return response.get("Item")
+
+    def _archived_weeks(self, household_id: str, from_week: str, to_week: str) -> List[dict]:
+        """Archived weeks starting between two dates (inclusive), in date order.
+
+        Only weeks before the archive horizon are ever archived, so ranges
+        that start at it or later cost no read.
+        """
+        horizon = archive_horizon_start()
+        if from_week >= horizon:
+            return []
+        to_week = min(to_week, horizon)
+        weeks = []
+        pages = self._paginate(
+            KeyConditionExpression=Key("pk").eq(f"HOUSE#{household_id}")
+            & Key("sk").between(f"ARCHIVE#{from_week[:4]}", f"ARCHIVE#{to_week[:4]}"),
+        )
+        for page in pages:
+            for archive in page:
+                weeks.extend(
+                    week
+                    for week in unpack_weeks(archive).values()
+                    if from_week <= week["week_start_date"] <= to_week
+                )
+        return sorted(weeks, key=lambda week: week["sk"])
+
+    def _get_archived_week(self, household_id: str, week_start_date: str) -> Optional[dict]:
+        if week_start_date >= archive_horizon_start():
+            return None
+        archive = self._get_archive(household_id, week_start_date[:4])
+        return unpack_weeks(archive).get(f"WEEK#{week_start_date}")
+
+    def _restore_archived_week(self, household_id: str, week_start_date: str) -> bool:
+        """Move an archived week back to its WEEK# item before it is written.
+
+        The week keeps its version, so If-Match values read from the archive
+        still apply. Returns whether the week was archived; when a concurrent
+        writer restores it first, that still counts. A transaction cancelled
+        by another change to the year's archive is retried while the week is
+        still in it; if a WEEK# item already exists, it wins and the archived
+        copy is dropped. Weeks within the archive horizon are never archived,
+        so writes to them skip the archive read.
+        """
+        if week_start_date >= archive_horizon_start():
+            return False
+        year = week_start_date[:4]
+        sk = f"WEEK#{week_start_date}"
+        archived = False
+        put_week = True
+        for _ in range(ARCHIVE_RESTORE_MAX_ATTEMPTS):
+            archive = self._get_archive(household_id, year, consistent=archived)
+            weeks = unpack_weeks(archive)
+            week = weeks.pop(sk, None)
+            if week is None:
+                return archived
+            archived = True
+
+            version = int(archive.get("version", 0))
+            if weeks:
+                archive_action = {
+                    "Put": {
+                        "TableName": self.table_name,
+                        "Item": _archive_item(household_id, year, weeks, version + 1),
+                        **_at_version(version),
+                    }
+                }
+            else:
+                archive_action = {
+                    "Delete": {
+                        "TableName": self.table_name,
+                        "Key": {"pk": archive["pk"], "sk": archive["sk"]},
+                        **_at_version(version),
+                    }
+                }
+            transact_items = [archive_action]
+            if put_week:
+                transact_items.append({
+                    "Put": {
+                        "TableName": self.table_name,
+                        "Item": week,
+                        "ConditionExpression": "attribute_not_exists(pk)",
+                    }
+                })
+            try:
+                self.dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+            except ClientError as e:
+                codes = _cancellation_codes(e)
+                if not codes:
+                    raise
+                if put_week and codes[1] == "ConditionalCheckFailed":
+                    put_week = False
+                continue
+            return True
+        raise RuntimeError(f"Could not restore archived week {week_start_date}: it keeps changing")
+
+    def compact_weekly_plans(self, household_id: str, before_week: str) -> int:
+        """Roll the weeks starting before `before_week` into per-year ARCHIVE# items.
+
+        Each archive holds a year of weeks as compressed JSON, so old plans
+        cost one item per year instead of one per week. Every transaction
+        moves up to ARCHIVE_CHUNK_SIZE weeks and is conditional on the
+        archive and each week being unchanged; a chunk that loses to a
+        concurrent write is left for the next run. Returns the weeks moved.
+
+        Nothing the API returns changes, so no change events are published
+        and the data version stays put. Weeks within the archive horizon are
+        never moved, as writes to them do not look for an archive.
+        """
+        before_week = min(before_week, archive_horizon_start())
+        by_year: Dict[str, List[dict]] = {}
+        pages = self._paginate(
+            KeyConditionExpression=Key("pk").eq(f"HOUSE#{household_id}")
+            & Key("sk").between("WEEK#", f"WEEK#{before_week}"),
+        )
+        for page in pages:
+            for week in page:
+                if week["week_start_date"] < before_week:
+                    by_year.setdefault(week["week_start_date"][:4], []).append(week)
+
+        moved = 0
+        for year, year_weeks in sorted(by_year.items()):
+            for i in range(0, len(year_weeks), ARCHIVE_CHUNK_SIZE):
+                chunk = year_weeks[i:i + ARCHIVE_CHUNK_SIZE]
+                archive = self._get_archive(household_id, year)
+                version = int((archive or {}).get("version", 0))
+                weeks = unpack_weeks(archive)
+                weeks.update((week["sk"], week) for week in chunk)
+                transact_items = [
+                    {
+                        "Put": {
+                            "TableName": self.table_name,
+                            "Item": _archive_item(household_id, year, weeks, version + 1),
+                            **_at_version(version),
+                        }
+                    }
+                ]
+                transact_items.extend(
+                    {
+                        "Delete": {
+                            "TableName": self.table_name,
+                            "Key": {"pk": week["pk"], "sk": week["sk"]},
+                            **_at_version(int(week.get("version", 0))),
+                        }
+                    }
+                    for week in chunk
+                )
+                try:
+                    self.dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+                except ClientError as e:
+                    if not _cancellation_codes(e):
+                        raise
+                    continue
+                moved += len(chunk)
+        return moved
+
+    # --- Sync Operations ---
+    def get_changes(
+        self,
+        household_id: str,
+        since: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Tags, recipes, rules and tombstones written after `since`, oldest first.
+
+        Reads the sparse gsi2 index (household, updated_at), so only changed
+        items are read. Index reads are eventually consistent; callers make
+        consecutive windows overlap to pick up late arrivals.
+        """
+        query_kwargs = {
+            "IndexName": "gsi2",
+            "KeyConditionExpression": Key("gsi2pk").eq(f"HOUSE#{household_id}")
+            & Key("updated_at").gt(since),
+        }
+        if cursor:
+            query_kwargs["ExclusiveStartKey"] = decode_cursor(
+                cursor, household_id, "", index_keys=("gsi2pk", "updated_at")
+            )
+        return self._fill_page(limit, query_kwargs)
+
+    def backfill_sync_index(self, household_id: str) -> int:
+        """Put tags, recipes and rules written before the sync index existed into it"""
+        updated = 0
+        for sk_prefix in ("TAG#", "RECIPE#", "RULE#"):
+            fields = ["gsi2pk", "updated_at", "created_at"]
+            for item in self._iter_prefix(household_id, sk_prefix, fields=fields):
+                if "gsi2pk" in item:
+                    continue
+                try:
+                    self.table.update_item(
+                        Key={"pk": item["pk"], "sk": item["sk"]},
+                        # Tags had no updated_at; their creation is the last change known
+                        UpdateExpression=(
+                            "SET gsi2pk = :gsi2pk, "
+                            "updated_at = if_not_exists(updated_at, created_at)"
+                        ),
+                        ConditionExpression=Attr("pk").exists(),
+                        ExpressionAttributeValues={":gsi2pk": item["pk"]},
+                    )
+                    updated += 1
+                except ClientError as e:
+                    if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                        raise
+        return updated
+
+    # --- Job Operations ---
+    def get_job(self, household_id: str, job_id: str) -> Optional[dict]:
+        """Get a background job's progress item"""
+        response = self.table.get_item(
+            Key={"pk": f"HOUSE#{household_id}", "sk": f"JOB#{job_id}"}
+        )
+        return response.get("Item")
+
+    def iter_jobs(self, household_id: str) -> Iterator[dict]:
+        """Stream the household's jobs that have not expired yet"""
+        return self._iter_prefix(household_id, "JOB#")
+
+    # --- Stats Operations ---
+    def get_household_stats(self, household_id: str) -> dict:
+        """The household's STATS item; all counts are empty before its first change"""
+        response = self.table.get_item(
+            Key={"pk": f"HOUSE#{household_id}", "sk": STATS_SK}
+        )
+        return response.get("Item") or empty_stats(household_id)
+
+    def save_household_stats(
+        self, household_id: str, stats: dict, expected_version: int
+    ) -> dict:
+        """Write the STATS item at the next version.
+
+        Raises VersionConflictError unless the stored item is at
+        `expected_version` (0 when there is none yet).
+        """
+        item = {**stats, "version": expected_version + 1}
+        try:
+            self.table.put_item(Item=item, ConditionExpression=_version_match(expected_version))
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            raise VersionConflictError(int(self.get_household_stats(household_id)["version"]))
+        return item
+
+    def rebuild_household_stats(self, household_id: str) -> dict:
+        """Recompute the STATS item from every recipe and week (backfill and repair)"""
+        weeks = {
+            week["sk"]: week
+            for week in self._archived_weeks(household_id, "0000-01-01", "9999-12-31")
+        }
+        # A live item wins over an archived copy of the same week
+        weeks.update((week["sk"], week) for week in self._iter_prefix(household_id, "WEEK#"))
+        stats = build_stats(
+            household_id,
+            self.iter_recipes(household_id, fields=["recipe_id", "tag_ids", "version"]),
+            weeks.values(),
+        )
+        drop_old_weeks(stats, archive_horizon_start())
+        current = self.get_household_stats(household_id)
+        return self.save_household_stats(household_id, stats, int(current["version"]))
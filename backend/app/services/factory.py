@@ -0,0 +1,71 @@
+from functools import lru_cache
+from typing import Optional
+
+from ..config import get_settings
+from .changes import LocalChangeFeed, StatsConsumer
+from .storage import StorageBackend
+
+STORAGE_BACKENDS = ("dynamodb", "sqlite", "memory")
+CHANGE_FEEDS = ("local", "streams", "off")
+
+
+@lru_cache()
+def _memory_storage() -> StorageBackend:
+    from .memory import InMemoryStorage
+
+    # One store per process: every thread must see the same data
+    return InMemoryStorage()
+
+
+@lru_cache()
+def _sqlite_storage(path: str) -> StorageBackend:
+    from .sqlite import SQLiteStorage
+
+    # Shared by all threads; it keeps one connection per thread internally
+    return SQLiteStorage(path)
+
+
+@lru_cache()
+def _local_change_feed() -> LocalChangeFeed:
+    from .dynamodb import DynamoDBService
+
+    # The consumer's own service publishes nothing, so STATS writes are not fed back
+    return LocalChangeFeed(lambda: StatsConsumer(DynamoDBService()))
+
+
+def change_feed() -> Optional[LocalChangeFeed]:
+    """The in-process change feed when Settings.change_feed is "local", else None.
+
+    With "streams", DynamoDB Streams delivers the events to app.streams.handler.
+    """
+    mode = get_settings().change_feed
+    if mode not in CHANGE_FEEDS:
+        raise ValueError(
+            f"Unknown change feed '{mode}', expected one of: {', '.join(CHANGE_FEEDS)}"
+        )
+    return _local_change_feed() if mode == "local" else None
+
+
+def create_storage() -> StorageBackend:
+    """Build the storage backend selected by Settings.storage_backend.
+
+    DynamoDB gets a new DynamoDBService per call, since its boto3 resource
+    must not be shared between threads (all of them share one client); the
+    other backends are thread-safe and shared by the whole process.
+    """
+    backend = get_settings().storage_backend
+    if backend == "dynamodb":
+        from .dynamodb import DynamoDBService
+
+        return DynamoDBService(changes=change_feed())
+    if backend == "sqlite":
+        return _sqlite_storage(get_settings().sqlite_path)
+    if backend == "memory":
+        return _memory_storage()
+    raise ValueError(
+        f"Unknown storage backend '{backend}', expected one of: {', '.join(STORAGE_BACKENDS)}"
+    )
+
+
+# Singleton instance
+db_service = create_storage()
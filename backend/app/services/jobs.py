@@ -0,0 +1,48 @@
+"""
+Background jobs tracked by JOB# items in the household partition.
+
+The request that starts the work writes the job item and returns it; the
+work runs afterwards, either in the API process (BACKGROUND_JOBS=local) or
+from the table stream when the item is inserted (BACKGROUND_JOBS=streams,
+see app.streams). Runs are resumable, so a job stopped part way is finished
+by running it again.
+"""
+import logging
+from typing import Optional
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from .async_dynamodb import async_db
+
+# job_type -> StorageBackend method running it as (household_id, job_id)
+JOB_RUNNERS = {
+    "TAG_DELETE": "run_tag_deletion",
+}
+
+logger = logging.getLogger("mealprepbuddy.jobs")
+
+_deserializer = TypeDeserializer()
+
+
+def run_job(storage, job: dict) -> Optional[dict]:
+    """Run a job to completion on `storage`; returns the finished job item"""
+    runner = getattr(storage, JOB_RUNNERS[job["job_type"]])
+    return runner(job["household_id"], job["job_id"])
+
+
+async def run_job_after_response(job: dict) -> None:
+    """BackgroundTasks entry point; failures are logged and left on the job item"""
+    try:
+        await async_db.call(JOB_RUNNERS[job["job_type"]], job["household_id"], job["job_id"])
+    except Exception:
+        logger.exception("Job %s (%s) failed", job["job_id"], job["job_type"])
+
+
+def job_from_stream_record(record: dict) -> Optional[dict]:
+    """The job item a DynamoDB Streams record inserted, or None for any other record"""
+    if record.get("eventName") != "INSERT":
+        return None
+    image = record.get("dynamodb", {}).get("NewImage") or {}
+    if not image.get("sk", {}).get("S", "").startswith("JOB#"):
+        return None
+    return {k: _deserializer.deserialize(v) for k, v in image.items()}
@@ -0,0 +1,182 @@
+"""
+Login and registration throttling per client IP and per email, checked
+before the user lookup and the password hash so rejected attempts cost no
+bcrypt time.
+
+Each key has a token bucket in this process, refilled at `*_per_minute` up
+to `*_burst`; an empty bucket rejects the attempt without any I/O, and an
+attempt only takes a token from its buckets once all of them have one. Attempts
+a bucket lets through are also counted in shared per-window counters
+(DynamoDB ADD with a TTL on expires_at), so a burst spread over many Lambda
+instances is limited too: a window admits at most what one full bucket
+allows over the same time. A key rejected by the shared counter has its
+local bucket emptied, so its further attempts stop at the fast path.
+
+If the shared counters cannot be reached, the local buckets still apply.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from ..config import get_settings
+from .async_dynamodb import async_db
+
+logger = logging.getLogger("mealprepbuddy.auth")
+
+
+@dataclass
+class _Limit:
+    scope: str
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second"""
+        return self.per_minute / 60
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class LoginThrottle:
+    """Token-bucket limiter for sign-in attempts, backed by shared window counters"""
+
+    def __init__(self):
+        settings = get_settings()
+        self.limits = [
+            _Limit("ip", settings.login_ip_per_minute, settings.login_ip_burst),
+            _Limit("email", settings.login_email_per_minute, settings.login_email_burst),
+        ]
+        self.window_seconds = settings.login_throttle_window_seconds
+        self.max_keys = settings.login_throttle_max_keys
+        self._lock = threading.Lock()
+        # "scope:key" -> bucket, least recently used first
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+        self.allowed = 0
+        self.rejected_local = 0
+        self.rejected_shared = 0
+        self.shared_errors = 0
+
+    @staticmethod
+    def _keys(ip: str, email: str) -> Tuple[str, str]:
+        # Emails are hashed so counters never store addresses, known or not
+        return ip, hashlib.sha256(email.lower().encode()).hexdigest()
+
+    def _bucket(self, bucket_key: str, limit: _Limit, now: float) -> _Bucket:
+        """The key's bucket, refilled up to `now`"""
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = _Bucket(float(limit.burst), now)
+            self._buckets[bucket_key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(bucket_key)
+            bucket.tokens = min(
+                float(limit.burst), bucket.tokens + (now - bucket.updated_at) * limit.rate
+            )
+            bucket.updated_at = now
+        return bucket
+
+    @staticmethod
+    def _wait(bucket: _Bucket, limit: _Limit) -> float:
+        """0 if the bucket has a token, or the seconds until it has one"""
+        if bucket.tokens >= 1:
+            return 0.0
+        return (1 - bucket.tokens) / limit.rate
+
+    def _drain(self, bucket_key: str) -> None:
+        bucket = self._buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.tokens = 0.0
+
+    def _window_limit(self, limit: _Limit) -> int:
+        """Attempts a full bucket admits over one counter window"""
+        return limit.burst + math.floor(limit.rate * self.window_seconds)
+
+    async def _count(self, counter_key: str, window_start: int) -> Optional[int]:
+        try:
+            return await async_db.count_login_attempt(
+                counter_key, window_start, window_start + 2 * self.window_seconds
+            )
+        except Exception:
+            logger.exception("Could not count a login attempt for %s", counter_key)
+            with self._lock:
+                self.shared_errors += 1
+            return None
+
+    async def check(self, ip: str, email: str) -> None:
+        """Count a sign-in attempt; raises 429 with Retry-After when over a limit"""
+        active = [
+            (limit, f"{limit.scope}:{key}")
+            for limit, key in zip(self.limits, self._keys(ip, email))
+            if limit.per_minute > 0
+        ]
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._bucket(bucket_key, limit, now) for limit, bucket_key in active]
+            waits = [self._wait(bucket, limit) for bucket, (limit, _) in zip(buckets, active)]
+            if any(waits):
+                # A rejected attempt takes nothing, so it cannot drain the other key's bucket
+                self.rejected_local += 1
+            else:
+                for bucket in buckets:
+                    bucket.tokens -= 1
+        if any(waits):
+            raise _too_many(max(waits))
+
+        window_start = int(time.time()) // self.window_seconds * self.window_seconds
+        counts: List[Optional[int]] = await asyncio.gather(
+            *(self._count(bucket_key, window_start) for _, bucket_key in active)
+        )
+        over = [
+            bucket_key
+            for (limit, bucket_key), count in zip(active, counts)
+            if count is not None and count > self._window_limit(limit)
+        ]
+        with self._lock:
+            for bucket_key in over:
+                self._drain(bucket_key)
+            if over:
+                self.rejected_shared += 1
+            else:
+                self.allowed += 1
+        if over:
+            raise _too_many(window_start + self.window_seconds - time.time())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "allowed": self.allowed,
+                "rejected_local": self.rejected_local,
+                "rejected_shared": self.rejected_shared,
+                "shared_errors": self.shared_errors,
+            }
+
+
+def _too_many(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many sign-in attempts, please retry later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+# Singleton instance
+login_throttle = LoginThrottle()
@@ -0,0 +1,818 @@
+import bisect
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .storage import (
+    VersionConflictError,
+    HouseholdSnapshot,
+    encode_cursor,
+    decode_cursor,
+    project_items,
+    user_item,
+    household_item,
+    tag_item,
+    tag_name_guard,
+    tag_index_item,
+    tag_deletion_job_item,
+    dependent_rule_action,
+    recipe_item,
+    constraint_rule_item,
+    action_rule_item,
+    tombstone_item,
+    auth_session_item,
+    refresh_token_expiry,
+    revoked_session_item,
+    REVOKED_PK,
+    throttle_counter_key,
+    SYNC_KINDS,
+    TOMBSTONE_PREFIX,
+)
+from .stats import build_stats
+
+
+def _current_version(item: Optional[dict]) -> int:
+    """Version of an item; missing items and items written before versioning are 0"""
+    return int((item or {}).get("version", 0))
+
+
+def _check_version(item: Optional[dict], expected_version: Optional[int]) -> None:
+    if expected_version is not None and _current_version(item) != expected_version:
+        raise VersionConflictError(_current_version(item))
+
+
+class InMemoryStorage:
+    """StorageBackend holding the single-table item layout in process memory.
+
+    Each partition keeps its sort keys in order, so prefix and range reads,
+    cursors and page limits behave as they do on DynamoDB. Every operation
+    runs under one lock, which makes conditional writes and multi-item
+    writes atomic. Items are copied in and out so callers never share state
+    with the store. Data lives as long as the process; meant for tests,
+    local runs and benchmarking the API layer without a database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # pk -> sk -> item
+        self._items: Dict[str, Dict[str, dict]] = {}
+        # pk -> sorted sort keys
+        self._sort_keys: Dict[str, List[str]] = {}
+        # gsi1pk -> (pk, sk); only the email index uses gsi1
+        self._gsi1: Dict[str, Tuple[str, str]] = {}
+
+    # --- Item Primitives ---
+    def _get(self, pk: str, sk: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        item = self._items.get(pk, {}).get(sk)
+        if item is None:
+            return None
+        return copy.deepcopy(project_items([item], fields)[0])
+
+    def _put(self, item: dict) -> None:
+        item = copy.deepcopy(item)
+        pk, sk = item["pk"], item["sk"]
+        partition = self._items.setdefault(pk, {})
+        if sk not in partition:
+            bisect.insort(self._sort_keys.setdefault(pk, []), sk)
+        else:
+            self._drop_gsi1(partition[sk])
+        partition[sk] = item
+        if "gsi1pk" in item:
+            self._gsi1[item["gsi1pk"]] = (pk, sk)
+
+    def _delete(self, pk: str, sk: str) -> Optional[dict]:
+        old = self._items.get(pk, {}).pop(sk, None)
+        if old is not None:
+            sort_keys = self._sort_keys[pk]
+            del sort_keys[bisect.bisect_left(sort_keys, sk)]
+            self._drop_gsi1(old)
+        return old
+
+    def _drop_gsi1(self, item: dict) -> None:
+        if self._gsi1.get(item.get("gsi1pk")) == (item["pk"], item["sk"]):
+            del self._gsi1[item["gsi1pk"]]
+
+    def _scan(
+        self, pk: str, low: str, high: str, after: Optional[str] = None
+    ) -> Iterator[dict]:
+        """Items of a partition with low <= sk <= high (after `after`), in sk order"""
+        sort_keys = self._sort_keys.get(pk, [])
+        if after is None:
+            start = bisect.bisect_left(sort_keys, low)
+        else:
+            start = bisect.bisect_right(sort_keys, max(after, low))
+        for sk in sort_keys[start:bisect.bisect_right(sort_keys, high)]:
+            yield self._items[pk][sk]
+
+    def _prefix(self, household_id: str, sk_prefix: str) -> Iterator[dict]:
+        # U+FFFF sorts after any character used in ids, dates and names
+        return self._scan(f"HOUSE#{household_id}", sk_prefix, sk_prefix + "\uffff")
+
+    def _list_prefix(
+        self, household_id: str, sk_prefix: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        with self._lock:
+            return copy.deepcopy(
+                project_items(list(self._prefix(household_id, sk_prefix)), fields)
+            )
+
+    def _page(
+        self,
+        household_id: str,
+        sk_prefix: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        sk_range: Optional[Tuple[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Up to `limit` items after `cursor`, with a cursor when more remain"""
+        pk = f"HOUSE#{household_id}"
+        after = decode_cursor(cursor, household_id, sk_prefix, sk_range)["sk"] if cursor else None
+        low, high = sk_range or (sk_prefix, sk_prefix + "\uffff")
+        with self._lock:
+            items = []
+            for item in self._scan(pk, low, high, after):
+                if len(items) == limit:
+                    last = items[-1]
+                    return (
+                        copy.deepcopy(project_items(items, fields)),
+                        encode_cursor({"pk": last["pk"], "sk": last["sk"]}),
+                    )
+                items.append(item)
+            return copy.deepcopy(project_items(items, fields)), None
+
+    def _put_tombstone(self, item: dict) -> None:
+        """Record a deletion for delta sync, dropping the partition's expired tombstones"""
+        now = int(time.time())
+        pk = item["pk"]
+        for old in list(self._scan(pk, TOMBSTONE_PREFIX, TOMBSTONE_PREFIX + "\uffff")):
+            if old["expires_at"] <= now:
+                self._delete(pk, old["sk"])
+        self._put(tombstone_item(item))
+
+    def _bump_version(self, household_id: str) -> int:
+        key = (f"HOUSE#{household_id}", "VERSION")
+        counter = self._get(*key) or {"pk": key[0], "sk": key[1], "data_version": 0}
+        counter["data_version"] += 1
+        self._put(counter)
+        return counter["data_version"]
+
+    # --- User Operations ---
+    def get_user_by_email(self, email: str) -> Optional[dict]:
+        with self._lock:
+            key = self._gsi1.get(f"EMAIL#{email.lower()}")
+            return self._get(*key) if key else None
+
+    def create_user(
+        self, email: str, password_hash: str, household_id: Optional[str] = None
+    ) -> dict:
+        with self._lock:
+            if not household_id:
+                household_id = str(uuid.uuid4())
+                self._put(household_item(household_id, f"{email}'s Household"))
+            user = user_item(email, password_hash, household_id)
+            self._put(user)
+            return user
+
+    def update_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> bool:
+        with self._lock:
+            user = self._get(f"USER#{user_id}", f"USER#{user_id}")
+            if not user or user["password_hash"] != old_hash:
+                return False
+            user["password_hash"] = new_hash
+            self._put(user)
+            return True
+
+    def get_household(self, household_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"HOUSE#{household_id}", f"HOUSE#{household_id}")
+
+    def iter_household_ids(self) -> Iterator[str]:
+        with self._lock:
+            household_ids = [
+                pk[len("HOUSE#"):] for pk, partition in self._items.items()
+                if pk.startswith("HOUSE#") and pk in partition
+            ]
+        return iter(household_ids)
+
+    # --- Auth Sessions ---
+    def create_auth_session(self, user: dict, session_id: str, token_hash: str) -> dict:
+        session = auth_session_item(user, session_id, token_hash)
+        with self._lock:
+            self._put(session)
+        return session
+
+    def get_auth_session(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"SESSION#{session_id}", f"SESSION#{session_id}")
+
+    def rotate_refresh_token(
+        self, session_id: str, old_hash: str, new_hash: str
+    ) -> Optional[dict]:
+        with self._lock:
+            session = self._get(f"SESSION#{session_id}", f"SESSION#{session_id}")
+            if (
+                not session
+                or session["token_hash"] != old_hash
+                or session["expires_at"] <= time.time()
+            ):
+                return None
+            session.update(token_hash=new_hash, expires_at=refresh_token_expiry())
+            self._put(session)
+            return session
+
+    def revoke_auth_session(self, session_id: str) -> None:
+        """End a session and put it on the revocation list, dropping expired entries"""
+        now = int(time.time())
+        with self._lock:
+            self._delete(f"SESSION#{session_id}", f"SESSION#{session_id}")
+            for old in list(self._scan(REVOKED_PK, "", "\uffff")):
+                if old["expires_at"] <= now:
+                    self._delete(REVOKED_PK, old["sk"])
+            self._put(revoked_session_item(session_id))
+
+    def get_revoked_session_ids(self) -> List[str]:
+        now = int(time.time())
+        with self._lock:
+            return [
+                item["session_id"] for item in self._scan(REVOKED_PK, "", "\uffff")
+                if item["expires_at"] > now
+            ]
+
+    # --- Login Throttling ---
+    def count_login_attempt(self, key: str, window_start: int, expires_at: int) -> int:
+        """Count an attempt in the window, dropping the key's earlier windows"""
+        item_key = throttle_counter_key(key, window_start)
+        with self._lock:
+            for old in list(self._scan(item_key["pk"], "", "\uffff")):
+                if old["sk"] != item_key["sk"]:
+                    self._delete(old["pk"], old["sk"])
+            counter = self._get(item_key["pk"], item_key["sk"]) or {**item_key, "attempts": 0}
+            counter.update(attempts=counter["attempts"] + 1, expires_at=expires_at)
+            self._put(counter)
+            return counter["attempts"]
+
+    def get_data_version(self, household_id: str) -> int:
+        with self._lock:
+            counter = self._get(f"HOUSE#{household_id}", "VERSION")
+        return int((counter or {}).get("data_version", 0))
+
+    # --- Tag Operations ---
+    def iter_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]:
+        return iter(self._list_prefix(household_id, "TAG#", fields))
+
+    def get_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        return self._list_prefix(household_id, "TAG#", fields)
+
+    def get_tags_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._page(household_id, "TAG#", limit, cursor, fields=fields)
+
+    def get_tag(self, household_id: str, tag_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"HOUSE#{household_id}", f"TAG#{tag_id}")
+
+    def create_tag(self, household_id: str, name: str, tag_type: str) -> dict:
+        tag = tag_item(household_id, name, tag_type)
+        with self._lock:
+            if self._get(f"HOUSE#{household_id}", f"TAGNAME#{name.lower()}"):
+                raise ValueError(f"Tag '{name}' already exists")
+            self._put(tag_name_guard(household_id, tag["tag_id"], name.lower()))
+            self._put(tag)
+            self._bump_version(household_id)
+        return tag
+
+    def update_tag(
+        self, household_id: str, tag_id: str, updates: dict
+    ) -> Optional[dict]:
+        pk = f"HOUSE#{household_id}"
+        updates = {key: value for key, value in updates.items() if value is not None}
+        with self._lock:
+            tag = self._get(pk, f"TAG#{tag_id}")
+            if not tag or not updates:
+                return tag
+
+            old_name_lower = tag["name_lower"]
+            tag.update(updates)
+            tag["name_lower"] = tag["name"].lower()
+            tag["updated_at"] = datetime.utcnow().isoformat()
+            if tag["name_lower"] != old_name_lower:
+                if self._get(pk, f"TAGNAME#{tag['name_lower']}"):
+                    raise ValueError(f"Tag '{tag['name']}' already exists")
+                self._put(tag_name_guard(household_id, tag_id, tag["name_lower"]))
+                self._delete(pk, f"TAGNAME#{old_name_lower}")
+            self._put(tag)
+            self._bump_version(household_id)
+            return tag
+
+    def delete_tag(self, household_id: str, tag_id: str) -> dict:
+        pk = f"HOUSE#{household_id}"
+        with self._lock:
+            old = self._delete(pk, f"TAG#{tag_id}")
+            if old:
+                guard = self._get(pk, f"TAGNAME#{old['name_lower']}")
+                if guard and guard["tag_id"] == tag_id:
+                    self._delete(pk, guard["sk"])
+                self._put_tombstone(old)
+            job = tag_deletion_job_item(
+                household_id,
+                tag_id,
+                sum(1 for _ in self._prefix(household_id, f"TAGIDX#{tag_id}#")),
+            )
+            self._put(job)
+            self._bump_version(household_id)
+        return job
+
+    def run_tag_deletion(self, household_id: str, job_id: str) -> Optional[dict]:
+        """Clean up after a tag deletion in one step; the lock makes it atomic"""
+        pk = f"HOUSE#{household_id}"
+        with self._lock:
+            job = self._get(pk, f"JOB#{job_id}")
+            if job is None or job["status"] == "DONE":
+                return job
+            tag_id = job["tag_id"]
+            now = datetime.utcnow().isoformat()
+
+            for index in list(self._prefix(household_id, f"TAGIDX#{tag_id}#")):
+                recipe = self._get(pk, f"RECIPE#{index['recipe_id']}")
+                if recipe is None:
+                    self._delete(pk, index["sk"])
+                else:
+                    old_tag_ids = recipe.get("tag_ids", [])
+                    recipe["tag_ids"] = [t for t in old_tag_ids if t != tag_id]
+                    recipe["updated_at"] = now
+                    recipe["version"] = _current_version(recipe) + 1
+                    self._put_recipe(household_id, recipe, old_tag_ids)
+                job["recipes_updated"] += 1
+
+            for rule in copy.deepcopy(list(self._prefix(household_id, "RULE#"))):
+                action = dependent_rule_action(rule, tag_id)
+                if action == "delete":
+                    self._delete(pk, rule["sk"])
+                    self._put_tombstone(rule)
+                    job["rules_deleted"] += 1
+                elif action == "disable":
+                    rule.update(
+                        enabled=False, updated_at=now, version=_current_version(rule) + 1
+                    )
+                    self._put(rule)
+                    job["rules_disabled"] += 1
+
+            job.update(status="DONE", updated_at=now)
+            self._put(job)
+            self._bump_version(household_id)
+            return job
+
+    def backfill_tag_name_guards(self, household_id: str) -> int:
+        created = 0
+        with self._lock:
+            for tag in list(self._prefix(household_id, "TAG#")):
+                guard = tag_name_guard(household_id, tag["tag_id"], tag["name_lower"])
+                if not self._get(guard["pk"], guard["sk"]):
+                    self._put(guard)
+                    created += 1
+        return created
+
+    # --- Recipe Operations ---
+    def iter_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[dict]:
+        return iter(self.get_recipes(household_id, tag_id, fields))
+
+    def get_recipes_by_id(
+        self,
+        household_id: str,
+        recipe_ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        pk = f"HOUSE#{household_id}"
+        with self._lock:
+            recipes = [self._get(pk, f"RECIPE#{recipe_id}", fields) for recipe_id in recipe_ids]
+        return sorted((r for r in recipes if r), key=lambda r: r["sk"])
+
+    def get_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        if not tag_id:
+            return self._list_prefix(household_id, "RECIPE#", fields)
+        with self._lock:
+            recipe_ids = [
+                item["recipe_id"] for item in self._prefix(household_id, f"TAGIDX#{tag_id}#")
+            ]
+            return self.get_recipes_by_id(household_id, recipe_ids, fields)
+
+    def get_recipes_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        if not tag_id:
+            return self._page(household_id, "RECIPE#", limit, cursor, fields=fields)
+        index_items, next_cursor = self._page(household_id, f"TAGIDX#{tag_id}#", limit, cursor)
+        recipes = self.get_recipes_by_id(
+            household_id, [item["recipe_id"] for item in index_items], fields
+        )
+        return recipes, next_cursor
+
+    def get_recipe(self, household_id: str, recipe_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"HOUSE#{household_id}", f"RECIPE#{recipe_id}")
+
+    def _put_recipe(self, household_id: str, recipe: dict, old_tag_ids: List[str]) -> None:
+        """Write a recipe and bring its tag index items in step"""
+        pk = f"HOUSE#{household_id}"
+        old, new = set(old_tag_ids), set(recipe["tag_ids"])
+        for tag_id in old - new:
+            self._delete(pk, f"TAGIDX#{tag_id}#{recipe['recipe_id']}")
+        for tag_id in new - old:
+            self._put(tag_index_item(household_id, tag_id, recipe["recipe_id"]))
+        self._put(recipe)
+
+    def create_recipe(
+        self,
+        household_id: str,
+        title: str,
+        tag_ids: List[str],
+        default_servings: int,
+        notes: Optional[str],
+    ) -> dict:
+        recipe = recipe_item(household_id, title, tag_ids, default_servings, notes)
+        with self._lock:
+            self._put_recipe(household_id, recipe, [])
+            self._bump_version(household_id)
+        return recipe
+
+    def create_recipes_batch(
+        self, household_id: str, records: List[dict]
+    ) -> Tuple[List[dict], List[int]]:
+        recipes = [
+            recipe_item(
+                household_id,
+                r["title"],
+                r["tag_ids"],
+                r["default_servings"],
+                r.get("notes"),
+            )
+            for r in records
+        ]
+        with self._lock:
+            for recipe in recipes:
+                self._put_recipe(household_id, recipe, [])
+            if recipes:
+                self._bump_version(household_id)
+        return recipes, []
+
+    def update_recipe(
+        self,
+        household_id: str,
+        recipe_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        with self._lock:
+            recipe = self._get(f"HOUSE#{household_id}", f"RECIPE#{recipe_id}")
+            if recipe is None:
+                return None
+            _check_version(recipe, expected_version)
+
+            old_tag_ids = recipe.get("tag_ids", [])
+            recipe.update({key: value for key, value in updates.items() if value is not None})
+            recipe["title_lower"] = recipe["title"].lower()
+            recipe["updated_at"] = datetime.utcnow().isoformat()
+            recipe["version"] = _current_version(recipe) + 1
+            self._put_recipe(household_id, recipe, old_tag_ids)
+            self._bump_version(household_id)
+            return recipe
+
+    def delete_recipe(self, household_id: str, recipe_id: str) -> bool:
+        pk = f"HOUSE#{household_id}"
+        with self._lock:
+            old = self._delete(pk, f"RECIPE#{recipe_id}")
+            for tag_id in set((old or {}).get("tag_ids", [])):
+                self._delete(pk, f"TAGIDX#{tag_id}#{recipe_id}")
+            if old:
+                self._put_tombstone(old)
+            self._bump_version(household_id)
+        return True
+
+    def backfill_tag_index(self, household_id: str) -> int:
+        written = 0
+        with self._lock:
+            for recipe in list(self._prefix(household_id, "RECIPE#")):
+                for tag_id in set(recipe.get("tag_ids", [])):
+                    self._put(tag_index_item(household_id, tag_id, recipe["recipe_id"]))
+                    written += 1
+            if written:
+                self._bump_version(household_id)
+        return written
+
+    # --- Rule Operations ---
+    def iter_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]:
+        return iter(self._list_prefix(household_id, "RULE#", fields))
+
+    def get_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        return self._list_prefix(household_id, "RULE#", fields)
+
+    def get_rules_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._page(household_id, "RULE#", limit, cursor, fields=fields)
+
+    def get_rule(self, household_id: str, rule_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"HOUSE#{household_id}", f"RULE#{rule_id}")
+
+    def _create_rule(self, household_id: str, rule: dict) -> dict:
+        with self._lock:
+            self._put(rule)
+            self._bump_version(household_id)
+        return rule
+
+    def create_constraint_rule(
+        self,
+        household_id: str,
+        constraint_type: str,
+        tag_id: str,
+        max_count: int,
+        enabled: bool,
+    ) -> dict:
+        return self._create_rule(
+            household_id,
+            constraint_rule_item(household_id, constraint_type, tag_id, max_count, enabled),
+        )
+
+    def create_action_rule(
+        self,
+        household_id: str,
+        action_type: str,
+        target_type: str,
+        tag_id: Optional[str],
+        recipe_id: Optional[str],
+        offset_days: int,
+        time_local: str,
+        message_template: str,
+        enabled: bool,
+    ) -> dict:
+        return self._create_rule(
+            household_id,
+            action_rule_item(
+                household_id,
+                action_type,
+                target_type,
+                tag_id,
+                recipe_id,
+                offset_days,
+                time_local,
+                message_template,
+                enabled,
+            ),
+        )
+
+    def update_rule(
+        self,
+        household_id: str,
+        rule_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        with self._lock:
+            rule = self._get(f"HOUSE#{household_id}", f"RULE#{rule_id}")
+            if rule is None:
+                return None
+            _check_version(rule, expected_version)
+
+            rule.update({key: value for key, value in updates.items() if value is not None})
+            rule["updated_at"] = datetime.utcnow().isoformat()
+            rule["version"] = _current_version(rule) + 1
+            self._put(rule)
+            self._bump_version(household_id)
+            return rule
+
+    def delete_rule(self, household_id: str, rule_id: str) -> bool:
+        with self._lock:
+            old = self._delete(f"HOUSE#{household_id}", f"RULE#{rule_id}")
+            if old:
+                self._put_tombstone(old)
+            self._bump_version(household_id)
+        return True
+
+    # --- Snapshot Operations ---
+    def get_household_snapshot(
+        self, household_id: str, week_start_date: str
+    ) -> HouseholdSnapshot:
+        pk = f"HOUSE#{household_id}"
+        with self._lock:
+            return HouseholdSnapshot(
+                household=self._get(pk, pk),
+                plan=self._get(pk, f"WEEK#{week_start_date}"),
+                tags=copy.deepcopy(list(self._prefix(household_id, "TAG#"))),
+                recipes=copy.deepcopy(list(self._prefix(household_id, "RECIPE#"))),
+                rules=copy.deepcopy(list(self._prefix(household_id, "RULE#"))),
+            )
+
+    # --- Weekly Plan Operations ---
+    def get_weekly_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        fields: Optional[List[str]] = None,
+    ) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"HOUSE#{household_id}", f"WEEK#{week_start_date}", fields)
+
+    def get_weekly_plans_page(
+        self,
+        household_id: str,
+        from_week: str,
+        to_week: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._page(
+            household_id,
+            "WEEK#",
+            limit,
+            cursor,
+            sk_range=(f"WEEK#{from_week}", f"WEEK#{to_week}"),
+        )
+
+    def _write_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        expected_version: Optional[int],
+        change,
+        create: bool = True,
+    ) -> dict:
+        """Apply `change` to the week's entries and bump its version.
+
+        A missing week is created, unless `create` is false, in which case
+        nothing is written and {} is returned.
+        """
+        with self._lock:
+            plan = self._get(f"HOUSE#{household_id}", f"WEEK#{week_start_date}")
+            _check_version(plan, expected_version)
+            if plan is None and not create:
+                return {}
+            plan = plan or {
+                "pk": f"HOUSE#{household_id}",
+                "sk": f"WEEK#{week_start_date}",
+                "week_start_date": week_start_date,
+                "household_id": household_id,
+            }
+            plan["entries"] = change(plan.get("entries", {}))
+            plan["updated_at"] = datetime.utcnow().isoformat()
+            plan["version"] = _current_version(plan) + 1
+            self._put(plan)
+            return plan
+
+    def save_weekly_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        entries: dict,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        return self._write_plan(
+            household_id, week_start_date, expected_version, lambda _: copy.deepcopy(entries)
+        )
+
+    def update_plan_entry(
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        recipe_id: str,
+        servings: int,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        entry = {"recipe_id": recipe_id, "servings": servings}
+        return self.patch_plan_entries(
+            household_id, week_start_date, {date: entry}, [], expected_version
+        )
+
+    def patch_plan_entries(
+        self,
+        household_id: str,
+        week_start_date: str,
+        upserts: Dict[str, dict],
+        deletes: List[str],
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        if set(upserts) & set(deletes):
+            raise ValueError("A date cannot be both set and deleted")
+
+        def change(entries: dict) -> dict:
+            entries = {d: e for d, e in entries.items() if d not in deletes}
+            entries.update(copy.deepcopy(upserts))
+            return entries
+
+        return self._write_plan(
+            household_id, week_start_date, expected_version, change, create=bool(upserts)
+        )
+
+    def delete_plan_entry(
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        return self.patch_plan_entries(
+            household_id, week_start_date, {}, [date], expected_version
+        )
+
+    def compact_weekly_plans(self, household_id: str, before_week: str) -> int:
+        """Weeks are never archived in memory, so there is nothing to compact"""
+        return 0
+
+    # --- Sync Operations ---
+    def get_changes(
+        self,
+        household_id: str,
+        since: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Changed items in (updated_at, sk) order, the order of the gsi2 index"""
+        pk = f"HOUSE#{household_id}"
+        after = (since, "\uffff")
+        if cursor:
+            key = decode_cursor(cursor, household_id, "", index_keys=("gsi2pk", "updated_at"))
+            after = max(after, (key["updated_at"], key["sk"]))
+        prefixes = (*SYNC_KINDS, TOMBSTONE_PREFIX)
+        now = int(time.time())
+        with self._lock:
+            changed = sorted(
+                (
+                    item for item in self._items.get(pk, {}).values()
+                    if item["sk"].startswith(prefixes)
+                    and (item.get("updated_at") or "", item["sk"]) > after
+                    and item.get("expires_at", now + 1) > now
+                ),
+                key=lambda item: (item["updated_at"], item["sk"]),
+            )
+            items = copy.deepcopy(changed[:limit])
+        next_cursor = None
+        if len(changed) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor({
+                "pk": pk, "sk": last["sk"], "gsi2pk": pk, "updated_at": last["updated_at"],
+            })
+        return items, next_cursor
+
+    def backfill_sync_index(self, household_id: str) -> int:
+        """Changes are found by scanning the partition, so there is no index to fill"""
+        return 0
+
+    # --- Job Operations ---
+    def get_job(self, household_id: str, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get(f"HOUSE#{household_id}", f"JOB#{job_id}")
+
+    def iter_jobs(self, household_id: str) -> Iterator[dict]:
+        return iter(self._list_prefix(household_id, "JOB#"))
+
+    # --- Stats Operations ---
+    def get_household_stats(self, household_id: str) -> dict:
+        """Aggregates computed from the stored recipes and weeks on each call, which is cheap in memory"""
+        with self._lock:
+            return copy.deepcopy(
+                build_stats(
+                    household_id,
+                    self._prefix(household_id, "RECIPE#"),
+                    self._prefix(household_id, "WEEK#"),
+                )
+            )
+
+    def rebuild_household_stats(self, household_id: str) -> dict:
+        return self.get_household_stats(household_id)
@@ -0,0 +1,247 @@
+"""
+Password hashing policy, and hashing off the event loop.
+
+New hashes use PASSWORD_HASH_SCHEME at the configured cost; stored hashes
+in another scheme or at a lower cost are reported by needs_update and
+replaced at their next successful login, so costs can be raised (see
+`manage calibrate-hashing`) without a migration. Costs never go below a
+security floor, and stored hashes are never rehashed to a lower cost.
+
+bcrypt burns tens to hundreds of milliseconds of CPU per call; run inline in
+an async route it stalls every other request on the worker. Hashes and
+verifications therefore go to a small dedicated pool: threads by default
+(bcrypt releases the GIL while it works) or processes. The pool is bounded:
+once every worker is busy and `password_hash_max_queue` calls are waiting,
+further calls fail at once with HashingBusyError instead of piling up
+behind a login burst.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.hash import argon2, bcrypt
+
+from ..config import get_settings
+from .pool_stats import PoolStats
+
+HASH_EXECUTORS = ("thread", "process")
+PASSWORD_HASH_SCHEMES = ("bcrypt", "argon2")
+
+# Lowest costs accepted, however slow the hardware: bcrypt log2 rounds
+# (OWASP's minimum is 10) and argon2 passes
+BCRYPT_MIN_ROUNDS = 10
+ARGON2_MIN_TIME_COST = 1
+
+# Cost ranges tried by calibrate()
+BCRYPT_ROUNDS_RANGE = (BCRYPT_MIN_ROUNDS, 16)
+ARGON2_TIME_COST_RANGE = (ARGON2_MIN_TIME_COST, 10)
+
+
+def argon2_available() -> bool:
+    """Whether an argon2 backend (argon2-cffi) is installed"""
+    return argon2.has_backend()
+
+
+def build_crypt_context() -> CryptContext:
+    """CryptContext for the configured scheme and costs.
+
+    The configured cost is also the minimum, so needs_update flags hashes
+    made at a lower cost but keeps dearer ones (e.g. after the cost was
+    lowered for slower hardware); the other scheme stays verifiable, but
+    deprecated. Raises ValueError for a cost below the floor.
+    """
+    settings = get_settings()
+    scheme = settings.password_hash_scheme
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(
+            f"Unknown password hash scheme '{scheme}', "
+            f"expected one of: {', '.join(PASSWORD_HASH_SCHEMES)}"
+        )
+    if scheme == "argon2" and not argon2_available():
+        raise ValueError("PASSWORD_HASH_SCHEME=argon2 needs the argon2-cffi package")
+    if settings.bcrypt_rounds < BCRYPT_MIN_ROUNDS:
+        raise ValueError(f"BCRYPT_ROUNDS must be at least {BCRYPT_MIN_ROUNDS}")
+    if settings.argon2_time_cost < ARGON2_MIN_TIME_COST:
+        raise ValueError(f"ARGON2_TIME_COST must be at least {ARGON2_MIN_TIME_COST}")
+
+    schemes = [scheme] + [
+        other for other in PASSWORD_HASH_SCHEMES
+        if other != scheme and (other == "bcrypt" or argon2_available())
+    ]
+    options = {
+        "bcrypt__rounds": settings.bcrypt_rounds,
+        "bcrypt__min_rounds": settings.bcrypt_rounds,
+        # Unset, passlib caps the desired rounds at the default
+        "bcrypt__max_rounds": bcrypt.max_rounds,
+    }
+    if "argon2" in schemes:
+        options.update({
+            "argon2__rounds": settings.argon2_time_cost,
+            "argon2__min_rounds": settings.argon2_time_cost,
+            "argon2__max_rounds": argon2.max_rounds,
+            "argon2__memory_cost": settings.argon2_memory_kib,
+        })
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+pwd_context = build_crypt_context()
+
+
+class HashingBusyError(Exception):
+    """Every password hashing worker is busy and the wait queue is full"""
+
+
+# Module-level so the process pool can pickle them
+def _timed(func: Callable, *args) -> Tuple[Any, float]:
+    """Run `func` in the worker; returns (result, seconds it ran)"""
+    started_at = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started_at
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """(verified, replacement hash when the stored one is outdated)"""
+    if not pwd_context.verify(password, password_hash):
+        return False, None
+    if pwd_context.needs_update(password_hash):
+        return True, pwd_context.hash(password)
+    return True, None
+
+
+# --- Calibration ---
+def benchmark(scheme: str, cost: int, samples: int = 3) -> float:
+    """Median milliseconds to hash a password with `scheme` at `cost`"""
+    if scheme == "bcrypt":
+        handler = bcrypt.using(rounds=cost)
+    else:
+        handler = argon2.using(
+            rounds=cost, memory_cost=get_settings().argon2_memory_kib
+        )
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(
+    scheme: str, budget_ms: float, samples: int = 3
+) -> Tuple[Optional[int], List[Tuple[int, float]]]:
+    """Highest cost of `scheme` that hashes within `budget_ms` on this machine.
+
+    Returns (cost, [(cost, median ms), ...] for every cost tried); the cost
+    is None when even the floor (BCRYPT_MIN_ROUNDS, ARGON2_MIN_TIME_COST) is
+    over budget. Costs are tried from the floor up and the search stops at
+    the first one over budget.
+    """
+    low, high = BCRYPT_ROUNDS_RANGE if scheme == "bcrypt" else ARGON2_TIME_COST_RANGE
+    # The first hash also loads the backend; keep it out of the timings
+    benchmark(scheme, low, 1)
+    chosen = None
+    timings = []
+    for cost in range(low, high + 1):
+        ms = benchmark(scheme, cost, samples)
+        timings.append((cost, ms))
+        if ms > budget_ms:
+            break
+        chosen = cost
+    return chosen, timings
+
+
+class PasswordHasher:
+    """Awaitable password hashing and verification on a bounded worker pool"""
+
+    def __init__(
+        self,
+        kind: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        settings = get_settings()
+        self.kind = kind or settings.password_hash_executor
+        if self.kind not in HASH_EXECUTORS:
+            raise ValueError(
+                f"Unknown password hash executor '{self.kind}', "
+                f"expected one of: {', '.join(HASH_EXECUTORS)}"
+            )
+        self.max_workers = max_workers or settings.password_hash_workers
+        self.max_queue = settings.password_hash_max_queue if max_queue is None else max_queue
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+
+        self._stats = PoolStats(self.max_workers)
+        self._rehashed_lock = threading.Lock()
+        self._rehashed = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers,
+                            thread_name_prefix="password-hash",
+                        )
+        return self._executor
+
+    async def _run(self, func: Callable, *args) -> Any:
+        if not self._stats.submit(limit=self.max_workers + self.max_queue):
+            raise HashingBusyError("Too many sign-ins in progress, please retry shortly")
+
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        try:
+            result, run_seconds = await loop.run_in_executor(self.executor, _timed, func, *args)
+        except BaseException:
+            self._stats.finish(succeeded=False)
+            raise
+        self._stats.timing(time.perf_counter() - submitted_at - run_seconds, run_seconds)
+        self._stats.finish(succeeded=True)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(_verify, password, password_hash)
+
+    async def verify_and_update(
+        self, password: str, password_hash: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also returns a new hash when the stored one is outdated"""
+        verified, new_hash = await self._run(_verify_and_update, password, password_hash)
+        if new_hash:
+            with self._rehashed_lock:
+                self._rehashed += 1
+        return verified, new_hash
+
+    def stats(self) -> dict:
+        """Snapshot of pool utilisation counters"""
+        with self._rehashed_lock:
+            rehashed = self._rehashed
+        return {
+            "executor": self.kind,
+            "max_queue": self.max_queue,
+            **self._stats.snapshot(),
+            "rehashed": rehashed,
+        }
+
+
+# Singleton instance
+password_hasher = PasswordHasher()
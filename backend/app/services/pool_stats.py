@@ -0,0 +1,68 @@
+import threading
+from typing import Optional
+
+
+class PoolStats:
+    """Utilisation counters of a bounded worker pool, safe to update from any thread.
+
+    `completed` counts calls that returned and `failed` calls that raised;
+    average wait and run times cover both. Calls refused before they were
+    queued count as `rejected` and nothing else.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def submit(self, limit: Optional[int] = None) -> bool:
+        """Count a call entering the pool; False (counted as rejected) at `limit` in flight"""
+        with self._lock:
+            if limit is not None and self._in_flight >= limit:
+                self._rejected += 1
+                return False
+            self._submitted += 1
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            return True
+
+    def timing(self, wait_seconds: float, run_seconds: float) -> None:
+        """Add the time a call waited for a worker and then ran"""
+        with self._lock:
+            self._wait_seconds += wait_seconds
+            self._run_seconds += run_seconds
+
+    def finish(self, succeeded: bool) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if succeeded:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "avg_wait_ms": round(self._wait_seconds * 1000 / finished, 3) if finished else 0.0,
+                "avg_run_ms": round(self._run_seconds * 1000 / finished, 3) if finished else 0.0,
+            }
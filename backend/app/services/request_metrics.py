@@ -0,0 +1,229 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from ..config import get_settings
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# Operations whose consumed capacity is billed as reads; every other one is a write
+READ_OPERATIONS = frozenset({"GetItem", "BatchGetItem", "Query", "Scan", "TransactGetItems"})
+
+logger = logging.getLogger("mealprepbuddy.requests")
+logger.setLevel(logging.INFO)
+
+
+class RequestMetrics:
+    """DynamoDB usage of one API request.
+
+    Updated from the worker threads that run the request's DynamoDB calls,
+    so every access goes through the lock. Once closed, further calls are
+    not counted: background tasks still run in the request's context after
+    the response has been sent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.calls = 0
+        self.rcu = 0.0
+        self.wcu = 0.0
+        self.dynamodb_seconds = 0.0
+        self._final: Optional[dict] = None
+
+    def record(self, operation: str, seconds: float, capacity_units: float) -> None:
+        with self._lock:
+            if self._final is not None:
+                return
+            self.calls += 1
+            self.dynamodb_seconds += seconds
+            if operation in READ_OPERATIONS:
+                self.rcu += capacity_units
+            else:
+                self.wcu += capacity_units
+
+    def close(self) -> dict:
+        """Stop counting; returns the usage as of now, also on later calls"""
+        usage = self.snapshot()
+        with self._lock:
+            if self._final is None:
+                self._final = usage
+            return self._final
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            if self._final is not None:
+                return self._final
+            return {
+                "duration_ms": round((time.perf_counter() - self.started_at) * 1000, 3),
+                "dynamodb_calls": self.calls,
+                "dynamodb_ms": round(self.dynamodb_seconds * 1000, 3),
+                "rcu": self.rcu,
+                "wcu": self.wcu,
+            }
+
+    def server_timing(self) -> str:
+        """Server-Timing header value for the usage so far"""
+        s = self.snapshot()
+        return (
+            f'dynamodb;dur={s["dynamodb_ms"]:.1f};'
+            f'desc="calls={s["dynamodb_calls"]} rcu={s["rcu"]:g} wcu={s["wcu"]:g}", '
+            f'total;dur={s["duration_ms"]:.1f}'
+        )
+
+
+# The metrics of the request being handled; async_db copies the context into
+# its worker threads, so DynamoDB calls made there are attributed correctly
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+# --- botocore event hooks ---
+def _capacity_units(consumed) -> float:
+    """Total CapacityUnits of a ConsumedCapacity entry or list (batch and transact calls)"""
+    if not consumed:
+        return 0.0
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return float(sum(entry.get("CapacityUnits", 0) for entry in consumed))
+
+
+def _request_consumed_capacity(params: dict, model, **kwargs) -> None:
+    if model.input_shape is not None and "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _start_timer(context: dict, **kwargs) -> None:
+    context["metrics_started_at"] = time.perf_counter()
+
+
+def _record_call(event_name: str, context: dict, parsed: Optional[dict] = None, **kwargs) -> None:
+    # Also bound to after-call-error (connection failures), which has no response
+    started_at = context.pop("metrics_started_at", None)
+    metrics = _current.get()
+    if started_at is None or metrics is None:
+        return
+    consumed = parsed.get("ConsumedCapacity") if parsed else None
+    metrics.record(
+        event_name.rsplit(".", 1)[-1],
+        time.perf_counter() - started_at,
+        _capacity_units(consumed),
+    )
+
+
+def install_capacity_hooks(client) -> None:
+    """Make every call on a DynamoDB client report its consumed capacity and duration"""
+    events = client.meta.events
+    # First, because the boto3 resource layer replaces the params with a copy
+    events.register_first("provide-client-params.dynamodb", _request_consumed_capacity)
+    events.register("before-call.dynamodb", _start_timer)
+    events.register("after-call.dynamodb", _record_call)
+    events.register("after-call-error.dynamodb", _record_call)
+
+
+# --- Per-route aggregates ---
+class RouteMetrics:
+    """Request time and DynamoDB usage totals per route for this worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # "METHOD /path/{template}" -> running totals
+        self._routes: Dict[str, dict] = {}
+
+    def add(self, route: str, usage: dict) -> None:
+        with self._lock:
+            totals = self._routes.get(route)
+            if totals is None:
+                totals = self._routes[route] = {
+                    "requests": 0,
+                    "duration_ms": 0.0,
+                    "max_duration_ms": 0.0,
+                    "dynamodb_calls": 0,
+                    "dynamodb_ms": 0.0,
+                    "rcu": 0.0,
+                    "wcu": 0.0,
+                }
+            totals["requests"] += 1
+            totals["duration_ms"] += usage["duration_ms"]
+            totals["max_duration_ms"] = max(totals["max_duration_ms"], usage["duration_ms"])
+            totals["dynamodb_calls"] += usage["dynamodb_calls"]
+            totals["dynamodb_ms"] += usage["dynamodb_ms"]
+            totals["rcu"] += usage["rcu"]
+            totals["wcu"] += usage["wcu"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    "requests": t["requests"],
+                    "avg_ms": round(t["duration_ms"] / t["requests"], 3),
+                    "max_ms": round(t["max_duration_ms"], 3),
+                    "dynamodb_calls": t["dynamodb_calls"],
+                    "avg_dynamodb_ms": round(t["dynamodb_ms"] / t["requests"], 3),
+                    "rcu": t["rcu"],
+                    "wcu": t["wcu"],
+                    "avg_rcu": round(t["rcu"] / t["requests"], 3),
+                    "avg_wcu": round(t["wcu"] / t["requests"], 3),
+                }
+                for route, t in sorted(self._routes.items())
+            }
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware measuring each HTTP request's DynamoDB usage.
+
+    Adds a Server-Timing header, logs one JSON line when the response is
+    done and adds the request to the per-route totals. Calls made while a
+    streamed body is being sent count towards the log line and totals, but
+    not the header, which has already gone out by then. Usage is final once
+    the last body message is sent, so background tasks are not counted.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(SERVER_TIMING_HEADER, metrics.server_timing())
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                metrics.close()
+                # Detach where possible too; close() covers copies of the context
+                _current.set(None)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope; templates keep the key count bounded
+            route = scope.get("route")
+            name = f'{scope["method"]} {route.path if route else "<unmatched>"}'
+            usage = metrics.close()
+            route_metrics.add(name, usage)
+            if get_settings().log_request_metrics:
+                logger.info(json.dumps({
+                    "event": "request",
+                    "route": name,
+                    "path": scope["path"],
+                    "status": status_code,
+                    **usage,
+                }))
+
+
+# Singleton instance
+route_metrics = RouteMetrics()
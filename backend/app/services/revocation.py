@@ -0,0 +1,154 @@
+"""
+Revocation checks for access tokens without a database read per request.
+
+Access tokens carry the id of their sign-in session (`sid`). Revoking a
+session deletes it and adds it to a revocation list whose entries expire
+once every access token of the session has; each process reloads that list
+every `revocation_sync_seconds` into a bloom filter. A session missing from
+the filter is not revoked (as of the last reload) and costs nothing; the
+rare hit, true or false positive, is settled by reading the session item,
+which revocation deletes.
+
+Revocations made by this process apply at once; those made elsewhere apply
+after the next reload here.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from ..config import get_settings
+from .async_dynamodb import async_db
+
+logger = logging.getLogger("mealprepbuddy.auth")
+
+
+class BloomFilter:
+    """Fixed-size set of strings with false positives but no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.sha256(value.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class RevocationFilter:
+    """Per-process bloom filter of revoked sessions, reloaded periodically"""
+
+    def __init__(
+        self,
+        sync_seconds: Optional[int] = None,
+        capacity: Optional[int] = None,
+        error_rate: Optional[float] = None,
+    ):
+        settings = get_settings()
+        self.sync_seconds = sync_seconds or settings.revocation_sync_seconds
+        self.capacity = capacity or settings.revocation_filter_capacity
+        self.error_rate = error_rate or settings.revocation_filter_error_rate
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._entries = 0
+        # Revoked here and possibly not in the list loaded by a concurrent
+        # reload: session id -> monotonic time the entry may be dropped
+        self._local: Dict[str, float] = {}
+        self._next_sync_at = 0.0
+        self._last_sync_at: Optional[float] = None
+
+        self.checks = 0
+        self.positives = 0
+        self.false_positives = 0
+        self.syncs = 0
+        self.sync_failures = 0
+
+    def _build(self, session_ids: Iterable[str]) -> None:
+        now = time.monotonic()
+        self._local = {sid: until for sid, until in self._local.items() if until > now}
+        session_ids = set(session_ids) | set(self._local)
+        bloom = BloomFilter(max(self.capacity, len(session_ids)), self.error_rate)
+        for session_id in session_ids:
+            bloom.add(session_id)
+        self._filter = bloom
+        self._entries = len(session_ids)
+
+    async def sync(self) -> None:
+        """Reload the revocation list; on failure the previous filter stays in use"""
+        # Claimed before the read, so concurrent requests do not reload too
+        self._next_sync_at = time.monotonic() + self.sync_seconds
+        try:
+            session_ids = await async_db.get_revoked_session_ids()
+        except Exception:
+            logger.exception("Could not load the revoked session list")
+            with self._lock:
+                self.sync_failures += 1
+            return
+        with self._lock:
+            self._build(session_ids)
+            self.syncs += 1
+            self._last_sync_at = time.monotonic()
+
+    def add(self, session_id: str) -> None:
+        """Record a session this process just revoked"""
+        settings = get_settings()
+        with self._lock:
+            self._local[session_id] = (
+                time.monotonic() + settings.access_token_minutes * 60 + self.sync_seconds
+            )
+            self._filter.add(session_id)
+            self._entries += 1
+
+    async def is_revoked(self, session_id: str) -> bool:
+        if time.monotonic() >= self._next_sync_at:
+            await self.sync()
+        with self._lock:
+            self.checks += 1
+            if session_id not in self._filter:
+                return False
+            self.positives += 1
+        # Revocation deletes the session, so a live session was a false positive
+        session = await async_db.get_auth_session(session_id)
+        if session is not None and session["expires_at"] > time.time():
+            with self._lock:
+                self.false_positives += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": self._entries,
+                "filter_bits": self._filter.size,
+                "hash_count": self._filter.hash_count,
+                "checks": self.checks,
+                "positives": self.positives,
+                "false_positives": self.false_positives,
+                "syncs": self.syncs,
+                "sync_failures": self.sync_failures,
+                "seconds_since_sync": (
+                    round(time.monotonic() - self._last_sync_at, 1)
+                    if self._last_sync_at is not None else None
+                ),
+            }
+
+
+# Singleton instance
+revocation_filter = RevocationFilter()
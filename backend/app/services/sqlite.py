@@ -0,0 +1,1015 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .storage import (
+    VersionConflictError,
+    HouseholdSnapshot,
+    encode_cursor,
+    decode_cursor,
+    project_items,
+    unpack_weeks,
+    user_item,
+    household_item,
+    tag_item,
+    tag_deletion_job_item,
+    dependent_rule_action,
+    recipe_item,
+    constraint_rule_item,
+    action_rule_item,
+    tombstone_item,
+    auth_session_item,
+    refresh_token_expiry,
+    revoked_session_item,
+)
+from .stats import build_stats
+
+# SQLite allows 999 bound parameters per statement on older builds
+SQLITE_MAX_PARAMS = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    email_lower TEXT NOT NULL UNIQUE,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS auth_sessions (
+    session_id TEXT PRIMARY KEY,
+    token_hash TEXT NOT NULL,
+    expires_at INTEGER NOT NULL,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revoked_sessions (
+    session_id TEXT PRIMARY KEY,
+    expires_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS login_attempts (
+    key TEXT NOT NULL,
+    window_start INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    PRIMARY KEY (key, window_start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS households (
+    household_id TEXT PRIMARY KEY,
+    item TEXT,
+    data_version INTEGER NOT NULL DEFAULT 0
+);
+-- Tags, recipes, rules and weeks; kind and item_id are the two halves of
+-- the DynamoDB sort key, so (household_id, kind) lists and week ranges are
+-- primary key range scans
+CREATE TABLE IF NOT EXISTS items (
+    household_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    item TEXT NOT NULL,
+    PRIMARY KEY (household_id, kind, item_id)
+) WITHOUT ROWID;
+-- Delta sync: the items a client mirrors (and tombstones of deleted ones)
+-- by household and last change, like the sparse gsi2 index on DynamoDB
+CREATE INDEX IF NOT EXISTS items_by_update
+    ON items (household_id, json_extract(item, '$.updated_at'), kind, item_id)
+    WHERE kind IN ('TAG', 'RECIPE', 'RULE', 'TOMBSTONE');
+CREATE TABLE IF NOT EXISTS tag_names (
+    household_id TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    tag_id TEXT NOT NULL,
+    PRIMARY KEY (household_id, name_lower)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recipe_tags (
+    household_id TEXT NOT NULL,
+    tag_id TEXT NOT NULL,
+    recipe_id TEXT NOT NULL,
+    PRIMARY KEY (household_id, tag_id, recipe_id)
+) WITHOUT ROWID;
+"""
+
+
+def _dump(item: dict) -> str:
+    # DynamoDB exports carry numbers as Decimal
+    return json.dumps(
+        item,
+        separators=(",", ":"),
+        default=lambda v: int(v) if isinstance(v, Decimal) and v == int(v) else float(v),
+    )
+
+
+def _current_version(item: Optional[dict]) -> int:
+    """Version of an item; missing items and items written before versioning are 0"""
+    return int((item or {}).get("version", 0))
+
+
+def _check_version(item: Optional[dict], expected_version: Optional[int]) -> None:
+    if expected_version is not None and _current_version(item) != expected_version:
+        raise VersionConflictError(_current_version(item))
+
+
+class SQLiteStorage:
+    """StorageBackend on a local SQLite database, for single-node deployments.
+
+    Items keep the single-table layout and are stored as JSON, but each kind
+    of lookup has a real table and index: users by email, household items by
+    (household, kind, id), tag names and tag membership. The database runs
+    in WAL mode so readers never wait on the writer; every thread gets its
+    own connection, and writes run in BEGIN IMMEDIATE transactions, which
+    makes conditional and multi-row writes atomic.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, write: bool = True) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- Row Helpers ---
+    def _fetch(self, sql: str, params: tuple = (), conn=None) -> List[dict]:
+        rows = (conn or self._connection()).execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _get(self, household_id: str, kind: str, item_id: str, conn=None) -> Optional[dict]:
+        items = self._fetch(
+            "SELECT item FROM items WHERE household_id = ? AND kind = ? AND item_id = ?",
+            (household_id, kind, item_id),
+            conn,
+        )
+        return items[0] if items else None
+
+    def _list(
+        self, household_id: str, kind: str, fields: Optional[List[str]] = None, conn=None
+    ) -> List[dict]:
+        items = self._fetch(
+            "SELECT item FROM items WHERE household_id = ? AND kind = ? ORDER BY item_id",
+            (household_id, kind),
+            conn,
+        )
+        return project_items(items, fields)
+
+    def _put(self, conn: sqlite3.Connection, item: dict) -> None:
+        kind, item_id = item["sk"].split("#", 1)
+        conn.execute(
+            "INSERT OR REPLACE INTO items (household_id, kind, item_id, version, item) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (item["pk"][len("HOUSE#"):], kind, item_id, _current_version(item), _dump(item)),
+        )
+
+    def _delete(
+        self, conn: sqlite3.Connection, household_id: str, kind: str, item_id: str
+    ) -> Optional[dict]:
+        old = self._get(household_id, kind, item_id, conn)
+        if old is not None:
+            conn.execute(
+                "DELETE FROM items WHERE household_id = ? AND kind = ? AND item_id = ?",
+                (household_id, kind, item_id),
+            )
+        return old
+
+    def _page(
+        self,
+        household_id: str,
+        kind: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        id_range: Optional[Tuple[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Up to `limit` items of one kind after `cursor`, with a cursor when more remain"""
+        sk_range = id_range and (f"{kind}#{id_range[0]}", f"{kind}#{id_range[1]}")
+        after = ""
+        if cursor:
+            after = decode_cursor(cursor, household_id, f"{kind}#", sk_range)["sk"]
+            after = after[len(kind) + 1:]
+        low, high = id_range or ("", "\uffff")
+        items = self._fetch(
+            "SELECT item FROM items WHERE household_id = ? AND kind = ? "
+            "AND item_id > ? AND item_id BETWEEN ? AND ? ORDER BY item_id LIMIT ?",
+            (household_id, kind, after, low, high, limit + 1),
+        )
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor({"pk": items[-1]["pk"], "sk": items[-1]["sk"]})
+        return project_items(items, fields), next_cursor
+
+    def _put_tombstone(self, conn: sqlite3.Connection, item: dict) -> None:
+        """Record a deletion for delta sync, dropping the household's expired tombstones"""
+        conn.execute(
+            "DELETE FROM items WHERE household_id = ? AND kind = 'TOMBSTONE' "
+            "AND json_extract(item, '$.expires_at') <= ?",
+            (item["household_id"], int(time.time())),
+        )
+        self._put(conn, tombstone_item(item))
+
+    def _bump_version(self, conn: sqlite3.Connection, household_id: str) -> None:
+        conn.execute(
+            "INSERT INTO households (household_id, data_version) VALUES (?, 1) "
+            "ON CONFLICT (household_id) DO UPDATE SET data_version = data_version + 1",
+            (household_id,),
+        )
+
+    # --- User Operations ---
+    def get_user_by_email(self, email: str) -> Optional[dict]:
+        users = self._fetch("SELECT item FROM users WHERE email_lower = ?", (email.lower(),))
+        return users[0] if users else None
+
+    def create_user(
+        self, email: str, password_hash: str, household_id: Optional[str] = None
+    ) -> dict:
+        with self._transaction() as conn:
+            if not household_id:
+                household_id = str(uuid.uuid4())
+                self._put_household(conn, household_item(household_id, f"{email}'s Household"))
+            user = user_item(email, password_hash, household_id)
+            self._put_user(conn, user)
+        return user
+
+    def update_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> bool:
+        with self._transaction() as conn:
+            users = self._fetch("SELECT item FROM users WHERE user_id = ?", (user_id,), conn)
+            if not users or users[0]["password_hash"] != old_hash:
+                return False
+            self._put_user(conn, {**users[0], "password_hash": new_hash})
+        return True
+
+    def _put_user(self, conn: sqlite3.Connection, user: dict) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO users (user_id, email_lower, item) VALUES (?, ?, ?)",
+            (user["user_id"], user["email_lower"], _dump(user)),
+        )
+
+    def _put_household(self, conn: sqlite3.Connection, household: dict) -> None:
+        conn.execute(
+            "INSERT INTO households (household_id, item) VALUES (?, ?) "
+            "ON CONFLICT (household_id) DO UPDATE SET item = excluded.item",
+            (household["household_id"], _dump(household)),
+        )
+
+    def get_household(self, household_id: str) -> Optional[dict]:
+        households = self._fetch(
+            "SELECT item FROM households WHERE household_id = ? AND item IS NOT NULL",
+            (household_id,),
+        )
+        return households[0] if households else None
+
+    def iter_household_ids(self) -> Iterator[str]:
+        rows = self._connection().execute(
+            "SELECT household_id FROM households WHERE item IS NOT NULL ORDER BY household_id"
+        )
+        return (row[0] for row in rows.fetchall())
+
+    # --- Auth Sessions ---
+    def create_auth_session(self, user: dict, session_id: str, token_hash: str) -> dict:
+        session = auth_session_item(user, session_id, token_hash)
+        with self._transaction() as conn:
+            # Nothing like DynamoDB's TTL here; sign-ins sweep expired sessions
+            conn.execute("DELETE FROM auth_sessions WHERE expires_at <= ?", (int(time.time()),))
+            self._put_session(conn, session)
+        return session
+
+    def get_auth_session(self, session_id: str) -> Optional[dict]:
+        sessions = self._fetch(
+            "SELECT item FROM auth_sessions WHERE session_id = ?", (session_id,)
+        )
+        return sessions[0] if sessions else None
+
+    def rotate_refresh_token(
+        self, session_id: str, old_hash: str, new_hash: str
+    ) -> Optional[dict]:
+        with self._transaction() as conn:
+            sessions = self._fetch(
+                "SELECT item FROM auth_sessions "
+                "WHERE session_id = ? AND token_hash = ? AND expires_at > ?",
+                (session_id, old_hash, int(time.time())),
+                conn,
+            )
+            if not sessions:
+                return None
+            session = {
+                **sessions[0], "token_hash": new_hash, "expires_at": refresh_token_expiry()
+            }
+            self._put_session(conn, session)
+        return session
+
+    def revoke_auth_session(self, session_id: str) -> None:
+        """End a session and put it on the revocation list, dropping expired entries"""
+        revoked = revoked_session_item(session_id)
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM auth_sessions WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "DELETE FROM revoked_sessions WHERE expires_at <= ?", (int(time.time()),)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO revoked_sessions (session_id, expires_at) VALUES (?, ?)",
+                (session_id, revoked["expires_at"]),
+            )
+
+    def get_revoked_session_ids(self) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT session_id FROM revoked_sessions WHERE expires_at > ?", (int(time.time()),)
+        )
+        return [row[0] for row in rows.fetchall()]
+
+    def _put_session(self, conn: sqlite3.Connection, session: dict) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO auth_sessions (session_id, token_hash, expires_at, item) "
+            "VALUES (?, ?, ?, ?)",
+            (session["session_id"], session["token_hash"], session["expires_at"], _dump(session)),
+        )
+
+    # --- Login Throttling ---
+    def count_login_attempt(self, key: str, window_start: int, expires_at: int) -> int:
+        """Count an attempt in the window, dropping the key's earlier windows"""
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM login_attempts WHERE key = ? AND window_start < ?",
+                (key, window_start),
+            )
+            conn.execute(
+                "INSERT INTO login_attempts (key, window_start, attempts, expires_at) "
+                "VALUES (?, ?, 1, ?) ON CONFLICT (key, window_start) "
+                "DO UPDATE SET attempts = attempts + 1, expires_at = excluded.expires_at",
+                (key, window_start, expires_at),
+            )
+            row = conn.execute(
+                "SELECT attempts FROM login_attempts WHERE key = ? AND window_start = ?",
+                (key, window_start),
+            ).fetchone()
+        return row[0]
+
+    def get_data_version(self, household_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT data_version FROM households WHERE household_id = ?", (household_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    # --- Tag Operations ---
+    def iter_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]:
+        return iter(self._list(household_id, "TAG", fields))
+
+    def get_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        return self._list(household_id, "TAG", fields)
+
+    def get_tags_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._page(household_id, "TAG", limit, cursor, fields=fields)
+
+    def get_tag(self, household_id: str, tag_id: str) -> Optional[dict]:
+        return self._get(household_id, "TAG", tag_id)
+
+    def _reserve_tag_name(
+        self, conn: sqlite3.Connection, household_id: str, tag_id: str, name: str
+    ) -> None:
+        try:
+            conn.execute(
+                "INSERT INTO tag_names (household_id, name_lower, tag_id) VALUES (?, ?, ?)",
+                (household_id, name.lower(), tag_id),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Tag '{name}' already exists")
+
+    def create_tag(self, household_id: str, name: str, tag_type: str) -> dict:
+        tag = tag_item(household_id, name, tag_type)
+        with self._transaction() as conn:
+            self._reserve_tag_name(conn, household_id, tag["tag_id"], name)
+            self._put(conn, tag)
+            self._bump_version(conn, household_id)
+        return tag
+
+    def update_tag(
+        self, household_id: str, tag_id: str, updates: dict
+    ) -> Optional[dict]:
+        updates = {key: value for key, value in updates.items() if value is not None}
+        with self._transaction() as conn:
+            tag = self._get(household_id, "TAG", tag_id, conn)
+            if not tag or not updates:
+                return tag
+
+            old_name_lower = tag["name_lower"]
+            tag.update(updates)
+            tag["name_lower"] = tag["name"].lower()
+            tag["updated_at"] = datetime.utcnow().isoformat()
+            if tag["name_lower"] != old_name_lower:
+                conn.execute(
+                    "DELETE FROM tag_names WHERE household_id = ? AND name_lower = ? AND tag_id = ?",
+                    (household_id, old_name_lower, tag_id),
+                )
+                self._reserve_tag_name(conn, household_id, tag_id, tag["name"])
+            self._put(conn, tag)
+            self._bump_version(conn, household_id)
+        return tag
+
+    def delete_tag(self, household_id: str, tag_id: str) -> dict:
+        with self._transaction() as conn:
+            old = self._delete(conn, household_id, "TAG", tag_id)
+            if old:
+                self._put_tombstone(conn, old)
+            conn.execute(
+                "DELETE FROM tag_names WHERE household_id = ? AND tag_id = ?",
+                (household_id, tag_id),
+            )
+            (recipes_total,) = conn.execute(
+                "SELECT COUNT(*) FROM recipe_tags WHERE household_id = ? AND tag_id = ?",
+                (household_id, tag_id),
+            ).fetchone()
+            job = tag_deletion_job_item(household_id, tag_id, recipes_total)
+            self._put(conn, job)
+            self._bump_version(conn, household_id)
+        return job
+
+    def run_tag_deletion(self, household_id: str, job_id: str) -> Optional[dict]:
+        """Clean up after a tag deletion in a single transaction"""
+        with self._transaction() as conn:
+            job = self._get(household_id, "JOB", job_id, conn)
+            if job is None or job["status"] == "DONE":
+                return job
+            tag_id = job["tag_id"]
+            now = datetime.utcnow().isoformat()
+
+            recipe_ids = [
+                row[0] for row in conn.execute(
+                    "SELECT recipe_id FROM recipe_tags WHERE household_id = ? AND tag_id = ?",
+                    (household_id, tag_id),
+                )
+            ]
+            for recipe_id in recipe_ids:
+                recipe = self._get(household_id, "RECIPE", recipe_id, conn)
+                if recipe is None:
+                    conn.execute(
+                        "DELETE FROM recipe_tags "
+                        "WHERE household_id = ? AND tag_id = ? AND recipe_id = ?",
+                        (household_id, tag_id, recipe_id),
+                    )
+                else:
+                    old_tag_ids = recipe.get("tag_ids", [])
+                    recipe["tag_ids"] = [t for t in old_tag_ids if t != tag_id]
+                    recipe["updated_at"] = now
+                    recipe["version"] = _current_version(recipe) + 1
+                    self._put_recipe(conn, household_id, recipe, old_tag_ids)
+                job["recipes_updated"] += 1
+
+            for rule in self._list(household_id, "RULE", conn=conn):
+                action = dependent_rule_action(rule, tag_id)
+                if action == "delete":
+                    self._delete(conn, household_id, "RULE", rule["rule_id"])
+                    self._put_tombstone(conn, rule)
+                    job["rules_deleted"] += 1
+                elif action == "disable":
+                    rule.update(
+                        enabled=False, updated_at=now, version=_current_version(rule) + 1
+                    )
+                    self._put(conn, rule)
+                    job["rules_disabled"] += 1
+
+            job.update(status="DONE", updated_at=now)
+            self._put(conn, job)
+            self._bump_version(conn, household_id)
+        return job
+
+    def backfill_tag_name_guards(self, household_id: str) -> int:
+        created = 0
+        with self._transaction() as conn:
+            for tag in self._list(household_id, "TAG", conn=conn):
+                created += conn.execute(
+                    "INSERT OR IGNORE INTO tag_names (household_id, name_lower, tag_id) "
+                    "VALUES (?, ?, ?)",
+                    (household_id, tag["name_lower"], tag["tag_id"]),
+                ).rowcount
+        return created
+
+    # --- Recipe Operations ---
+    def iter_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[dict]:
+        return iter(self.get_recipes(household_id, tag_id, fields))
+
+    def get_recipes_by_id(
+        self,
+        household_id: str,
+        recipe_ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        recipes: List[dict] = []
+        for start in range(0, len(recipe_ids), SQLITE_MAX_PARAMS):
+            chunk = recipe_ids[start:start + SQLITE_MAX_PARAMS]
+            recipes += self._fetch(
+                "SELECT item FROM items WHERE household_id = ? AND kind = 'RECIPE' "
+                f"AND item_id IN ({', '.join('?' * len(chunk))})",
+                (household_id, *chunk),
+            )
+        return project_items(sorted(recipes, key=lambda r: r["sk"]), fields)
+
+    def get_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        if not tag_id:
+            return self._list(household_id, "RECIPE", fields)
+        recipes = self._fetch(
+            "SELECT i.item FROM recipe_tags t JOIN items i "
+            "ON i.household_id = t.household_id AND i.kind = 'RECIPE' AND i.item_id = t.recipe_id "
+            "WHERE t.household_id = ? AND t.tag_id = ? ORDER BY t.recipe_id",
+            (household_id, tag_id),
+        )
+        return project_items(recipes, fields)
+
+    def get_recipes_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        if not tag_id:
+            return self._page(household_id, "RECIPE", limit, cursor, fields=fields)
+
+        # Cursors point into the tag's index, as they do on DynamoDB
+        sk_prefix = f"TAGIDX#{tag_id}#"
+        after = decode_cursor(cursor, household_id, sk_prefix)["sk"][len(sk_prefix):] if cursor else ""
+        recipes = self._fetch(
+            "SELECT i.item FROM recipe_tags t JOIN items i "
+            "ON i.household_id = t.household_id AND i.kind = 'RECIPE' AND i.item_id = t.recipe_id "
+            "WHERE t.household_id = ? AND t.tag_id = ? AND t.recipe_id > ? "
+            "ORDER BY t.recipe_id LIMIT ?",
+            (household_id, tag_id, after, limit + 1),
+        )
+        next_cursor = None
+        if len(recipes) > limit:
+            recipes = recipes[:limit]
+            next_cursor = encode_cursor({
+                "pk": f"HOUSE#{household_id}",
+                "sk": sk_prefix + recipes[-1]["recipe_id"],
+            })
+        return project_items(recipes, fields), next_cursor
+
+    def get_recipe(self, household_id: str, recipe_id: str) -> Optional[dict]:
+        return self._get(household_id, "RECIPE", recipe_id)
+
+    def _put_recipe(
+        self, conn: sqlite3.Connection, household_id: str, recipe: dict, old_tag_ids: List[str]
+    ) -> None:
+        """Write a recipe and bring its tag membership rows in step"""
+        old, new = set(old_tag_ids), set(recipe.get("tag_ids", []))
+        conn.executemany(
+            "DELETE FROM recipe_tags WHERE household_id = ? AND tag_id = ? AND recipe_id = ?",
+            [(household_id, tag_id, recipe["recipe_id"]) for tag_id in old - new],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO recipe_tags (household_id, tag_id, recipe_id) VALUES (?, ?, ?)",
+            [(household_id, tag_id, recipe["recipe_id"]) for tag_id in new - old],
+        )
+        self._put(conn, recipe)
+
+    def create_recipe(
+        self,
+        household_id: str,
+        title: str,
+        tag_ids: List[str],
+        default_servings: int,
+        notes: Optional[str],
+    ) -> dict:
+        recipe = recipe_item(household_id, title, tag_ids, default_servings, notes)
+        with self._transaction() as conn:
+            self._put_recipe(conn, household_id, recipe, [])
+            self._bump_version(conn, household_id)
+        return recipe
+
+    def create_recipes_batch(
+        self, household_id: str, records: List[dict]
+    ) -> Tuple[List[dict], List[int]]:
+        recipes = [
+            recipe_item(
+                household_id,
+                r["title"],
+                r["tag_ids"],
+                r["default_servings"],
+                r.get("notes"),
+            )
+            for r in records
+        ]
+        with self._transaction() as conn:
+            for recipe in recipes:
+                self._put_recipe(conn, household_id, recipe, [])
+            if recipes:
+                self._bump_version(conn, household_id)
+        return recipes, []
+
+    def update_recipe(
+        self,
+        household_id: str,
+        recipe_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        with self._transaction() as conn:
+            recipe = self._get(household_id, "RECIPE", recipe_id, conn)
+            if recipe is None:
+                return None
+            _check_version(recipe, expected_version)
+
+            old_tag_ids = recipe.get("tag_ids", [])
+            recipe.update({key: value for key, value in updates.items() if value is not None})
+            recipe["title_lower"] = recipe["title"].lower()
+            recipe["updated_at"] = datetime.utcnow().isoformat()
+            recipe["version"] = _current_version(recipe) + 1
+            self._put_recipe(conn, household_id, recipe, old_tag_ids)
+            self._bump_version(conn, household_id)
+        return recipe
+
+    def delete_recipe(self, household_id: str, recipe_id: str) -> bool:
+        with self._transaction() as conn:
+            old = self._delete(conn, household_id, "RECIPE", recipe_id)
+            if old:
+                self._put_tombstone(conn, old)
+            conn.execute(
+                "DELETE FROM recipe_tags WHERE household_id = ? AND recipe_id = ?",
+                (household_id, recipe_id),
+            )
+            self._bump_version(conn, household_id)
+        return True
+
+    def backfill_tag_index(self, household_id: str) -> int:
+        written = 0
+        with self._transaction() as conn:
+            for recipe in self._list(household_id, "RECIPE", conn=conn):
+                for tag_id in set(recipe.get("tag_ids", [])):
+                    written += conn.execute(
+                        "INSERT OR IGNORE INTO recipe_tags (household_id, tag_id, recipe_id) "
+                        "VALUES (?, ?, ?)",
+                        (household_id, tag_id, recipe["recipe_id"]),
+                    ).rowcount
+            if written:
+                self._bump_version(conn, household_id)
+        return written
+
+    # --- Rule Operations ---
+    def iter_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]:
+        return iter(self._list(household_id, "RULE", fields))
+
+    def get_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]:
+        return self._list(household_id, "RULE", fields)
+
+    def get_rules_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._page(household_id, "RULE", limit, cursor, fields=fields)
+
+    def get_rule(self, household_id: str, rule_id: str) -> Optional[dict]:
+        return self._get(household_id, "RULE", rule_id)
+
+    def _create_rule(self, household_id: str, rule: dict) -> dict:
+        with self._transaction() as conn:
+            self._put(conn, rule)
+            self._bump_version(conn, household_id)
+        return rule
+
+    def create_constraint_rule(
+        self,
+        household_id: str,
+        constraint_type: str,
+        tag_id: str,
+        max_count: int,
+        enabled: bool,
+    ) -> dict:
+        return self._create_rule(
+            household_id,
+            constraint_rule_item(household_id, constraint_type, tag_id, max_count, enabled),
+        )
+
+    def create_action_rule(
+        self,
+        household_id: str,
+        action_type: str,
+        target_type: str,
+        tag_id: Optional[str],
+        recipe_id: Optional[str],
+        offset_days: int,
+        time_local: str,
+        message_template: str,
+        enabled: bool,
+    ) -> dict:
+        return self._create_rule(
+            household_id,
+            action_rule_item(
+                household_id,
+                action_type,
+                target_type,
+                tag_id,
+                recipe_id,
+                offset_days,
+                time_local,
+                message_template,
+                enabled,
+            ),
+        )
+
+    def update_rule(
+        self,
+        household_id: str,
+        rule_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        with self._transaction() as conn:
+            rule = self._get(household_id, "RULE", rule_id, conn)
+            if rule is None:
+                return None
+            _check_version(rule, expected_version)
+
+            rule.update({key: value for key, value in updates.items() if value is not None})
+            rule["updated_at"] = datetime.utcnow().isoformat()
+            rule["version"] = _current_version(rule) + 1
+            self._put(conn, rule)
+            self._bump_version(conn, household_id)
+        return rule
+
+    def delete_rule(self, household_id: str, rule_id: str) -> bool:
+        with self._transaction() as conn:
+            old = self._delete(conn, household_id, "RULE", rule_id)
+            if old:
+                self._put_tombstone(conn, old)
+            self._bump_version(conn, household_id)
+        return True
+
+    # --- Snapshot Operations ---
+    def get_household_snapshot(
+        self, household_id: str, week_start_date: str
+    ) -> HouseholdSnapshot:
+        # One read transaction, so all parts come from the same database state
+        with self._transaction(write=False) as conn:
+            households = self._fetch(
+                "SELECT item FROM households WHERE household_id = ? AND item IS NOT NULL",
+                (household_id,),
+                conn,
+            )
+            return HouseholdSnapshot(
+                household=households[0] if households else None,
+                plan=self._get(household_id, "WEEK", week_start_date, conn),
+                tags=self._list(household_id, "TAG", conn=conn),
+                recipes=self._list(household_id, "RECIPE", conn=conn),
+                rules=self._list(household_id, "RULE", conn=conn),
+            )
+
+    # --- Weekly Plan Operations ---
+    def get_weekly_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        fields: Optional[List[str]] = None,
+    ) -> Optional[dict]:
+        plan = self._get(household_id, "WEEK", week_start_date)
+        return project_items([plan], fields)[0] if plan else None
+
+    def get_weekly_plans_page(
+        self,
+        household_id: str,
+        from_week: str,
+        to_week: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._page(household_id, "WEEK", limit, cursor, id_range=(from_week, to_week))
+
+    def _write_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        expected_version: Optional[int],
+        change,
+        create: bool = True,
+    ) -> dict:
+        """Apply `change` to the week's entries and bump its version.
+
+        A missing week is created, unless `create` is false, in which case
+        nothing is written and {} is returned.
+        """
+        with self._transaction() as conn:
+            plan = self._get(household_id, "WEEK", week_start_date, conn)
+            _check_version(plan, expected_version)
+            if plan is None and not create:
+                return {}
+            plan = plan or {
+                "pk": f"HOUSE#{household_id}",
+                "sk": f"WEEK#{week_start_date}",
+                "week_start_date": week_start_date,
+                "household_id": household_id,
+            }
+            plan["entries"] = change(plan.get("entries", {}))
+            plan["updated_at"] = datetime.utcnow().isoformat()
+            plan["version"] = _current_version(plan) + 1
+            self._put(conn, plan)
+        return plan
+
+    def save_weekly_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        entries: dict,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        return self._write_plan(
+            household_id, week_start_date, expected_version, lambda _: entries
+        )
+
+    def update_plan_entry(
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        recipe_id: str,
+        servings: int,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        entry = {"recipe_id": recipe_id, "servings": servings}
+        return self.patch_plan_entries(
+            household_id, week_start_date, {date: entry}, [], expected_version
+        )
+
+    def patch_plan_entries(
+        self,
+        household_id: str,
+        week_start_date: str,
+        upserts: Dict[str, dict],
+        deletes: List[str],
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        if set(upserts) & set(deletes):
+            raise ValueError("A date cannot be both set and deleted")
+
+        def change(entries: dict) -> dict:
+            entries = {d: e for d, e in entries.items() if d not in deletes}
+            entries.update(upserts)
+            return entries
+
+        return self._write_plan(
+            household_id, week_start_date, expected_version, change, create=bool(upserts)
+        )
+
+    def delete_plan_entry(
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        return self.patch_plan_entries(
+            household_id, week_start_date, {}, [date], expected_version
+        )
+
+    def compact_weekly_plans(self, household_id: str, before_week: str) -> int:
+        """Weeks stay rows of their own in SQLite, so there is nothing to compact"""
+        return 0
+
+    # --- Sync Operations ---
+    def get_changes(
+        self,
+        household_id: str,
+        since: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Changed items in (updated_at, sk) order, the order of the gsi2 index"""
+        after = (since, "\uffff")
+        if cursor:
+            key = decode_cursor(cursor, household_id, "", index_keys=("gsi2pk", "updated_at"))
+            after = max(after, (key["updated_at"], key["sk"]))
+        items = self._fetch(
+            "SELECT item FROM items "
+            "WHERE household_id = ? AND kind IN ('TAG', 'RECIPE', 'RULE', 'TOMBSTONE') "
+            "AND (json_extract(item, '$.updated_at'), kind || '#' || item_id) > (?, ?) "
+            "AND coalesce(json_extract(item, '$.expires_at') > ?, 1) "
+            "ORDER BY json_extract(item, '$.updated_at'), kind, item_id LIMIT ?",
+            (household_id, *after, int(time.time()), limit + 1),
+        )
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor({
+                "pk": last["pk"],
+                "sk": last["sk"],
+                "gsi2pk": last["pk"],
+                "updated_at": last["updated_at"],
+            })
+        return items, next_cursor
+
+    def backfill_sync_index(self, household_id: str) -> int:
+        """The items_by_update index covers every row already"""
+        return 0
+
+    # --- Job Operations ---
+    def get_job(self, household_id: str, job_id: str) -> Optional[dict]:
+        return self._get(household_id, "JOB", job_id)
+
+    def iter_jobs(self, household_id: str) -> Iterator[dict]:
+        return iter(self._list(household_id, "JOB"))
+
+    # --- Stats Operations ---
+    def get_household_stats(self, household_id: str) -> dict:
+        """Aggregates computed from the stored recipes and weeks on each call,
+        which is cheap on a local database"""
+        with self._transaction(write=False) as conn:
+            return build_stats(
+                household_id,
+                self._list(household_id, "RECIPE", conn=conn),
+                self._list(household_id, "WEEK", conn=conn),
+            )
+
+    def rebuild_household_stats(self, household_id: str) -> dict:
+        return self.get_household_stats(household_id)
+
+    # --- Migration ---
+    def import_items(self, items: Iterable[dict]) -> Tuple[int, int]:
+        """Load single-table items (e.g. a DynamoDB export) into the database.
+
+        Tag name guards and tag index items are rebuilt from the tags and
+        recipes, so those items are skipped; archives are unpacked into their
+        weeks. Existing rows with the same key are replaced. Returns
+        (imported, skipped).
+        """
+        imported = skipped = 0
+        with self._transaction() as conn:
+            for item in items:
+                pk, sk = item.get("pk", ""), item.get("sk", "")
+                household_id = pk[len("HOUSE#"):]
+                kind = sk.split("#", 1)[0]
+                if pk.startswith("USER#"):
+                    self._put_user(conn, item)
+                elif pk.startswith("HOUSE#") and sk == pk:
+                    self._put_household(conn, item)
+                elif pk.startswith("HOUSE#") and sk == "VERSION":
+                    conn.execute(
+                        "INSERT INTO households (household_id, data_version) VALUES (?, ?) "
+                        "ON CONFLICT (household_id) DO UPDATE SET data_version = excluded.data_version",
+                        (household_id, int(item.get("data_version", 0))),
+                    )
+                elif pk.startswith("HOUSE#") and kind == "TAG":
+                    conn.execute(
+                        "INSERT OR REPLACE INTO tag_names (household_id, name_lower, tag_id) "
+                        "VALUES (?, ?, ?)",
+                        (household_id, item["name_lower"], item["tag_id"]),
+                    )
+                    self._put(conn, item)
+                elif pk.startswith("HOUSE#") and kind == "RECIPE":
+                    old = self._get(household_id, "RECIPE", item["recipe_id"], conn)
+                    self._put_recipe(conn, household_id, item, (old or {}).get("tag_ids", []))
+                elif pk.startswith("HOUSE#") and kind in ("RULE", "WEEK", "TOMBSTONE"):
+                    self._put(conn, item)
+                elif pk.startswith("HOUSE#") and kind == "ARCHIVE":
+                    # Archived weeks become ordinary weeks again
+                    for week in unpack_weeks(item).values():
+                        self._put(conn, week)
+                else:
+                    skipped += 1
+                    continue
+                imported += 1
+        return imported, skipped
@@ -0,0 +1,205 @@
+"""
+Per-household aggregates maintained from item change events.
+
+One STATS item per household holds counts that would otherwise need every
+WEEK# and RECIPE# item: how often each recipe is planned and when it was
+last planned, how many recipes carry each tag and when the tag was last
+planned. Changes are folded in one at a time by apply_change; build_stats
+produces the same item from scratch. Deleted recipes and tags are dropped,
+and drop_old_weeks forgets the weeks behind the archive horizon, so the
+item grows with the household's recipes and recent weeks, not its history.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+STATS_SK = "STATS"
+
+# Item kinds whose changes feed the aggregates; of tags, only deletes count
+TRACKED_PREFIXES = ("WEEK#", "RECIPE#", "TAG#")
+
+
+@dataclass
+class ChangeEvent:
+    """One item write, shaped like a DynamoDB Streams record with
+    NEW_AND_OLD_IMAGES: `old` is None for a create, `new` for a delete"""
+
+    household_id: str
+    sk: str
+    old: Optional[dict]
+    new: Optional[dict]
+
+    @property
+    def version(self) -> int:
+        """Version the item is at after this change; deletes count one past the last write"""
+        if self.new is not None:
+            return int(self.new.get("version", 0))
+        return int((self.old or {}).get("version", 0)) + 1
+
+
+def item_change(old: Optional[dict], new: Optional[dict]) -> ChangeEvent:
+    item = new if new is not None else old
+    return ChangeEvent(item["pk"][len("HOUSE#"):], item["sk"], old, new)
+
+
+def empty_stats(household_id: str) -> dict:
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": STATS_SK,
+        "household_id": household_id,
+        # recipe_id -> plan entries using it
+        "recipe_plan_counts": {},
+        # recipe_id -> latest date it has been planned for
+        "recipe_last_planned": {},
+        # tag_id -> recipes carrying it
+        "tag_recipe_counts": {},
+        # tag_id -> latest date a recipe with the tag has been planned for
+        "tag_last_planned": {},
+        # sk -> item version already folded in, so redelivered events are skipped;
+        # a deleted recipe's entry goes with it, old weeks' go in drop_old_weeks
+        "applied": {},
+        "version": 0,
+        "updated_at": None,
+    }
+
+
+def _entries(item: Optional[dict]) -> dict:
+    return (item or {}).get("entries") or {}
+
+
+def _add(counts: dict, key: str, delta: int) -> None:
+    count = int(counts.get(key, 0)) + delta
+    if count > 0:
+        counts[key] = count
+    else:
+        counts.pop(key, None)
+
+
+def _latest(dates: dict, key: str, date: Optional[str]) -> None:
+    if date and date > dates.get(key, ""):
+        dates[key] = date
+
+
+def planned_recipe_ids(event: ChangeEvent) -> Set[str]:
+    """Recipes a week change newly plans; apply_change needs their tag_ids"""
+    if not event.sk.startswith("WEEK#"):
+        return set()
+    old = _entries(event.old)
+    recipe_ids = set()
+    for date, entry in _entries(event.new).items():
+        before = old.get(date)
+        if entry and (not before or before["recipe_id"] != entry["recipe_id"]):
+            recipe_ids.add(entry["recipe_id"])
+    return recipe_ids
+
+
+def missed_changes(stats: dict, event: ChangeEvent) -> bool:
+    """Whether changes to the event's item before this one were never folded in.
+
+    Concurrent writes can publish out of order, and a later version's delta
+    applied after a skipped one would leave the counts wrong for good; the
+    caller rebuilds the stats instead. An item missing from `applied` is
+    only fine if the event creates it; a week dropped by drop_old_weeks
+    is missing too, so writes to it also rebuild.
+    """
+    if event.new is None or event.sk.startswith("TAG#"):
+        return False
+    applied = stats["applied"].get(event.sk)
+    if applied is None:
+        return bool(event.old)
+    return event.version > int(applied) + 1
+
+
+def apply_change(
+    stats: dict, event: ChangeEvent, recipe_tags: Dict[str, List[str]]
+) -> bool:
+    """Fold one change into `stats` in place.
+
+    `recipe_tags` maps the recipes from planned_recipe_ids to their tag_ids;
+    recipes missing from it no longer exist and are not counted. Returns
+    False, changing nothing, for a change that was already applied; check
+    missed_changes first. Last-planned dates only move forward: clearing an
+    entry does not bring them back. Removed weeks are ignored, as they still
+    count once archived. A deleted tag's figures are dropped.
+    """
+    if event.sk.startswith("TAG#"):
+        if event.new is not None:
+            return False
+        tag_id = event.sk[len("TAG#"):]
+        dropped = [
+            stats[key].pop(tag_id, None) for key in ("tag_recipe_counts", "tag_last_planned")
+        ]
+        if dropped == [None, None]:
+            return False
+        stats["updated_at"] = datetime.utcnow().isoformat()
+        return True
+    if event.sk.startswith("WEEK#") and event.new is None:
+        # Weeks are only removed by compaction, which moves them to an archive
+        return False
+    applied = stats["applied"]
+    if event.new is None and event.sk not in applied:
+        # Never counted, or deleted and dropped already
+        return False
+    if event.sk in applied and event.version <= int(applied[event.sk]):
+        return False
+    applied[event.sk] = event.version
+
+    if event.sk.startswith("WEEK#"):
+        old, new = _entries(event.old), _entries(event.new)
+        for date in set(old) | set(new):
+            before, after = old.get(date), new.get(date)
+            if before and after and before["recipe_id"] == after["recipe_id"]:
+                continue
+            if before:
+                _add(stats["recipe_plan_counts"], before["recipe_id"], -1)
+            if after and after["recipe_id"] in recipe_tags:
+                recipe_id = after["recipe_id"]
+                _add(stats["recipe_plan_counts"], recipe_id, 1)
+                _latest(stats["recipe_last_planned"], recipe_id, date)
+                for tag_id in recipe_tags.get(recipe_id, []):
+                    _latest(stats["tag_last_planned"], tag_id, date)
+
+    elif event.sk.startswith("RECIPE#"):
+        recipe_id = event.sk[len("RECIPE#"):]
+        old_tags = set((event.old or {}).get("tag_ids") or [])
+        new_tags = set((event.new or {}).get("tag_ids") or [])
+        for tag_id in new_tags - old_tags:
+            _add(stats["tag_recipe_counts"], tag_id, 1)
+            _latest(
+                stats["tag_last_planned"],
+                tag_id,
+                stats["recipe_last_planned"].get(recipe_id),
+            )
+        for tag_id in old_tags - new_tags:
+            _add(stats["tag_recipe_counts"], tag_id, -1)
+        if event.new is None:
+            del applied[event.sk]
+            stats["recipe_plan_counts"].pop(recipe_id, None)
+            stats["recipe_last_planned"].pop(recipe_id, None)
+
+    stats["updated_at"] = datetime.utcnow().isoformat()
+    return True
+
+
+def drop_old_weeks(stats: dict, before_week: str) -> None:
+    """Forget the applied versions of weeks starting before `before_week`.
+
+    Their plan entries stay counted. Old weeks are rarely written again,
+    and a write to one is then a missed change, which rebuilds the stats.
+    """
+    applied = stats["applied"]
+    for sk in [sk for sk in applied if sk.startswith("WEEK#") and sk < f"WEEK#{before_week}"]:
+        del applied[sk]
+
+
+def build_stats(household_id: str, recipes: Iterable[dict], plans: Iterable[dict]) -> dict:
+    """The STATS item for the given recipes and weeks, computed from scratch"""
+    stats = empty_stats(household_id)
+    recipes = list(recipes)
+    recipe_tags = {r["recipe_id"]: r.get("tag_ids") or [] for r in recipes}
+    for plan in plans:
+        apply_change(stats, item_change(None, plan), recipe_tags)
+    for recipe in recipes:
+        apply_change(stats, item_change(None, recipe), recipe_tags)
+    stats["updated_at"] = datetime.utcnow().isoformat()
+    return stats
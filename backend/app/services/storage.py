@@ -0,0 +1,656 @@
+"""
+Storage interface shared by every backend.
+
+The item layout (pk/sk strings, attribute names) is the DynamoDB single-table
+design; other backends keep the same layout so items, cursors and exports are
+interchangeable between them.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple
+import base64
+import json
+import time
+import uuid
+import zlib
+
+from ..config import get_settings
+
+
+class VersionConflictError(Exception):
+    """A conditional write found the item at a different version than expected"""
+
+    def __init__(self, current_version: Optional[int] = None):
+        super().__init__("Item was modified by another request")
+        self.current_version = current_version
+
+
+@dataclass
+class HouseholdSnapshot:
+    """Everything validation and export need for one week of one household"""
+
+    household: Optional[dict]
+    plan: Optional[dict]
+    tags: List[dict] = field(default_factory=list)
+    recipes: List[dict] = field(default_factory=list)
+    rules: List[dict] = field(default_factory=list)
+
+    @property
+    def plan_entries(self) -> dict:
+        return self.plan.get("entries", {}) if self.plan else {}
+
+
+def current_week_start() -> str:
+    """Monday of the current UTC week (YYYY-MM-DD); weeks before it are past"""
+    today = datetime.utcnow().date()
+    return (today - timedelta(days=today.weekday())).isoformat()
+
+
+def archive_horizon_start() -> str:
+    """First week kept out of the per-year archives (PLAN_ARCHIVE_HORIZON_WEEKS
+    before the current one); weeks from it on never need an archive read"""
+    horizon = timedelta(weeks=get_settings().plan_archive_horizon_weeks)
+    return (datetime.fromisoformat(current_week_start()) - horizon).date().isoformat()
+
+
+# --- Cursors ---
+def encode_cursor(last_evaluated_key: dict) -> str:
+    """Encode a DynamoDB LastEvaluatedKey as an opaque, URL-safe cursor"""
+    raw = json.dumps(last_evaluated_key, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str,
+    household_id: str,
+    sk_prefix: str,
+    sk_range: Optional[Tuple[str, str]] = None,
+    index_keys: Tuple[str, ...] = (),
+) -> dict:
+    """Decode a cursor, rejecting anything outside the household's item range.
+
+    `index_keys` are the extra key attributes of a cursor from an index
+    query; they must be strings, and the index partition the household's.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if (
+        not isinstance(key, dict)
+        or key.get("pk") != f"HOUSE#{household_id}"
+        or not str(key.get("sk", "")).startswith(sk_prefix)
+    ):
+        raise ValueError("Invalid cursor")
+    if sk_range and not sk_range[0] <= key["sk"] <= sk_range[1]:
+        raise ValueError("Invalid cursor")
+    if any(not isinstance(key.get(name), str) for name in index_keys):
+        raise ValueError("Invalid cursor")
+    if index_keys and key[index_keys[0]] != key["pk"]:
+        raise ValueError("Invalid cursor")
+    return {name: key[name] for name in ("pk", "sk", *index_keys)}
+
+
+def project_items(items: List[dict], fields: Optional[List[str]]) -> List[dict]:
+    """Trim already-loaded items to `fields` (plus the item keys)"""
+    if not fields:
+        return items
+    keep = {"pk", "sk", *fields}
+    return [{k: v for k, v in item.items() if k in keep} for item in items]
+
+
+# --- Item Builders ---
+def user_item(email: str, password_hash: str, household_id: str) -> dict:
+    user_id = str(uuid.uuid4())
+    return {
+        "pk": f"USER#{user_id}",
+        "sk": f"USER#{user_id}",
+        "gsi1pk": f"EMAIL#{email.lower()}",
+        "gsi1sk": f"USER#{user_id}",
+        "user_id": user_id,
+        "email": email,
+        "email_lower": email.lower(),
+        "password_hash": password_hash,
+        "household_id": household_id,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
+# Revocation list entries outlive the access tokens they revoke by this
+# much, to cover clock skew between the API processes
+REVOCATION_LEEWAY_SECONDS = 60
+REVOKED_PK = "REVOKED"
+
+
+def refresh_token_expiry() -> int:
+    """TTL timestamp of a session whose refresh token was issued now"""
+    return int(time.time()) + get_settings().refresh_token_days * 86400
+
+
+def auth_session_item(user: dict, session_id: str, token_hash: str) -> dict:
+    """Sign-in session holding the SHA-256 of its current refresh token (the id is the caller's)"""
+    return {
+        "pk": f"SESSION#{session_id}",
+        "sk": f"SESSION#{session_id}",
+        "session_id": session_id,
+        "user_id": user["user_id"],
+        "household_id": user["household_id"],
+        "token_hash": token_hash,
+        "created_at": datetime.utcnow().isoformat(),
+        "expires_at": refresh_token_expiry(),
+    }
+
+
+def revoked_session_item(session_id: str) -> dict:
+    """Revocation list entry of a session.
+
+    All revocations share one partition and stay only until every access
+    token issued to the session has expired, so the list stays small enough
+    for each process to reload it whole.
+    """
+    settings = get_settings()
+    return {
+        "pk": REVOKED_PK,
+        "sk": f"SESSION#{session_id}",
+        "session_id": session_id,
+        "revoked_at": datetime.utcnow().isoformat(),
+        "expires_at": int(time.time())
+        + settings.access_token_minutes * 60
+        + REVOCATION_LEEWAY_SECONDS,
+    }
+
+
+def throttle_counter_key(key: str, window_start: int) -> dict:
+    """Key of the login attempt counter of `key` (an IP or email digest) in one window"""
+    return {"pk": f"THROTTLE#{key}", "sk": f"WINDOW#{window_start}"}
+
+
+def household_item(household_id: str, name: str) -> dict:
+    settings = get_settings()
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"HOUSE#{household_id}",
+        "household_id": household_id,
+        "name": name,
+        "timezone": settings.default_timezone,
+        "dinner_time_local": settings.default_dinner_time,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
+def tag_item(household_id: str, name: str, tag_type: str) -> dict:
+    tag_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"TAG#{tag_id}",
+        "gsi2pk": f"HOUSE#{household_id}",
+        "tag_id": tag_id,
+        "name": name,
+        "name_lower": name.lower(),
+        "type": tag_type,
+        "household_id": household_id,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def tag_name_guard(household_id: str, tag_id: str, name_lower: str) -> dict:
+    """Item that reserves a lower-cased tag name within a household"""
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"TAGNAME#{name_lower}",
+        "tag_id": tag_id,
+        "household_id": household_id,
+    }
+
+
+def tag_index_item(household_id: str, tag_id: str, recipe_id: str) -> dict:
+    """Item listing a recipe under one of its tags"""
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"TAGIDX#{tag_id}#{recipe_id}",
+        "tag_id": tag_id,
+        "recipe_id": recipe_id,
+        "household_id": household_id,
+    }
+
+
+def recipe_item(
+    household_id: str,
+    title: str,
+    tag_ids: List[str],
+    default_servings: int,
+    notes: Optional[str],
+) -> dict:
+    recipe_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"RECIPE#{recipe_id}",
+        "gsi2pk": f"HOUSE#{household_id}",
+        "recipe_id": recipe_id,
+        "title": title,
+        "title_lower": title.lower(),
+        "tag_ids": tag_ids,
+        "default_servings": default_servings,
+        "notes": notes or "",
+        "household_id": household_id,
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def constraint_rule_item(
+    household_id: str,
+    constraint_type: str,
+    tag_id: str,
+    max_count: int,
+    enabled: bool,
+) -> dict:
+    rule_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"RULE#{rule_id}",
+        "gsi2pk": f"HOUSE#{household_id}",
+        "rule_id": rule_id,
+        "rule_kind": "CONSTRAINT",
+        "constraint_type": constraint_type,
+        "tag_id": tag_id,
+        "max_count": max_count,
+        "enabled": enabled,
+        "household_id": household_id,
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def action_rule_item(
+    household_id: str,
+    action_type: str,
+    target_type: str,
+    tag_id: Optional[str],
+    recipe_id: Optional[str],
+    offset_days: int,
+    time_local: str,
+    message_template: str,
+    enabled: bool,
+) -> dict:
+    rule_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"RULE#{rule_id}",
+        "gsi2pk": f"HOUSE#{household_id}",
+        "rule_id": rule_id,
+        "rule_kind": "ACTION",
+        "action_type": action_type,
+        "target_type": target_type,
+        "tag_id": tag_id,
+        "recipe_id": recipe_id,
+        "offset_days": offset_days,
+        "time_local": time_local,
+        "message_template": message_template,
+        "enabled": enabled,
+        "household_id": household_id,
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+# Item kinds returned by get_changes, by sort key prefix
+SYNC_KINDS = {"TAG#": "tag", "RECIPE#": "recipe", "RULE#": "rule"}
+
+TOMBSTONE_PREFIX = "TOMBSTONE#"
+
+
+def tombstone_item(item: dict) -> dict:
+    """Marker left behind by a deleted tag, recipe or rule for delta sync.
+
+    Tombstones sit in the same updated_at index as the live items and expire
+    after `sync_tombstone_days`; clients that last synced before that get a
+    full reload instead.
+    """
+    prefix, item_id = item["sk"].split("#", 1)
+    return {
+        "pk": item["pk"],
+        "sk": f"{TOMBSTONE_PREFIX}{item['sk']}",
+        "gsi2pk": item["pk"],
+        "kind": SYNC_KINDS[f"{prefix}#"],
+        "item_id": item_id,
+        "household_id": item["household_id"],
+        "updated_at": datetime.utcnow().isoformat(),
+        "expires_at": int(time.time()) + get_settings().sync_tombstone_days * 86400,
+    }
+
+
+def tag_deletion_job_item(household_id: str, tag_id: str, recipes_total: int) -> dict:
+    """Progress item of the cleanup that follows a tag deletion"""
+    job_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    return {
+        "pk": f"HOUSE#{household_id}",
+        "sk": f"JOB#{job_id}",
+        "job_id": job_id,
+        "job_type": "TAG_DELETE",
+        "tag_id": tag_id,
+        # RUNNING until the cleanup finishes (DONE) or stops on an error (FAILED)
+        "status": "RUNNING",
+        "recipes_total": recipes_total,
+        "recipes_updated": 0,
+        "rules_deleted": 0,
+        "rules_disabled": 0,
+        "error": None,
+        "household_id": household_id,
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def dependent_rule_action(rule: dict, tag_id: str) -> Optional[str]:
+    """What deleting `tag_id` does to a rule: "delete", "disable" or None.
+
+    Constraint rules only make sense for their tag and are deleted; action
+    rules targeting the tag are disabled so their reminder text survives
+    for retargeting.
+    """
+    if rule.get("tag_id") != tag_id:
+        return None
+    if rule.get("rule_kind") == "CONSTRAINT":
+        return "delete"
+    if rule.get("enabled", True):
+        return "disable"
+    return None
+
+
+def pack_weeks(weeks: Dict[str, dict]) -> bytes:
+    """zlib-compressed JSON of an ARCHIVE# item's {sk: week item} map"""
+    raw = json.dumps(
+        weeks,
+        separators=(",", ":"),
+        sort_keys=True,
+        default=lambda v: int(v) if v == int(v) else float(v),
+    )
+    return zlib.compress(raw.encode(), 9)
+
+
+def unpack_weeks(archive: Optional[dict]) -> Dict[str, dict]:
+    """The {sk: week item} map of an ARCHIVE# item ({} when there is none)"""
+    if not archive:
+        return {}
+    data = archive["data"]
+    data = getattr(data, "value", data)
+    if isinstance(data, str):
+        # Binary attributes stay base64 in DynamoDB JSON exports
+        data = base64.b64decode(data)
+    # Numbers come back as Decimal, as from any other DynamoDB read
+    return json.loads(zlib.decompress(data), parse_int=Decimal, parse_float=Decimal)
+
+
+class StorageBackend(Protocol):
+    """Data access used by the API, implemented by every storage backend.
+
+    Items are plain dicts in the single-table layout above. Writes taking
+    `expected_version` raise VersionConflictError when the stored item is at
+    another version; `*_page` methods return (items, next_cursor) with
+    cursors from encode_cursor; `iter_*` methods stream and must be consumed
+    on the thread that called them.
+    """
+
+    # --- Users and Households ---
+    def get_user_by_email(self, email: str) -> Optional[dict]: ...
+
+    def create_user(
+        self, email: str, password_hash: str, household_id: Optional[str] = None
+    ) -> dict: ...
+
+    def update_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> bool: ...
+
+    def get_household(self, household_id: str) -> Optional[dict]: ...
+
+    # --- Auth Sessions ---
+    def create_auth_session(self, user: dict, session_id: str, token_hash: str) -> dict: ...
+
+    def get_auth_session(self, session_id: str) -> Optional[dict]: ...
+
+    def rotate_refresh_token(
+        self, session_id: str, old_hash: str, new_hash: str
+    ) -> Optional[dict]: ...
+
+    def revoke_auth_session(self, session_id: str) -> None: ...
+
+    def get_revoked_session_ids(self) -> List[str]: ...
+
+    # --- Login Throttling ---
+    def count_login_attempt(self, key: str, window_start: int, expires_at: int) -> int: ...
+
+    def iter_household_ids(self) -> Iterator[str]: ...
+
+    def get_data_version(self, household_id: str) -> int: ...
+
+    # --- Tags ---
+    def iter_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]: ...
+
+    def get_tags(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]: ...
+
+    def get_tags_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]: ...
+
+    def get_tag(self, household_id: str, tag_id: str) -> Optional[dict]: ...
+
+    def create_tag(self, household_id: str, name: str, tag_type: str) -> dict: ...
+
+    def update_tag(
+        self, household_id: str, tag_id: str, updates: dict
+    ) -> Optional[dict]: ...
+
+    def delete_tag(self, household_id: str, tag_id: str) -> dict: ...
+
+    def run_tag_deletion(self, household_id: str, job_id: str) -> Optional[dict]: ...
+
+    def backfill_tag_name_guards(self, household_id: str) -> int: ...
+
+    # --- Recipes ---
+    def iter_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[dict]: ...
+
+    def get_recipes_by_id(
+        self,
+        household_id: str,
+        recipe_ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]: ...
+
+    def get_recipes(
+        self,
+        household_id: str,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[dict]: ...
+
+    def get_recipes_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        tag_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]: ...
+
+    def get_recipe(self, household_id: str, recipe_id: str) -> Optional[dict]: ...
+
+    def create_recipe(
+        self,
+        household_id: str,
+        title: str,
+        tag_ids: List[str],
+        default_servings: int,
+        notes: Optional[str],
+    ) -> dict: ...
+
+    def create_recipes_batch(
+        self, household_id: str, records: List[dict]
+    ) -> Tuple[List[dict], List[int]]: ...
+
+    def update_recipe(
+        self,
+        household_id: str,
+        recipe_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]: ...
+
+    def delete_recipe(self, household_id: str, recipe_id: str) -> bool: ...
+
+    def backfill_tag_index(self, household_id: str) -> int: ...
+
+    # --- Rules ---
+    def iter_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> Iterator[dict]: ...
+
+    def get_rules(
+        self, household_id: str, fields: Optional[List[str]] = None
+    ) -> List[dict]: ...
+
+    def get_rules_page(
+        self,
+        household_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]: ...
+
+    def get_rule(self, household_id: str, rule_id: str) -> Optional[dict]: ...
+
+    def create_constraint_rule(
+        self,
+        household_id: str,
+        constraint_type: str,
+        tag_id: str,
+        max_count: int,
+        enabled: bool,
+    ) -> dict: ...
+
+    def create_action_rule(
+        self,
+        household_id: str,
+        action_type: str,
+        target_type: str,
+        tag_id: Optional[str],
+        recipe_id: Optional[str],
+        offset_days: int,
+        time_local: str,
+        message_template: str,
+        enabled: bool,
+    ) -> dict: ...
+
+    def update_rule(
+        self,
+        household_id: str,
+        rule_id: str,
+        updates: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]: ...
+
+    def delete_rule(self, household_id: str, rule_id: str) -> bool: ...
+
+    # --- Plans ---
+    def get_household_snapshot(
+        self, household_id: str, week_start_date: str
+    ) -> HouseholdSnapshot: ...
+
+    def get_weekly_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        fields: Optional[List[str]] = None,
+    ) -> Optional[dict]: ...
+
+    def get_weekly_plans_page(
+        self,
+        household_id: str,
+        from_week: str,
+        to_week: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]: ...
+
+    def save_weekly_plan(
+        self,
+        household_id: str,
+        week_start_date: str,
+        entries: dict,
+        expected_version: Optional[int] = None,
+    ) -> dict: ...
+
+    def update_plan_entry(
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        recipe_id: str,
+        servings: int,
+        expected_version: Optional[int] = None,
+    ) -> dict: ...
+
+    def patch_plan_entries(
+        self,
+        household_id: str,
+        week_start_date: str,
+        upserts: Dict[str, dict],
+        deletes: List[str],
+        expected_version: Optional[int] = None,
+    ) -> dict: ...
+
+    def delete_plan_entry(
+        self,
+        household_id: str,
+        week_start_date: str,
+        date: str,
+        expected_version: Optional[int] = None,
+    ) -> dict: ...
+
+    def compact_weekly_plans(self, household_id: str, before_week: str) -> int: ...
+
+    # --- Jobs ---
+    def get_job(self, household_id: str, job_id: str) -> Optional[dict]: ...
+
+    def iter_jobs(self, household_id: str) -> Iterator[dict]: ...
+
+    # --- Sync ---
+    def get_changes(
+        self,
+        household_id: str,
+        since: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]: ...
+
+    def backfill_sync_index(self, household_id: str) -> int: ...
+
+    # --- Stats ---
+    def get_household_stats(self, household_id: str) -> dict: ...
+
+    def rebuild_household_stats(self, household_id: str) -> dict: ...
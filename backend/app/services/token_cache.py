@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..config import get_settings
+
+
+class TokenCache:
+    """LRU of verified access token claims, keyed by the token's SHA-256.
+
+    A hit skips decoding, the signature check and the claims checks. Entries
+    live no longer than the token's own `exp`, so a cached token is never
+    accepted after jwt.decode would have rejected it; invalidate() drops one
+    earlier. Raw tokens are never kept. Thread-safe; shared by the process.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # sha256(token) -> (claims, exp as a Unix timestamp)
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Claims of a token verified earlier, or None"""
+        if not self.enabled:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, claims: dict) -> None:
+        """Remember the claims of a token that has just been verified"""
+        exp = claims.get("exp")
+        if not self.enabled or not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, float(exp))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token: str) -> bool:
+        """Forget a token before it expires; returns whether it was cached"""
+        with self._lock:
+            removed = self._entries.pop(self._key(token), None) is not None
+            if removed:
+                self.invalidations += 1
+            return removed
+
+    def invalidate_subject(self, subject: str) -> int:
+        """Forget every cached token issued to `subject` (the `sub` claim)"""
+        with self._lock:
+            keys = [k for k, (claims, _) in self._entries.items() if claims.get("sub") == subject]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Singleton instance shared by every request in the process
+token_cache = TokenCache(max_entries=get_settings().token_cache_max_entries)
@@ -0,0 +1,50 @@
+"""
+Lambda entry point for the table's DynamoDB Stream (CHANGE_FEED=streams,
+BACKGROUND_JOBS=streams).
+
+The stream carries NEW_AND_OLD_IMAGES; recipe and week records are folded
+into the per-household STATS items, and newly inserted JOB# items are run.
+The two are independent: a failed stats fold or job does not keep the
+others from running. A failed batch then raises so Lambda retries it;
+events already applied are skipped on the retry and interrupted jobs
+resume where they stopped.
+"""
+import logging
+from typing import Optional
+
+from .services.changes import StatsConsumer, from_stream_record
+from .services.dynamodb import DynamoDBService
+from .services.jobs import job_from_stream_record, run_job
+
+logger = logging.getLogger("mealprepbuddy.changes")
+
+_consumer: Optional[StatsConsumer] = None
+
+
+def handler(event: dict, context) -> dict:
+    global _consumer
+    if _consumer is None:
+        _consumer = StatsConsumer(DynamoDBService())
+
+    records = event.get("Records", [])
+    changes = [from_stream_record(record) for record in records]
+    changes = [change for change in changes if change is not None]
+    error: Optional[Exception] = None
+    if changes:
+        try:
+            _consumer.apply(changes)
+        except Exception as e:
+            logger.exception("Could not apply %d change events", len(changes))
+            error = e
+
+    jobs = [job_from_stream_record(record) for record in records]
+    jobs = [job for job in jobs if job is not None]
+    for job in jobs:
+        try:
+            run_job(_consumer.storage, job)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job["job_id"], job["job_type"])
+            error = error or e
+    if error is not None:
+        raise error
+    return {"applied": len(changes), "jobs": len(jobs)}
@@ -0,0 +1,51 @@
+import re
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+_ETAG_RE = re.compile(r'^(?:W/)?"(\d+)"$')
+
+
+def make_etag(version) -> str:
+    """ETag for an item version (a missing version is version 0)"""
+    return f'"{int(version or 0)}"'
+
+
+def set_etag(response: Response, version) -> None:
+    response.headers["ETag"] = make_etag(version)
+
+
+def parse_if_match(request: Request) -> Optional[int]:
+    """Expected version from If-Match, or None when the header is absent or `*`"""
+    header = request.headers.get("if-match")
+    if header is None or header.strip() == "*":
+        return None
+    match = _ETAG_RE.match(header.strip())
+    if not match:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match must be an ETag returned by this API",
+        )
+    return int(match.group(1))
+
+
+def not_modified(request: Request, version) -> Optional[Response]:
+    """A 304 response when If-None-Match already names the current version"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    etag = make_etag(version)
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+
+def precondition_failed(current_version: Optional[int]) -> HTTPException:
+    """412 for a write whose If-Match no longer matches"""
+    headers = {"ETag": make_etag(current_version)} if current_version is not None else None
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Item was modified by another request; reload and retry",
+        headers=headers,
+    )
@@ -0,0 +1,78 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model
+
+
+def _field_annotations(models: Tuple[Type[BaseModel], ...]) -> Dict[str, Any]:
+    """Field name -> annotation across one or more models (unioned on conflict)"""
+    annotations: Dict[str, Any] = {}
+    for model in models:
+        for name, info in model.model_fields.items():
+            if name in annotations and annotations[name] != info.annotation:
+                annotations[name] = Union[annotations[name], info.annotation]
+            else:
+                annotations[name] = info.annotation
+    return annotations
+
+
+def parse_fields(
+    fields: Optional[str],
+    models: Union[Type[BaseModel], Tuple[Type[BaseModel], ...]],
+    always: Iterable[str] = (),
+) -> Optional[List[str]]:
+    """Parse a comma-separated `?fields=` value against the response model(s).
+
+    Returns None when no projection was requested. Identity fields listed in
+    `always` are kept so clients can still tell items apart.
+    """
+    if not fields:
+        return None
+    models = models if isinstance(models, tuple) else (models,)
+    known = _field_annotations(models)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in known]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return list(dict.fromkeys([*always, *requested]))
+
+
+@lru_cache(maxsize=128)
+def partial_model(
+    models: Tuple[Type[BaseModel], ...], fields: Tuple[str, ...]
+) -> Type[BaseModel]:
+    """A response model holding only `fields`, all optional"""
+    annotations = _field_annotations(models)
+    name = "".join(m.__name__ for m in models) + "Fields"
+    return create_model(
+        name, **{f: (Optional[annotations[f]], None) for f in fields}
+    )
+
+
+def project_response(
+    items: Union[dict, Iterable[dict]],
+    models: Union[Type[BaseModel], Tuple[Type[BaseModel], ...]],
+    fields: List[str],
+    headers: Optional[Dict[str, str]] = None,
+) -> JSONResponse:
+    """Validate projected items against a trimmed model and serialize them.
+
+    Returning a response bypasses the route's response_model, so headers
+    already set on the route's Response must be passed through.
+    """
+    models = models if isinstance(models, tuple) else (models,)
+    model = partial_model(models, tuple(fields))
+    include = set(fields)
+
+    def dump(item: dict) -> dict:
+        return model.model_validate(item).model_dump(mode="json", include=include)
+
+    if isinstance(items, dict):
+        return JSONResponse(content=dump(items), headers=headers)
+    return JSONResponse(content=[dump(item) for item in items], headers=headers)
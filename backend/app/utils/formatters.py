@@ -0,0 +1,71 @@
+"""Conversions from stored items to the API models, shared by the routers"""
+from datetime import datetime
+from typing import Union
+
+from ..models import (
+    Tag, TagType, Recipe, ConstraintRule, ActionRule,
+    RuleKind, ConstraintType, ActionType, TargetType,
+)
+
+
+def format_tag(t: dict) -> Tag:
+    """Convert DynamoDB item to Tag model"""
+    # Tags written before updates were tracked have no updated_at
+    updated_at = t.get("updated_at")
+    return Tag(
+        tag_id=t["tag_id"],
+        name=t["name"],
+        type=TagType(t["type"]),
+        household_id=t["household_id"],
+        created_at=datetime.fromisoformat(t["created_at"]),
+        updated_at=datetime.fromisoformat(updated_at) if updated_at else None,
+    )
+
+
+def format_recipe(r: dict) -> Recipe:
+    """Convert DynamoDB item to Recipe model"""
+    return Recipe(
+        recipe_id=r["recipe_id"],
+        title=r["title"],
+        tag_ids=r["tag_ids"],
+        default_servings=r["default_servings"],
+        notes=r.get("notes"),
+        household_id=r["household_id"],
+        version=r.get("version", 0),
+        created_at=datetime.fromisoformat(r["created_at"]),
+        updated_at=datetime.fromisoformat(r["updated_at"]),
+    )
+
+
+def format_rule(r: dict) -> Union[ConstraintRule, ActionRule]:
+    """Convert DynamoDB item to Rule model"""
+    if r["rule_kind"] == "CONSTRAINT":
+        return ConstraintRule(
+            rule_id=r["rule_id"],
+            rule_kind=RuleKind.CONSTRAINT,
+            constraint_type=ConstraintType(r["constraint_type"]),
+            tag_id=r["tag_id"],
+            max_count=r["max_count"],
+            enabled=r["enabled"],
+            household_id=r["household_id"],
+            version=r.get("version", 0),
+            created_at=datetime.fromisoformat(r["created_at"]),
+            updated_at=datetime.fromisoformat(r["updated_at"]),
+        )
+    else:
+        return ActionRule(
+            rule_id=r["rule_id"],
+            rule_kind=RuleKind.ACTION,
+            action_type=ActionType(r["action_type"]),
+            target_type=TargetType(r["target_type"]),
+            tag_id=r.get("tag_id"),
+            recipe_id=r.get("recipe_id"),
+            offset_days=r["offset_days"],
+            time_local=r["time_local"],
+            message_template=r["message_template"],
+            enabled=r["enabled"],
+            household_id=r["household_id"],
+            version=r.get("version", 0),
+            created_at=datetime.fromisoformat(r["created_at"]),
+            updated_at=datetime.fromisoformat(r["updated_at"]),
+        )
@@ -0,0 +1,10 @@
+from typing import Optional
+from fastapi import Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Expose the cursor for the following page, if there is one"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,51 @@
+import os
+import uuid
+from typing import Optional
+
+# Settings are read once, at import; the API tests run on the in-memory backend
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("CHANGE_FEED", "off")
+os.environ.setdefault("BACKGROUND_JOBS", "local")
+# Every test signs up from the same client address; test_login_throttle
+# builds limiters of its own
+os.environ.setdefault("LOGIN_IP_PER_MINUTE", "0")
+os.environ.setdefault("LOGIN_EMAIL_PER_MINUTE", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+def auth(tokens: dict) -> dict:
+    """Authorization headers for a token response"""
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+@pytest.fixture
+def sign_up(client: TestClient):
+    """Registers a fresh user (and household) per call; returns the token response"""
+
+    def sign_up(email: Optional[str] = None) -> dict:
+        response = client.post(
+            "/auth/register",
+            json={"email": email or f"{uuid.uuid4().hex}@example.com", "password": PASSWORD},
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return sign_up
+
+
+@pytest.fixture
+def headers(sign_up) -> dict:
+    """Authorization headers of a fresh user"""
+    return auth(sign_up())
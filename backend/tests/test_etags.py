@@ -0,0 +1,92 @@
+import pytest
+
+
+@pytest.fixture
+def recipe(client, headers) -> dict:
+    tag_id = client.post(
+        "/tags", json={"name": "T", "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+    return client.post(
+        "/recipes", json={"title": "Soup", "tag_ids": [tag_id]}, headers=headers
+    ).json()
+
+
+def test_if_none_match_returns_304_until_the_recipe_changes(client, headers, recipe):
+    url = f"/recipes/{recipe['recipe_id']}"
+    etag = client.get(url, headers=headers).headers["ETag"]
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert client.get(url, headers={**headers, "If-None-Match": f"W/{etag}"}).status_code == 304
+
+    client.patch(url, json={"title": "Stew"}, headers=headers)
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["title"] == "Stew"
+
+
+def test_stale_if_match_returns_412_with_the_current_etag(client, headers, recipe):
+    url = f"/recipes/{recipe['recipe_id']}"
+    etag = client.get(url, headers=headers).headers["ETag"]
+
+    first = client.patch(url, json={"title": "A"}, headers={**headers, "If-Match": etag})
+    assert first.status_code == 200
+    second = client.patch(url, json={"title": "B"}, headers={**headers, "If-Match": etag})
+    assert second.status_code == 412
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert client.get(url, headers=headers).json()["title"] == "A"
+
+    # Retrying with the current ETag succeeds; `*` and no header skip the check
+    assert client.patch(
+        url, json={"title": "B"}, headers={**headers, "If-Match": second.headers["ETag"]}
+    ).status_code == 200
+    assert client.patch(
+        url, json={"title": "C"}, headers={**headers, "If-Match": "*"}
+    ).status_code == 200
+    assert client.patch(url, json={"title": "D"}, headers=headers).status_code == 200
+
+
+def test_malformed_if_match_is_rejected(client, headers, recipe):
+    response = client.patch(
+        f"/recipes/{recipe['recipe_id']}",
+        json={"title": "A"},
+        headers={**headers, "If-Match": "not-an-etag"},
+    )
+    assert response.status_code == 412
+
+
+def test_plan_writes_check_if_match(client, headers, recipe):
+    week = "2024-02-05"
+    entry = {"date": week, "recipe_id": recipe["recipe_id"], "servings": 2}
+    # A week that was never written is at version 0
+    response = client.put(
+        f"/plans/{week}/entry", json=entry, headers={**headers, "If-Match": '"0"'}
+    )
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    stale = client.put(
+        f"/plans/{week}/entry", json=entry, headers={**headers, "If-Match": '"0"'}
+    )
+    assert stale.status_code == 412
+    assert stale.headers["ETag"] == etag
+    cached = client.get(f"/plans/{week}", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+def test_rule_writes_check_if_match(client, headers, recipe):
+    rule = client.post(
+        "/rules/constraint/max_meals_per_week_by_tag",
+        json={"tag_id": recipe["tag_ids"][0], "max_count": 1},
+        headers=headers,
+    ).json()
+    url = f"/rules/{rule['rule_id']}"
+    etag = client.patch(url, json={"enabled": True}, headers=headers).headers["ETag"]
+    assert client.patch(
+        url, json={"enabled": False}, headers={**headers, "If-Match": etag}
+    ).status_code == 200
+    assert client.patch(
+        url, json={"enabled": True}, headers={**headers, "If-Match": etag}
+    ).status_code == 412
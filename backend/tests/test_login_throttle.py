@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.login_throttle import LoginThrottle, _Limit, login_throttle
+from conftest import PASSWORD
+
+
+def _throttle(ip_per_minute: float, ip_burst: int, email_per_minute: float, email_burst: int):
+    throttle = LoginThrottle()
+    throttle.limits = [
+        _Limit("ip", ip_per_minute, ip_burst),
+        _Limit("email", email_per_minute, email_burst),
+    ]
+    # Long windows, so a test never straddles two of them
+    throttle.window_seconds = 3600
+    return throttle
+
+
+def _attempt(throttle: LoginThrottle, ip: str, email: str) -> int:
+    """200, or the status of the throttle's rejection"""
+    try:
+        asyncio.run(throttle.check(ip, email))
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def _ip() -> str:
+    # The shared counters live as long as the in-memory storage, across tests
+    return f"ip-{uuid.uuid4().hex}"
+
+
+def test_burst_then_429_with_retry_after():
+    throttle = _throttle(0, 0, 1, 2)
+    ip, email = _ip(), f"{uuid.uuid4().hex}@example.com"
+    assert [_attempt(throttle, ip, email) for _ in range(3)] == [200, 200, 429]
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(throttle.check(ip, email))
+    # One attempt a minute: the next token is about a minute away
+    assert 55 <= int(rejected.value.headers["Retry-After"]) <= 60
+    assert throttle.stats()["rejected_local"] == 2
+
+
+def test_rejected_attempts_do_not_drain_the_other_bucket():
+    throttle = _throttle(1, 5, 1, 1)
+    ip = _ip()
+    assert _attempt(throttle, ip, "victim@example.com") == 200
+    # Attempts on the exhausted email take no tokens from the IP's bucket
+    assert [_attempt(throttle, ip, "victim@example.com") for _ in range(10)] == [429] * 10
+    assert [
+        _attempt(throttle, ip, f"{i}@example.com") for i in range(5)
+    ] == [200, 200, 200, 200, 429]
+
+
+def test_shared_counters_limit_attempts_across_instances():
+    # A window admits one full bucket plus what it refills meanwhile, here none
+    first, second = _throttle(0, 0, 0.01, 2), _throttle(0, 0, 0.01, 2)
+    ip, email = _ip(), f"{uuid.uuid4().hex}@example.com"
+    assert _attempt(first, ip, email) == 200
+    # The second instance's own bucket is still full
+    assert [_attempt(second, ip, email) for _ in range(2)] == [200, 429]
+    assert second.stats()["rejected_shared"] == 1
+    # The shared rejection emptied the local bucket
+    assert _attempt(second, ip, email) == 429
+    assert second.stats()["rejected_local"] == 1
+
+
+def test_login_and_register_are_throttled(client, sign_up, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+    sign_up(email)
+    monkeypatch.setattr(login_throttle, "limits", [_Limit("email", 1, 2)])
+
+    def login(password: str) -> int:
+        return client.post(
+            "/auth/login", json={"email": email, "password": password}
+        ).status_code
+
+    assert [login("wrong"), login(PASSWORD), login(PASSWORD)] == [401, 200, 429]
+
+    response = client.post("/auth/register", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
@@ -0,0 +1,73 @@
+import pytest
+
+from app.services.memory import InMemoryStorage
+from conftest import auth
+
+HOUSEHOLD_ID = "h1"
+
+
+def _pages(fetch, limit: int):
+    """Every page fetch(limit, cursor) returns, following cursors to the end"""
+    pages, cursor = [], None
+    while True:
+        items, cursor = fetch(limit, cursor)
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_tag_pages_cover_every_tag_once():
+    storage = InMemoryStorage()
+    names = sorted(f"Tag {i:02d}" for i in range(23))
+    for name in names:
+        storage.create_tag(HOUSEHOLD_ID, name, "PROTEIN")
+
+    pages = _pages(
+        lambda limit, cursor: storage.get_tags_page(HOUSEHOLD_ID, limit, cursor), 10
+    )
+    assert [len(page) for page in pages] == [10, 10, 3]
+    assert sorted(tag["name"] for page in pages for tag in page) == names
+
+
+@pytest.mark.parametrize("kind", ["tags", "recipes", "rules"])
+def test_list_endpoints_follow_the_next_cursor_header(client, headers, kind):
+    tag_ids = [
+        client.post(
+            "/tags", json={"name": f"T{i}", "type": "PROTEIN"}, headers=headers
+        ).json()["tag_id"]
+        for i in range(5)
+    ]
+    for i, tag_id in enumerate(tag_ids):
+        client.post(
+            "/recipes", json={"title": f"R{i}", "tag_ids": [tag_id]}, headers=headers
+        )
+        client.post(
+            "/rules/constraint/max_meals_per_week_by_tag",
+            json={"tag_id": tag_id, "max_count": 1},
+            headers=headers,
+        )
+    everything = client.get(f"/{kind}", headers=headers).json()
+    assert len(everything) == 5
+
+    seen, url = [], f"/{kind}?limit=2"
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/{kind}?limit=2&cursor={cursor}" if cursor else None
+    assert seen == everything
+
+
+def test_cursor_from_another_household_is_rejected(client, headers, sign_up):
+    for i in range(3):
+        client.post("/tags", json={"name": f"T{i}", "type": "PROTEIN"}, headers=headers)
+    cursor = client.get("/tags?limit=1", headers=headers).headers["X-Next-Cursor"]
+
+    other = auth(sign_up())
+    assert client.get(f"/tags?limit=1&cursor={cursor}", headers=other).status_code == 400
+
+
+def test_malformed_cursor_is_rejected(client, headers):
+    assert client.get("/tags?limit=1&cursor=not-a-cursor", headers=headers).status_code == 400
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.memory import InMemoryStorage
+
+HOUSEHOLD_ID = "h1"
+WEEK = "2024-02-05"
+DATES = [f"2024-02-{day:02d}" for day in range(5, 12)]
+
+
+def test_concurrent_entry_writes_to_one_week_all_survive():
+    storage = InMemoryStorage()
+    with ThreadPoolExecutor(max_workers=7) as pool:
+        list(pool.map(
+            lambda date: storage.update_plan_entry(HOUSEHOLD_ID, WEEK, date, f"r-{date}", 2),
+            DATES,
+        ))
+    plan = storage.get_weekly_plan(HOUSEHOLD_ID, WEEK)
+    assert plan["entries"] == {
+        date: {"recipe_id": f"r-{date}", "servings": 2} for date in DATES
+    }
+    assert plan["version"] == len(DATES)
+
+
+def test_deleting_an_entry_leaves_the_others(client, headers):
+    tag_id = client.post(
+        "/tags", json={"name": "T", "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+    recipe_id = client.post(
+        "/recipes", json={"title": "R", "tag_ids": [tag_id]}, headers=headers
+    ).json()["recipe_id"]
+    for date in DATES[:3]:
+        response = client.put(
+            f"/plans/{WEEK}/entry",
+            json={"date": date, "recipe_id": recipe_id, "servings": 3},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    response = client.delete(f"/plans/{WEEK}/entry?date={DATES[1]}", headers=headers)
+    assert response.status_code == 200
+    assert sorted(response.json()["entries"]) == [DATES[0], DATES[2]]
+
+    # Deleting from a week that was never planned is not an error
+    response = client.delete("/plans/2024-03-04/entry?date=2024-03-04", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["entries"] == {}
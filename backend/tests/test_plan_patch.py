@@ -0,0 +1,70 @@
+import pytest
+
+WEEK = "2024-02-05"
+
+
+@pytest.fixture
+def recipe_id(client, headers) -> str:
+    tag_id = client.post(
+        "/tags", json={"name": "T", "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+    return client.post(
+        "/recipes", json={"title": "Soup", "tag_ids": [tag_id]}, headers=headers
+    ).json()["recipe_id"]
+
+
+def _entry(recipe_id: str, servings: int = 2) -> dict:
+    return {"recipe_id": recipe_id, "servings": servings}
+
+
+def test_patch_sets_and_clears_entries_in_one_write(client, headers, recipe_id):
+    response = client.patch(
+        f"/plans/{WEEK}",
+        json={"upserts": {
+            date: _entry(recipe_id) for date in ("2024-02-05", "2024-02-06", "2024-02-07")
+        }},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["plan"]["version"] == 1
+
+    response = client.patch(
+        f"/plans/{WEEK}",
+        json={"upserts": {"2024-02-11": _entry(recipe_id, 4)}, "deletes": ["2024-02-06"]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    plan = response.json()["plan"]
+    assert plan["version"] == 2
+    assert sorted(plan["entries"]) == ["2024-02-05", "2024-02-07", "2024-02-11"]
+    assert plan["entries"]["2024-02-11"]["servings"] == 4
+
+
+@pytest.mark.parametrize("date", ["2024-02-04", "2024-02-12", "2023-02-05"])
+def test_dates_outside_the_week_are_rejected(client, headers, recipe_id, date):
+    for body in ({"upserts": {date: _entry(recipe_id)}}, {"deletes": [date]}):
+        response = client.patch(f"/plans/{WEEK}", json=body, headers=headers)
+        assert response.status_code == 400
+        assert date in response.json()["detail"]
+    # Nothing was written
+    assert client.get(f"/plans/{WEEK}", headers=headers).json()["entries"] == {}
+
+
+@pytest.mark.parametrize("body", [
+    {"upserts": {"2024-02-31": {"recipe_id": "r", "servings": 2}}},
+    {"deletes": ["05-02-2024"]},
+    {"upserts": {"2024-02-06": {"recipe_id": "r", "servings": 2}}, "deletes": ["2024-02-06"]},
+])
+def test_invalid_patches_are_rejected(client, headers, body):
+    response = client.patch(f"/plans/{WEEK}", json=body, headers=headers)
+    assert response.status_code in (400, 422)
+
+
+def test_patch_can_validate_the_result(client, headers, recipe_id):
+    response = client.patch(
+        f"/plans/{WEEK}?validate=true",
+        json={"upserts": {"2024-02-05": _entry(recipe_id)}},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["validation"] == {"warnings": []}
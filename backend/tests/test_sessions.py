@@ -0,0 +1,80 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from app.config import get_settings
+from app.services.revocation import RevocationFilter
+from conftest import PASSWORD, auth
+
+
+def _refresh(client, refresh_token: str):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def _authorized(client, tokens: dict) -> bool:
+    return client.get("/tags", headers=auth(tokens)).status_code == 200
+
+
+def test_refresh_rotates_the_refresh_token(client, sign_up):
+    tokens = sign_up()
+    response = _refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert _authorized(client, rotated)
+
+    # The rotated token works once more, then is spent too
+    again = _refresh(client, rotated["refresh_token"])
+    assert again.status_code == 200
+    assert _refresh(client, "not-a-token").status_code == 401
+
+
+def test_reusing_a_refresh_token_revokes_the_session(client, sign_up):
+    tokens = sign_up()
+    rotated = _refresh(client, tokens["refresh_token"]).json()
+
+    assert _refresh(client, tokens["refresh_token"]).status_code == 401
+    # Whoever holds the newer tokens is signed out as well
+    assert _refresh(client, rotated["refresh_token"]).status_code == 401
+    response = client.get("/tags", headers=auth(rotated))
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Session has been revoked"
+
+
+def test_logout_revokes_only_its_session(client, sign_up):
+    email = f"{uuid.uuid4().hex}@example.com"
+    tokens = sign_up(email)
+    other = client.post("/auth/login", json={"email": email, "password": PASSWORD}).json()
+
+    assert client.post(
+        "/auth/logout", json={"refresh_token": tokens["refresh_token"]}
+    ).status_code == 204
+    assert not _authorized(client, tokens)
+    assert _refresh(client, tokens["refresh_token"]).status_code == 401
+    assert _authorized(client, other)
+
+    # Other processes learn of the revocation at their next reload
+    sessions = RevocationFilter()
+    session_id = tokens["refresh_token"].partition(".")[0]
+    assert asyncio.run(sessions.is_revoked(session_id))
+    assert not asyncio.run(sessions.is_revoked(other["refresh_token"].partition(".")[0]))
+
+
+def test_tokens_without_a_session_are_refused(client, sign_up):
+    tokens = sign_up()
+    claims = jwt.get_unverified_claims(tokens["access_token"])
+    settings = get_settings()
+    legacy = jwt.encode(
+        {
+            "sub": claims["sub"],
+            "household_id": claims["household_id"],
+            "exp": datetime.utcnow() + timedelta(minutes=5),
+        },
+        settings.jwt_secret_key,
+        algorithm=settings.jwt_algorithm,
+    )
+    response = client.get("/tags", headers={"Authorization": f"Bearer {legacy}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token payload"
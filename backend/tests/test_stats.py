@@ -0,0 +1,269 @@
+import copy
+import random
+
+from app.services.changes import StatsConsumer
+from app.services.stats import (
+    apply_change,
+    build_stats,
+    drop_old_weeks,
+    empty_stats,
+    item_change,
+    missed_changes,
+    planned_recipe_ids,
+)
+
+HOUSEHOLD_ID = "h1"
+PK = f"HOUSE#{HOUSEHOLD_ID}"
+TAG_IDS = ["t1", "t2", "t3", "t4"]
+WEEKS = ["2024-02-05", "2024-02-12", "2024-02-19"]
+
+
+def _date(week: str, day: int) -> str:
+    return f"{week[:8]}{int(week[8:]) + day:02d}"
+
+
+class Household:
+    """Recipes and weeks of one household, recording a change event per write"""
+
+    def __init__(self):
+        self.recipes = {}
+        self.weeks = {}
+        self.events = []
+
+    def _write(self, items: dict, key: str, new):
+        old = items.get(key)
+        if new is not None:
+            new["version"] = int((old or {}).get("version", 0)) + 1
+            items[key] = new
+        else:
+            del items[key]
+        self.events.append(item_change(copy.deepcopy(old), copy.deepcopy(new)))
+
+    def put_recipe(self, recipe_id: str, tag_ids: list):
+        self._write(self.recipes, recipe_id, {
+            "pk": PK,
+            "sk": f"RECIPE#{recipe_id}",
+            "recipe_id": recipe_id,
+            "tag_ids": tag_ids,
+        })
+
+    def delete_recipe(self, recipe_id: str):
+        self._write(self.recipes, recipe_id, None)
+
+    def set_entry(self, week: str, day: int, recipe_id):
+        plan = copy.deepcopy(self.weeks.get(week)) or {
+            "pk": PK, "sk": f"WEEK#{week}", "week_start_date": week, "entries": {},
+        }
+        date = _date(week, day)
+        if recipe_id is None:
+            plan["entries"].pop(date, None)
+        else:
+            plan["entries"][date] = {"recipe_id": recipe_id, "servings": 2}
+        self._write(self.weeks, week, plan)
+
+    def fold(self, events=None) -> dict:
+        """STATS item after applying the events in order, as the consumer does"""
+        stats = empty_stats(HOUSEHOLD_ID)
+        for event in self.events if events is None else events:
+            assert not missed_changes(stats, event)
+            recipe_tags = {
+                recipe_id: self.recipes[recipe_id]["tag_ids"]
+                for recipe_id in planned_recipe_ids(event)
+                if recipe_id in self.recipes
+            }
+            apply_change(stats, event, recipe_tags)
+        return stats
+
+    def build(self) -> dict:
+        return build_stats(HOUSEHOLD_ID, self.recipes.values(), self.weeks.values())
+
+
+def _random_history(seed: int, full: bool) -> Household:
+    """200 random writes; without `full`, only creates and plans of free dates,
+    so last-planned dates are simply the latest planned ones"""
+    rng = random.Random(seed)
+    household = Household()
+    next_id = 0
+    for _ in range(200):
+        action = rng.random()
+        if action < 0.2 or not household.recipes:
+            household.put_recipe(f"r{next_id}", rng.sample(TAG_IDS, rng.randint(1, 3)))
+            next_id += 1
+        elif full and action < 0.35:
+            household.put_recipe(
+                rng.choice(sorted(household.recipes)), rng.sample(TAG_IDS, rng.randint(1, 3))
+            )
+        elif full and action < 0.45:
+            household.delete_recipe(rng.choice(sorted(household.recipes)))
+        elif full:
+            recipe_id = rng.choice(sorted(household.recipes) + [None])
+            household.set_entry(rng.choice(WEEKS), rng.randrange(7), recipe_id)
+        else:
+            week = rng.choice(WEEKS)
+            planned = household.weeks.get(week, {}).get("entries", {})
+            free = [day for day in range(7) if _date(week, day) not in planned]
+            if free:
+                household.set_entry(week, rng.choice(free), rng.choice(sorted(household.recipes)))
+    return household
+
+
+def test_apply_change_matches_build_stats_counts():
+    for seed in range(20):
+        household = _random_history(seed, full=True)
+        folded, built = household.fold(), household.build()
+        for key in ("recipe_plan_counts", "tag_recipe_counts", "applied"):
+            assert folded[key] == built[key], (seed, key)
+
+
+def test_apply_change_matches_build_stats():
+    for seed in range(20):
+        household = _random_history(seed, full=False)
+        folded, built = household.fold(), household.build()
+        for key in (
+            "recipe_plan_counts",
+            "recipe_last_planned",
+            "tag_recipe_counts",
+            "tag_last_planned",
+            "applied",
+        ):
+            assert folded[key] == built[key], (seed, key)
+
+
+def test_deleted_recipe_is_dropped():
+    household = Household()
+    household.put_recipe("r1", ["t1"])
+    household.set_entry(WEEKS[0], 0, "r1")
+    household.delete_recipe("r1")
+    stats = household.fold()
+    assert "RECIPE#r1" not in stats["applied"]
+    assert "r1" not in stats["recipe_plan_counts"]
+    assert "r1" not in stats["recipe_last_planned"]
+    assert stats["tag_recipe_counts"] == {}
+
+    # A redelivered delete changes nothing
+    assert not apply_change(stats, household.events[-1], {})
+
+
+def test_deleted_tag_is_dropped():
+    household = Household()
+    household.put_recipe("r1", ["t1", "t2"])
+    household.set_entry(WEEKS[0], 0, "r1")
+    stats = household.fold()
+    tag = {"pk": PK, "sk": "TAG#t1", "tag_id": "t1", "version": 1}
+    assert apply_change(stats, item_change(tag, None), {})
+    assert "t1" not in stats["tag_recipe_counts"]
+    assert "t1" not in stats["tag_last_planned"]
+    assert stats["tag_recipe_counts"] == {"t2": 1}
+    assert "TAG#t1" not in stats["applied"]
+
+    # Other tag writes and a redelivered delete change nothing
+    assert not missed_changes(stats, item_change(None, tag))
+    assert not apply_change(stats, item_change(None, tag), {})
+    assert not apply_change(stats, item_change(tag, None), {})
+
+    # The tag's recipes are untagged afterwards
+    household.put_recipe("r1", ["t2"])
+    apply_change(stats, household.events[-1], {})
+    assert stats["tag_recipe_counts"] == {"t2": 1}
+
+
+def test_old_weeks_are_dropped_from_applied():
+    household = Household()
+    household.put_recipe("r1", ["t1"])
+    for week in WEEKS:
+        household.set_entry(week, 0, "r1")
+    stats = household.fold()
+    drop_old_weeks(stats, WEEKS[2])
+    assert sorted(stats["applied"]) == ["RECIPE#r1", f"WEEK#{WEEKS[2]}"]
+    assert stats["recipe_plan_counts"] == {"r1": 3}
+
+    # A later write to a dropped week can only be handled by a rebuild
+    household.set_entry(WEEKS[0], 1, "r1")
+    assert missed_changes(stats, household.events[-1])
+    household.set_entry(WEEKS[2], 1, "r1")
+    assert not missed_changes(stats, household.events[-1])
+
+
+def test_redelivered_events_change_nothing():
+    for seed in range(5):
+        household = _random_history(seed, full=True)
+        stats = household.fold()
+        before = copy.deepcopy(stats)
+        # Streams retries in order, so a deleted recipe's events come back with its delete
+        for event in household.events:
+            assert not missed_changes(stats, event)
+            apply_change(stats, event, {})
+        for key in ("recipe_plan_counts", "tag_recipe_counts", "applied"):
+            assert stats[key] == before[key], (seed, key)
+
+
+def test_out_of_order_events_are_missed_changes():
+    household = Household()
+    household.put_recipe("r1", ["t1"])
+    household.put_recipe("r1", ["t2"])
+    household.put_recipe("r1", ["t3"])
+    create, v2, v3 = household.events
+
+    stats = household.fold([create])
+    assert missed_changes(stats, v3)
+    assert not missed_changes(stats, v2)
+
+    # An update to an item never folded in, e.g. a recipe already dropped
+    household.delete_recipe("r1")
+    stats = household.fold([create, household.events[-1]])
+    assert missed_changes(stats, v2)
+
+
+class _Storage:
+    """The storage calls StatsConsumer makes, on top of a Household"""
+
+    def __init__(self, household: Household):
+        self.household = household
+        self.stats = empty_stats(HOUSEHOLD_ID)
+        self.rebuilds = 0
+
+    def get_recipes_by_id(self, household_id, recipe_ids, fields=None):
+        return [self.household.recipes[r] for r in recipe_ids if r in self.household.recipes]
+
+    def get_household_stats(self, household_id):
+        return copy.deepcopy(self.stats)
+
+    def save_household_stats(self, household_id, stats, expected_version):
+        assert expected_version == self.stats["version"]
+        self.stats = {**stats, "version": expected_version + 1}
+        return self.stats
+
+    def rebuild_household_stats(self, household_id):
+        self.rebuilds += 1
+        return self.save_household_stats(household_id, self.household.build(), self.stats["version"])
+
+
+def test_consumer_sorts_an_items_events_within_a_batch():
+    household = Household()
+    household.put_recipe("r1", ["t1"])
+    household.put_recipe("r1", ["t2"])
+    household.put_recipe("r1", ["t3"])
+    storage = _Storage(household)
+    StatsConsumer(storage).apply(list(reversed(household.events)))
+    assert storage.rebuilds == 0
+    assert storage.stats["tag_recipe_counts"] == {"t3": 1}
+
+
+def test_consumer_rebuilds_on_missed_changes():
+    household = Household()
+    household.put_recipe("r1", ["t1"])
+    storage = _Storage(household)
+    consumer = StatsConsumer(storage)
+    consumer.apply(household.events)
+
+    household.put_recipe("r1", ["t2"])
+    household.put_recipe("r1", ["t3"])
+    v2, v3 = household.events[1:]
+    consumer.apply([v3])
+    assert storage.rebuilds == 1
+    assert storage.stats["tag_recipe_counts"] == {"t3": 1}
+
+    # The late event is already part of the rebuilt stats
+    consumer.apply([v2])
+    assert storage.rebuilds == 1
+    assert storage.stats["tag_recipe_counts"] == {"t3": 1}
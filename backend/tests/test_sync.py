@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+from app.routers.sync import _encode_token
+
+
+def _sync(client, headers, **params) -> dict:
+    response = client.get("/sync", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _ids(items: list, key: str) -> set:
+    return {item[key] for item in items}
+
+
+def test_first_sync_returns_everything(client, headers):
+    tag_id = client.post(
+        "/tags", json={"name": "Fish", "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+    recipe = client.post(
+        "/recipes", json={"title": "Soup", "tag_ids": [tag_id]}, headers=headers
+    ).json()
+
+    result = _sync(client, headers)
+    assert result["reset"] is True
+    assert result["has_more"] is False
+    assert _ids(result["tags"], "tag_id") == {tag_id}
+    assert _ids(result["recipes"], "recipe_id") == {recipe["recipe_id"]}
+    assert result["deleted"] == []
+    assert result["cursor"]
+
+
+def test_cursor_returns_changes_and_deletions(client, headers):
+    tag_id = client.post(
+        "/tags", json={"name": "Fish", "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+    soup, stew = (
+        client.post(
+            "/recipes", json={"title": title, "tag_ids": [tag_id]}, headers=headers
+        ).json()["recipe_id"]
+        for title in ("Soup", "Stew")
+    )
+    rule_id = client.post(
+        "/rules/constraint/max_meals_per_week_by_tag",
+        json={"tag_id": tag_id, "max_count": 1},
+        headers=headers,
+    ).json()["rule_id"]
+    cursor = _sync(client, headers)["cursor"]
+
+    client.patch(f"/recipes/{soup}", json={"title": "Chowder"}, headers=headers)
+    client.delete(f"/recipes/{stew}", headers=headers)
+    client.delete(f"/rules/{rule_id}", headers=headers)
+    client.delete(f"/rules/{rule_id}", headers=headers)
+
+    result = _sync(client, headers, since=cursor)
+    assert result["reset"] is False
+    recipes = {r["recipe_id"]: r for r in result["recipes"]}
+    assert recipes[soup]["title"] == "Chowder"
+    assert stew not in recipes
+    assert rule_id not in _ids(result["rules"], "rule_id")
+    # Deleting the rule a second time leaves no second tombstone
+    assert sorted(result["deleted"], key=lambda d: d["kind"]) == [
+        {"kind": "recipe", "id": stew},
+        {"kind": "rule", "id": rule_id},
+    ]
+
+
+def test_small_pages_add_up_to_one_large_page(client, headers):
+    tag_id = client.post(
+        "/tags", json={"name": "Fish", "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+    cursor = _sync(client, headers)["cursor"]
+    recipe_ids = [
+        client.post(
+            "/recipes", json={"title": f"R{i}", "tag_ids": [tag_id]}, headers=headers
+        ).json()["recipe_id"]
+        for i in range(5)
+    ]
+    client.delete(f"/recipes/{recipe_ids[0]}", headers=headers)
+
+    whole = _sync(client, headers, since=cursor)
+    assert whole["has_more"] is False
+
+    seen, deleted, pages = [], [], 0
+    page = {"cursor": cursor, "has_more": True}
+    while page["has_more"]:
+        page = _sync(client, headers, since=page["cursor"], limit=2)
+        seen += [r["recipe_id"] for r in page["recipes"]]
+        deleted += page["deleted"]
+        pages += 1
+    assert pages > 1
+    assert set(seen) == _ids(whole["recipes"], "recipe_id") == set(recipe_ids[1:])
+    assert deleted == whole["deleted"] == [{"kind": "recipe", "id": recipe_ids[0]}]
+
+
+def test_bad_and_expired_cursors(client, headers):
+    assert client.get("/sync", params={"since": "nope"}, headers=headers).status_code == 400
+
+    # Tombstones older than SYNC_TOMBSTONE_DAYS may be gone, so the client reloads
+    since = (datetime.utcnow() - timedelta(days=365)).isoformat()
+    assert _sync(client, headers, since=_encode_token(since))["reset"] is True
@@ -0,0 +1,83 @@
+from app.services.memory import InMemoryStorage
+from conftest import auth
+
+HOUSEHOLD_ID = "h1"
+
+
+def _tag(client, headers, name: str) -> str:
+    return client.post(
+        "/tags", json={"name": name, "type": "PROTEIN"}, headers=headers
+    ).json()["tag_id"]
+
+
+def test_delete_cleans_up_recipes_and_rules_in_the_background(client, headers):
+    fish, beef = _tag(client, headers, "Fish"), _tag(client, headers, "Beef")
+    recipes = [
+        client.post(
+            "/recipes", json={"title": f"R{i}", "tag_ids": [fish, beef]}, headers=headers
+        ).json()
+        for i in range(3)
+    ]
+    constraint = client.post(
+        "/rules/constraint/max_meals_per_week_by_tag",
+        json={"tag_id": fish, "max_count": 1},
+        headers=headers,
+    ).json()
+    reminder = client.post(
+        "/rules/action/remind_offset_days_before_dinner",
+        json={"target_type": "TAG", "tag_id": fish, "message_template": "Thaw the fish"},
+        headers=headers,
+    ).json()
+    other = client.post(
+        "/rules/constraint/max_meals_per_week_by_tag",
+        json={"tag_id": beef, "max_count": 2},
+        headers=headers,
+    ).json()
+
+    response = client.delete(f"/tags/{fish}", headers=headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["tag_id"] == fish
+    assert job["recipes_total"] == 3
+    assert [t["tag_id"] for t in client.get("/tags", headers=headers).json()] == [beef]
+
+    # TestClient runs background tasks before returning the response
+    job = client.get(f"/tags/jobs/{job['job_id']}", headers=headers).json()
+    assert job["status"] == "DONE"
+    assert (job["recipes_updated"], job["rules_deleted"], job["rules_disabled"]) == (3, 1, 1)
+
+    for recipe in recipes:
+        got = client.get(f"/recipes/{recipe['recipe_id']}", headers=headers).json()
+        assert got["tag_ids"] == [beef]
+    assert client.get("/recipes", params={"tag_id": fish}, headers=headers).json() == []
+
+    rules = {r["rule_id"]: r for r in client.get("/rules", headers=headers).json()}
+    assert constraint["rule_id"] not in rules
+    assert rules[reminder["rule_id"]]["enabled"] is False
+    assert rules[reminder["rule_id"]]["message_template"] == "Thaw the fish"
+    assert rules[other["rule_id"]]["enabled"] is True
+
+
+def test_jobs_are_per_household(client, headers, sign_up):
+    tag_id = _tag(client, headers, "Fish")
+    job = client.delete(f"/tags/{tag_id}", headers=headers).json()
+    other = auth(sign_up())
+    assert client.get(f"/tags/jobs/{job['job_id']}", headers=other).status_code == 404
+    assert client.get("/tags/jobs/nope", headers=headers).status_code == 404
+
+
+def test_run_tag_deletion_can_be_started_again():
+    storage = InMemoryStorage()
+    tag = storage.create_tag(HOUSEHOLD_ID, "Fish", "PROTEIN")
+    recipe = storage.create_recipe(HOUSEHOLD_ID, "Soup", [tag["tag_id"]], 2, None)
+    job = storage.delete_tag(HOUSEHOLD_ID, tag["tag_id"])
+    assert job["status"] == "RUNNING"
+
+    done = storage.run_tag_deletion(HOUSEHOLD_ID, job["job_id"])
+    assert done["status"] == "DONE"
+    assert done["recipes_updated"] == 1
+    assert storage.get_recipe(HOUSEHOLD_ID, recipe["recipe_id"])["tag_ids"] == []
+
+    # A redelivered job finds nothing left to do
+    assert storage.run_tag_deletion(HOUSEHOLD_ID, job["job_id"]) == done
+    assert storage.run_tag_deletion(HOUSEHOLD_ID, "unknown") is None
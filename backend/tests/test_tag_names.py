@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.memory import InMemoryStorage
+from conftest import auth
+
+HOUSEHOLD_ID = "h1"
+
+
+def test_concurrent_creates_of_one_name_leave_one_tag():
+    storage = InMemoryStorage()
+
+    def create(name: str):
+        try:
+            return storage.create_tag(HOUSEHOLD_ID, name, "PROTEIN")
+        except ValueError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        created = [tag for tag in pool.map(create, ["Fish", "fish", "FISH", "Fish"] * 4) if tag]
+    assert len(created) == 1
+    assert len(storage.get_tags(HOUSEHOLD_ID)) == 1
+
+
+def test_names_are_unique_per_household_ignoring_case(client, headers, sign_up):
+    assert client.post(
+        "/tags", json={"name": "Chicken", "type": "PROTEIN"}, headers=headers
+    ).status_code == 201
+    response = client.post("/tags", json={"name": "chicken", "type": "PREP"}, headers=headers)
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+
+    other = auth(sign_up())
+    assert client.post(
+        "/tags", json={"name": "Chicken", "type": "PROTEIN"}, headers=other
+    ).status_code == 201
+
+
+def test_rename_moves_the_name():
+    storage = InMemoryStorage()
+    fish = storage.create_tag(HOUSEHOLD_ID, "Fish", "PROTEIN")
+    beef = storage.create_tag(HOUSEHOLD_ID, "Beef", "PROTEIN")
+
+    with pytest.raises(ValueError):
+        storage.update_tag(HOUSEHOLD_ID, beef["tag_id"], {"name": "FISH"})
+
+    storage.update_tag(HOUSEHOLD_ID, fish["tag_id"], {"name": "Salmon"})
+    # The old name is free again, the new one taken
+    storage.create_tag(HOUSEHOLD_ID, "Fish", "PROTEIN")
+    with pytest.raises(ValueError):
+        storage.create_tag(HOUSEHOLD_ID, "salmon", "PROTEIN")
+    # Renaming a tag to its own name in another case is allowed
+    assert storage.update_tag(HOUSEHOLD_ID, beef["tag_id"], {"name": "BEEF"})["name"] == "BEEF"
+
+
+def test_deleting_a_tag_frees_its_name():
+    storage = InMemoryStorage()
+    tag = storage.create_tag(HOUSEHOLD_ID, "Fish", "PROTEIN")
+    storage.delete_tag(HOUSEHOLD_ID, tag["tag_id"])
+    assert storage.create_tag(HOUSEHOLD_ID, "fish", "PROTEIN")["name"] == "fish"
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { api } from './services/api';
 import { Login } from './views/Login';
 import { WeeklyPlanner } from './views/WeeklyPlanner';
@@ -16,7 +16,9 @@ import {
   LogOut,
   Loader2,
 } from 'lucide-react';
-import type { User, Recipe, Tag, Rule, WeeklyPlan, ValidationWarning } from './types';
+import type {
+  User, Recipe, Tag, Rule, WeeklyPlan, ValidationWarning, SyncKind, SyncResult,
+} from './types';
 
 // Get Monday of current week
 const getMondayOfCurrentWeek = () => {
@@ -28,6 +30,19 @@ const getMondayOfCurrentWeek = () => {
   return monday.toISOString().split('T')[0];
 };
 
+// Apply synced changes: replace or add changed items, drop deleted ones
+const mergeChanges = <T,>(
+  items: T[],
+  changed: T[],
+  deletedIds: Set<string>,
+  getId: (item: T) => string
+): T[] => {
+  const byId = new Map(items.map((item) => [getId(item), item]));
+  changed.forEach((item) => byId.set(getId(item), item));
+  deletedIds.forEach((id) => byId.delete(id));
+  return Array.from(byId.values());
+};
+
 const App: React.FC = () => {
   // Auth State
   const [user, setUser] = useState<User | null>(null);
@@ -39,6 +54,8 @@ const App: React.FC = () => {
   const [rules, setRules] = useState<Rule[]>([]);
   const [plan, setPlan] = useState<WeeklyPlan | null>(null);
   const [weekStartDate, setWeekStartDate] = useState(getMondayOfCurrentWeek());
+  // Cursor of the last sync; null until everything has been loaded once
+  const syncCursor = useRef<string | null>(null);
 
   // UI State
   const [activeTab, setActiveTab] = useState<'planner' | 'recipes' | 'rules'>('planner');
@@ -64,17 +81,38 @@ const App: React.FC = () => {
     }
   }, [weekStartDate, user]);
 
+  const applySync = (result: SyncResult) => {
+    if (result.reset) {
+      setTags(result.tags);
+      setRecipes(result.recipes);
+      setRules(result.rules);
+      return;
+    }
+    const deletedIds = (kind: SyncKind) =>
+      new Set(result.deleted.filter((d) => d.kind === kind).map((d) => d.id));
+    setTags((prev) => mergeChanges(prev, result.tags, deletedIds('tag'), (t) => t.tag_id));
+    setRecipes((prev) =>
+      mergeChanges(prev, result.recipes, deletedIds('recipe'), (r) => r.recipe_id)
+    );
+    setRules((prev) => mergeChanges(prev, result.rules, deletedIds('rule'), (r) => r.rule_id));
+  };
+
+  // Fetch only what changed since the last sync (everything the first time)
+  const syncData = async () => {
+    let result: SyncResult;
+    do {
+      result = await api.sync(syncCursor.current);
+      applySync(result);
+      syncCursor.current = result.cursor;
+    } while (result.has_more);
+  };
+
   const loadAllData = async () => {
     try {
-      const [tagsData, recipesData, rulesData, planData] = await Promise.all([
-        api.getTags(),
-        api.getRecipes(),
-        api.getRules(),
+      const [, planData] = await Promise.all([
+        syncData(),
         api.getWeeklyPlan(weekStartDate),
       ]);
-      setTags(tagsData);
-      setRecipes(recipesData);
-      setRules(rulesData);
       setPlan(planData);
       // If we got data, we're logged in
       setUser({ user_id: '', email: '', household_id: '', created_at: '' });
@@ -109,6 +147,7 @@ const App: React.FC = () => {
 
   const handleLogout = () => {
     api.logout();
+    syncCursor.current = null;
     setUser(null);
     setRecipes([]);
     setTags([]);
@@ -160,9 +199,15 @@ const App: React.FC = () => {
 
   const handleDeleteTag = async (id: string) => {
     try {
-      await api.deleteTag(id);
+      const job = await api.deleteTag(id);
       setTags((prev) => prev.filter((t) => t.tag_id !== id));
       addNotification('success', 'Tag deleted.');
+      // Recipes and rules lose the tag in the background; sync them once done
+      const finished = await api.waitForTagDeletion(job);
+      if (finished.status === 'FAILED') {
+        addNotification('error', 'Some recipes or rules still refer to the deleted tag.');
+      }
+      await syncData();
     } catch (err) {
       addNotification('error', err instanceof Error ? err.message : 'Failed to delete tag');
     }
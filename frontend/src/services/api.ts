@@ -1,13 +1,17 @@
 import type {
-  Tag, TagCreate, Recipe, RecipeCreate, RecipeUpdate, Rule,
+  Tag, TagCreate, TagDeletionJob, Recipe, RecipeCreate, RecipeUpdate, Rule,
   ConstraintRuleCreate, ActionRuleCreate, WeeklyPlan,
-  PlanEntryUpdate, ValidationResult, AuthResponse
+  PlanEntryUpdate, PlanEntriesPatch, WeeklyPlanPatchResult, ValidationResult, AuthResponse,
+  HouseholdStats, SyncResult, TokenRefresh
 } from '../types';
 
 const API_BASE = '/api';
 
 class ApiService {
   private token: string | null = null;
+  // In-flight refresh shared by every request that got a 401, so a refresh
+  // token is exchanged only once (a second use ends the session)
+  private refreshing: Promise<boolean> | null = null;
 
   setToken(token: string | null) {
     this.token = token;
@@ -18,6 +22,44 @@ class ApiService {
     }
   }
 
+  private setTokens(accessToken: string | null, refreshToken: string | null) {
+    this.setToken(accessToken);
+    if (refreshToken) {
+      localStorage.setItem('refresh_token', refreshToken);
+    } else {
+      localStorage.removeItem('refresh_token');
+    }
+  }
+
+  // Read from storage every time: another tab may have rotated it
+  private getRefreshToken(): string | null {
+    return localStorage.getItem('refresh_token');
+  }
+
+  // Trade the refresh token for new tokens; false when the session is over
+  private refreshTokens(): Promise<boolean> {
+    if (!this.refreshing) {
+      this.refreshing = (async () => {
+        const refreshToken = this.getRefreshToken();
+        if (!refreshToken) return false;
+        const response = await fetch(`${API_BASE}/auth/refresh`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+        if (!response.ok) return false;
+        const tokens: TokenRefresh = await response.json();
+        this.setTokens(tokens.access_token, tokens.refresh_token);
+        return true;
+      })()
+        .catch(() => false)
+        .finally(() => {
+          this.refreshing = null;
+        });
+    }
+    return this.refreshing;
+  }
+
   getToken(): string | null {
     if (!this.token) {
       this.token = localStorage.getItem('auth_token');
@@ -25,10 +67,13 @@ class ApiService {
     return this.token;
   }
 
-  private async fetch<T>(
+  // Sends an authorized request, renewing the access token once on a 401;
+  // resolves to the response when it succeeded
+  private async request(
     endpoint: string,
-    options: RequestInit = {}
-  ): Promise<T> {
+    options: RequestInit = {},
+    retried = false
+  ): Promise<Response> {
     const headers: Record<string, string> = {
       'Content-Type': 'application/json',
       ...(options.headers as Record<string, string>),
@@ -45,7 +90,11 @@ class ApiService {
     });
 
     if (response.status === 401) {
-      this.setToken(null);
+      // Access tokens last minutes; renew once and replay the request
+      if (!retried && token && !endpoint.startsWith('/auth/') && (await this.refreshTokens())) {
+        return this.request(endpoint, options, true);
+      }
+      this.setTokens(null, null);
       throw new Error('Unauthorized');
     }
 
@@ -54,6 +103,12 @@ class ApiService {
       throw new Error(error.detail || 'Request failed');
     }
 
+    return response;
+  }
+
+  private async fetch<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
+    const response = await this.request(endpoint, options);
+
     if (response.status === 204) {
       return undefined as T;
     }
@@ -67,7 +122,7 @@ class ApiService {
       method: 'POST',
       body: JSON.stringify({ email, password }),
     });
-    this.setToken(response.access_token);
+    this.setTokens(response.access_token, response.refresh_token);
     return response;
   }
 
@@ -76,12 +131,23 @@ class ApiService {
       method: 'POST',
       body: JSON.stringify({ email, password }),
     });
-    this.setToken(response.access_token);
+    this.setTokens(response.access_token, response.refresh_token);
     return response;
   }
 
+  // Ends the session on the server too, so its tokens stop working everywhere
   logout() {
-    this.setToken(null);
+    const refreshToken = this.getRefreshToken();
+    this.setTokens(null, null);
+    if (refreshToken) {
+      fetch(`${API_BASE}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => {
+        // The session still expires on its own
+      });
+    }
   }
 
   // Tags
@@ -96,8 +162,21 @@ class ApiService {
     });
   }
 
-  async deleteTag(tagId: string): Promise<void> {
-    return this.fetch<void>(`/tags/${tagId}`, { method: 'DELETE' });
+  async deleteTag(tagId: string): Promise<TagDeletionJob> {
+    return this.fetch<TagDeletionJob>(`/tags/${tagId}`, { method: 'DELETE' });
+  }
+
+  async getTagDeletionJob(jobId: string): Promise<TagDeletionJob> {
+    return this.fetch<TagDeletionJob>(`/tags/jobs/${jobId}`);
+  }
+
+  // Polls a tag deletion's cleanup until it is no longer running
+  async waitForTagDeletion(job: TagDeletionJob, intervalMs = 1000): Promise<TagDeletionJob> {
+    while (job.status === 'RUNNING') {
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+      job = await this.getTagDeletionJob(job.job_id);
+    }
+    return job;
   }
 
   // Recipes
@@ -175,6 +254,20 @@ class ApiService {
     });
   }
 
+  async patchWeeklyPlan(
+    weekStartDate: string,
+    data: PlanEntriesPatch,
+    validate = false
+  ): Promise<WeeklyPlanPatchResult> {
+    return this.fetch<WeeklyPlanPatchResult>(
+      `/plans/${weekStartDate}${validate ? '?validate=true' : ''}`,
+      {
+        method: 'PATCH',
+        body: JSON.stringify(data),
+      }
+    );
+  }
+
   async validatePlan(weekStartDate: string): Promise<ValidationResult> {
     return this.fetch<ValidationResult>(`/plans/${weekStartDate}/validate`, {
       method: 'POST',
@@ -182,13 +275,7 @@ class ApiService {
   }
 
   async exportIcs(weekStartDate: string): Promise<void> {
-    const token = this.getToken();
-    const response = await fetch(`${API_BASE}/plans/${weekStartDate}/export.ics`, {
-      headers: { Authorization: `Bearer ${token}` },
-    });
-
-    if (!response.ok) throw new Error('Export failed');
-
+    const response = await this.request(`/plans/${weekStartDate}/export.ics`);
     const blob = await response.blob();
     const url = window.URL.createObjectURL(blob);
     const link = document.createElement('a');
@@ -199,6 +286,19 @@ class ApiService {
     document.body.removeChild(link);
     window.URL.revokeObjectURL(url);
   }
+
+  // Stats
+  async getStats(): Promise<HouseholdStats> {
+    return this.fetch<HouseholdStats>('/stats');
+  }
+
+  // Sync: tags, recipes and rules changed since the cursor (everything without one)
+  async sync(since: string | null): Promise<SyncResult> {
+    const params = new URLSearchParams();
+    if (since) params.set('since', since);
+    const query = params.toString();
+    return this.fetch<SyncResult>(`/sync${query ? `?${query}` : ''}`);
+  }
 }
 
 export const api = new ApiService();
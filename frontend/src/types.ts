@@ -7,6 +7,7 @@ export interface Tag {
   type: TagType;
   household_id: string;
   created_at: string;
+  updated_at: string | null;
 }
 
 export interface TagCreate {
@@ -14,6 +15,21 @@ export interface TagCreate {
   type: TagType;
 }
 
+export type JobStatus = 'RUNNING' | 'DONE' | 'FAILED';
+
+export interface TagDeletionJob {
+  job_id: string;
+  tag_id: string;
+  status: JobStatus;
+  recipes_total: number;
+  recipes_updated: number;
+  rules_deleted: number;
+  rules_disabled: number;
+  error: string | null;
+  created_at: string;
+  updated_at: string;
+}
+
 // Recipe
 export interface Recipe {
   recipe_id: string;
@@ -123,6 +139,54 @@ export interface ValidationResult {
   warnings: ValidationWarning[];
 }
 
+export interface PlanEntriesPatch {
+  upserts?: Record<string, PlanEntry>;
+  deletes?: string[];
+}
+
+export interface WeeklyPlanPatchResult {
+  plan: WeeklyPlan;
+  validation?: ValidationResult | null;
+}
+
+// Stats
+export interface RecipeStats {
+  recipe_id: string;
+  plan_count: number;
+  last_planned: string | null;
+}
+
+export interface TagStats {
+  tag_id: string;
+  recipe_count: number;
+  last_planned: string | null;
+}
+
+export interface HouseholdStats {
+  household_id: string;
+  recipes: RecipeStats[];
+  tags: TagStats[];
+  updated_at: string | null;
+}
+
+// Delta sync
+export type SyncKind = 'tag' | 'recipe' | 'rule';
+
+export interface DeletedItem {
+  kind: SyncKind;
+  id: string;
+}
+
+export interface SyncResult {
+  tags: Tag[];
+  recipes: Recipe[];
+  rules: Rule[];
+  deleted: DeletedItem[];
+  cursor: string;
+  has_more: boolean;
+  reset: boolean;
+}
+
 // Auth
 export interface User {
   user_id: string;
@@ -133,10 +197,19 @@ export interface User {
 
 export interface AuthResponse {
   access_token: string;
+  refresh_token: string;
   token_type: string;
+  expires_in: number;
   user: User;
 }
 
+export interface TokenRefresh {
+  access_token: string;
+  refresh_token: string;
+  token_type: string;
+  expires_in: number;
+}
+
 // UI State
 export interface DragItem {
   type: 'RECIPE' | 'TAG';